@@ -1,9 +1,16 @@
+import logging
+
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
-from ..auth import get_current_user
+from ..auth import get_current_user, get_admin_user
+from ..db import check_room_access
 from .ai_service import ai_service
+from .upstream import metrics_snapshot
+from .scheduler import DeadlineExceeded, SchedulerFull
+from ..metrics import RATE_LIMITED
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Request/Response Models
@@ -14,9 +21,10 @@ class GrammarCheckRequest(BaseModel):
 class AutocompleteRequest(BaseModel):
     context: str
     max_words: int = 15
+    room_id: Optional[str] = None  # enables the cached per-document style profile
 
 class EnhanceRequest(BaseModel):
-    text: str
+    text: str = Field(..., max_length=8000)
     action: str  # improve, shorten, expand, formal, casual, fix
 
 # Rate limiting helper (thread-safe in-memory)
@@ -25,9 +33,10 @@ from time import time
 import threading
 
 class RateLimiter:
-    def __init__(self, max_requests: int, window: int):
+    def __init__(self, name: str, max_requests: int, window: int):
         self.max_requests = max_requests
         self.window = window  # in seconds
+        self.rejected = RATE_LIMITED.labels(name)
         self.requests = defaultdict(list)
         self.lock = threading.Lock()  # Thread safety
     
@@ -41,15 +50,16 @@ class RateLimiter:
             ]
             
             if len(self.requests[user_id]) >= self.max_requests:
+                self.rejected.inc()
                 return False
             
             self.requests[user_id].append(now)
             return True
 
 # Rate limiters (20 grammar checks/min, 30 autocomplete/min)
-grammar_limiter = RateLimiter(max_requests=20, window=60)
-autocomplete_limiter = RateLimiter(max_requests=30, window=60)
-enhance_limiter = RateLimiter(max_requests=15, window=60)
+grammar_limiter = RateLimiter("grammar", max_requests=20, window=60)
+autocomplete_limiter = RateLimiter("autocomplete", max_requests=30, window=60)
+enhance_limiter = RateLimiter("enhance", max_requests=15, window=60)
 
 @router.post("/api/ai/grammar-check")
 async def check_grammar(
@@ -64,21 +74,24 @@ async def check_grammar(
         raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait a moment.")
     
     try:
-        errors = ai_service.check_grammar(request.text, request.language)
-        
-        # Debug logging
-        print(f"Grammar check for text length: {len(request.text)}")
-        print(f"Found {len(errors)} errors")
-        for err in errors[:3]:  # Log first 3 errors
-            start, end = err['start'], err['end']
-            word = request.text[start:end] if start < len(request.text) and end <= len(request.text) else "OUT_OF_BOUNDS"
-            print(f"  {err['type']}: '{word}' at {start}-{end}")
-        
+        errors = await ai_service.check_grammar(request.text, request.language)
+        logger.debug("Grammar check", extra={"chars": len(request.text), "errors": len(errors)})
         return {"errors": errors, "count": len(errors)}
     except Exception as e:
-        print(f"Grammar check error: {e}")
+        logger.exception("Grammar check error")
         raise HTTPException(status_code=500, detail="Grammar check failed")
 
+@router.get("/api/ai/metrics")
+async def get_ai_metrics(admin_user: dict = Depends(get_admin_user)):
+    """Upstream latency and circuit state (admin only)"""
+    return {
+        "upstreams": metrics_snapshot(),
+        "circuits": {"languagetool": ai_service.grammar.breaker.state},
+        "scheduler": ai_service.scheduler.snapshot(),
+        "routing": ai_service.groq.router.snapshot(),
+        "ngram": ai_service.ngram.snapshot()
+    }
+
 @router.post("/api/ai/autocomplete")
 async def get_autocomplete(
     request: AutocompleteRequest,
@@ -92,10 +105,16 @@ async def get_autocomplete(
         raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait a moment.")
     
     try:
-        suggestion = ai_service.get_autocomplete(request.context, request.max_words)
-        return {"suggestion": suggestion}
+        room_id = request.room_id
+        if room_id and not check_room_access(room_id, user_id):
+            room_id = None
+        suggestion, model = await ai_service.get_autocomplete(request.context, request.max_words, room_id)
+        return {"suggestion": suggestion, "model": model}
+    except (DeadlineExceeded, SchedulerFull):
+        # A late suggestion is useless; let the client just try again
+        return {"suggestion": "", "model": None}
     except Exception as e:
-        print(f"Autocomplete error: {e}")
+        logger.exception("Autocomplete error")
         raise HTTPException(status_code=500, detail="Autocomplete failed")
 
 @router.post("/api/ai/enhance")
@@ -111,26 +130,17 @@ async def enhance_text(
         raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait a moment.")
     
     try:
-        print(f"\n{'='*80}")
-        print(f"API Route - Enhance request received")
-        print(f"  User: {user_id}")
-        print(f"  Action: {request.action}")
-        print(f"  Text length: {len(request.text)}")
-        print(f"  Text: {request.text[:100]}...")
-        print(f"{'='*80}\n")
-        
-        enhanced = ai_service.enhance_text(request.text, request.action)
-        
-        print(f"\n{'='*80}")
-        print(f"API Route - Sending response")
-        print(f"  Original: {request.text[:100]}...")
-        print(f"  Enhanced: {enhanced[:100]}...")
-        print(f"  Changed: {request.text != enhanced}")
-        print(f"{'='*80}\n")
+        enhanced, model = await ai_service.enhance_text(request.text, request.action)
+        logger.info("Enhanced text", extra={
+            "user": user_id[:8], "action": request.action, "model": model,
+            "chars": len(request.text), "changed": request.text != enhanced,
+        })
         
-        return {"enhanced_text": enhanced, "original_text": request.text}
+        return {"enhanced_text": enhanced, "original_text": request.text, "model": model}
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Text enhancement timed out. Please try again.")
+    except SchedulerFull:
+        raise HTTPException(status_code=503, detail="AI service is busy. Please try again shortly.")
     except Exception as e:
-        print(f"❌ Enhancement error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Enhancement error")
         raise HTTPException(status_code=500, detail="Text enhancement failed")
\ No newline at end of file
@@ -1,49 +1,66 @@
+import logging
+
 from .groq_client import groq_client
 from .grammar_checker import grammar_checker
-from typing import List, Dict
+from .scheduler import DeadlineExceeded, SchedulerFull, ai_scheduler
+from .context_builder import build_autocomplete_context
+from .ngram import ngram_index
+from typing import List, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 class AIService:
     def __init__(self):
         self.groq = groq_client
         self.grammar = grammar_checker
+        self.scheduler = ai_scheduler
+        self.ngram = ngram_index
     
-    def check_grammar(self, text: str, language: str = "en-US") -> List[Dict]:
+    async def check_grammar(self, text: str, language: str = "en-US") -> List[Dict]:
         """Check grammar and return errors"""
-        return self.grammar.check(text, language)
+        return await self.grammar.check(text, language)
     
-    def get_autocomplete(self, context: str, max_words: int = 15) -> str:
-        """Get autocomplete suggestion"""
+    async def get_autocomplete(self, context: str, max_words: int = 15,
+                               room_id: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """Get autocomplete suggestion and the model that produced it"""
         # Only suggest if context is sufficient
         if len(context.strip()) < 20:
-            return ""
+            return "", None
+        
+        # Predictable continuations come from the document itself
+        if room_id:
+            local = self.ngram.predict(room_id, context, max_words)
+            if local:
+                return local, "ngram"
         
         # Check if Groq API is available
         if not self.groq.is_available():
-            return ""  # Fallback: return empty suggestion
+            return "", None  # Fallback: return empty suggestion
         
-        return self.groq.complete_text(context, max_words)
+        context, style_profile = build_autocomplete_context(context, room_id)
+        try:
+            return await self.scheduler.submit(
+                "autocomplete", self.groq.complete_text, context, max_words, style_profile
+            )
+        except (DeadlineExceeded, SchedulerFull):
+            raise
+        except Exception as e:
+            # The scheduler has counted the failure; the user just gets no suggestion
+            logger.warning("Groq autocomplete error: %s", e)
+            return "", None
     
-    def enhance_text(self, text: str, action: str) -> str:
-        """Enhance text using AI"""
+    async def enhance_text(self, text: str, action: str) -> Tuple[str, str]:
+        """Enhance text using AI; returns the text and the model used"""
         valid_actions = ['improve', 'shorten', 'expand', 'formal', 'casual', 'fix']
         if action not in valid_actions:
             action = 'improve'
         
-        print(f"\nAI Service - enhance_text called")
-        print(f"  Action: {action}")
-        print(f"  Groq available: {self.groq.is_available()}")
-        print(f"  Groq API key exists: {bool(self.groq.api_key)}")
-        if self.groq.api_key:
-            print(f"  API key length: {len(self.groq.api_key)}")
-        
         # Check if Groq API is available
         if not self.groq.is_available():
-            print("❌ Groq API not available - API key missing!")
+            logger.error("Groq API not available - API key missing")
             raise Exception("Groq API key not configured. Please set GROQ_API_KEY in environment.")
         
-        result = self.groq.enhance_text(text, action)
-        print(f"\nAI Service - returning result (length: {len(result)})")
-        return result
+        return await self.scheduler.submit(action, self.groq.enhance_text, text, action)
 
 # Singleton instance
 ai_service = AIService()
\ No newline at end of file
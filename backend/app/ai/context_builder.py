@@ -0,0 +1,129 @@
+import os
+import re
+import threading
+from time import time
+from typing import Dict, Optional, Tuple
+
+from ..db import get_document_content, get_document_length
+from .html_text import html_to_text
+
+# Rough BPE-like token split: words and individual punctuation marks
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+[\"')\]]*|\n+|$)\s*")
+CONTRACTION_RE = re.compile(r"\b\w+'(?:t|s|re|ve|ll|d|m)\b", re.IGNORECASE)
+FIRST_PERSON_RE = re.compile(r"\b(?:i|me|my|we|our|us)\b", re.IGNORECASE)
+SECOND_PERSON_RE = re.compile(r"\b(?:you|your)\b", re.IGNORECASE)
+
+CONTEXT_TOKENS = int(os.getenv("AI_CONTEXT_TOKENS", "120"))
+
+
+def estimate_tokens(text: str) -> int:
+    return len(TOKEN_RE.findall(text))
+
+
+def trim_context(text: str, max_tokens: int = CONTEXT_TOKENS) -> str:
+    """Keep the last `max_tokens` tokens of text, cut at a sentence boundary.
+
+    Whole sentences are taken from the end while they fit. If even the last
+    sentence is too long, its tail is kept from a word boundary instead.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    sentences = SENTENCE_RE.findall(text)
+    kept = []
+    used = 0
+    for sentence in reversed(sentences):
+        cost = estimate_tokens(sentence)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+
+    if kept:
+        return "".join(reversed(kept))
+
+    words = text.split(" ")
+    tail = []
+    used = 0
+    for word in reversed(words):
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens:
+            break
+        tail.append(word)
+        used += cost
+    return " ".join(reversed(tail))
+
+
+def summarize_style(text: str) -> str:
+    """One-line description of a document's tone, cheap enough to run inline"""
+    words = re.findall(r"[A-Za-z']+", text)
+    if len(words) < 30:
+        return ""
+    sentences = [s for s in SENTENCE_RE.findall(text) if s.strip()]
+    avg_sentence = len(words) / max(1, len(sentences))
+    avg_word = sum(len(w) for w in words) / len(words)
+    contractions = len(CONTRACTION_RE.findall(text)) / len(words)
+    exclamations = text.count("!") / max(1, len(sentences))
+
+    traits = []
+    if contractions > 0.02 or exclamations > 0.1:
+        traits.append("casual, conversational")
+    elif avg_word > 5.2 or avg_sentence > 22:
+        traits.append("formal")
+    else:
+        traits.append("neutral, professional")
+    traits.append("uses contractions" if contractions > 0.01 else "avoids contractions")
+    if avg_sentence < 12:
+        traits.append(f"short sentences (~{avg_sentence:.0f} words)")
+    elif avg_sentence > 22:
+        traits.append(f"long sentences (~{avg_sentence:.0f} words)")
+    else:
+        traits.append(f"medium sentences (~{avg_sentence:.0f} words)")
+    if FIRST_PERSON_RE.search(text):
+        traits.append("first person")
+    if len(SECOND_PERSON_RE.findall(text)) / len(words) > 0.01:
+        traits.append("addresses the reader")
+    if avg_word > 5.5:
+        traits.append("sophisticated vocabulary")
+    return "; ".join(traits)
+
+
+class StyleProfileCache:
+    """Per-room style summaries, recomputed only when the document changes a lot"""
+
+    def __init__(self, refresh_ratio: float = 0.2, min_refresh_chars: int = 2000, max_age: float = 3600):
+        self.refresh_ratio = refresh_ratio
+        self.min_refresh_chars = min_refresh_chars
+        self.max_age = max_age
+        # room_id -> (profile, document length when computed, computed_at)
+        self.profiles: Dict[str, Tuple[str, int, float]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, room_id: str) -> str:
+        # Only the stored length is read unless the profile needs recomputing
+        length = get_document_length(room_id)
+        with self.lock:
+            cached = self.profiles.get(room_id)
+        if cached and not self._stale(cached, length):
+            return cached[0]
+
+        profile = summarize_style(html_to_text(get_document_content(room_id)))
+        with self.lock:
+            self.profiles[room_id] = (profile, length, time())
+        return profile
+
+    def _stale(self, cached: Tuple[str, int, float], length: int) -> bool:
+        _, old_length, computed_at = cached
+        change = abs(length - old_length)
+        threshold = max(self.min_refresh_chars, self.refresh_ratio * old_length)
+        return change >= threshold or time() - computed_at > self.max_age
+
+
+style_profiles = StyleProfileCache()
+
+
+def build_autocomplete_context(context: str, room_id: Optional[str] = None) -> Tuple[str, str]:
+    """Trimmed prompt context plus the room's style profile (may be empty)"""
+    profile = style_profiles.get(room_id) if room_id else ""
+    return trim_context(context), profile
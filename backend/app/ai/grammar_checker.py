@@ -1,61 +1,183 @@
-import requests
-from typing import List, Dict
+import asyncio
+import hashlib
+import logging
+import re
+import httpx
+from collections import OrderedDict
+from time import monotonic
+from typing import List, Dict, Optional
 import os
 
+from .spell_checker import spell_checker
+from .upstream import CircuitBreaker, SingleFlight, get_tracker
+
+logger = logging.getLogger(__name__)
+
+PARAGRAPH_RE = re.compile(r"[^\n]+")
+PARAGRAPH_CACHE_SIZE = 2048
+
 class GrammarChecker:
     def __init__(self):
+        # Point at a self-hosted LanguageTool (or a stub server in tests) to skip the public API
         self.api_url = os.getenv("LANGUAGETOOL_API_URL", "https://api.languagetool.org/v2/check")
-    
-    def check(self, text: str, language: str = "en-US") -> List[Dict]:
-        """Check grammar using LanguageTool API"""
+        self.timeout = float(os.getenv("LANGUAGETOOL_TIMEOUT", "5"))
+        self.max_connections = int(os.getenv("LANGUAGETOOL_MAX_CONNECTIONS", "20"))
+        self.client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker("languagetool", failure_threshold=5, reset_timeout=30)
+        self.latency = get_tracker("languagetool")
+        self.singleflight = SingleFlight()
+        # Spelling runs in-process; LanguageTool only sees grammar/style work
+        self.local_spelling = os.getenv("LOCAL_SPELLCHECK", "1") != "0"
+        # (language, paragraph hash) -> grammar/style errors relative to the paragraph
+        self.paragraph_cache: "OrderedDict[tuple, List[Dict]]" = OrderedDict()
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        """Lazily create the pooled client so keep-alive connections are reused"""
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def check(self, text: str, language: str = "en-US") -> List[Dict]:
+        """Check grammar using the local speller plus LanguageTool API"""
+        # Don't check empty text
+        if not text or len(text.strip()) < 3:
+            return []
+
+        if not self.local_spelling or not spell_checker.supports(language):
+            errors = await self._check_remote(text, language) or []
+            return [dict(error) for error in errors]
+
+        if not spell_checker.loaded:
+            await asyncio.to_thread(spell_checker._ensure_loaded)
+        errors = spell_checker.check(text) + await self._check_paragraphs(text, language)
+        errors.sort(key=lambda error: error['start'])
+        return errors
+
+    async def _check_paragraphs(self, text: str, language: str) -> List[Dict]:
+        """Grammar/style errors, sending only paragraphs not seen before"""
+        results = []
+        missing = []
+        for match in PARAGRAPH_RE.finditer(text):
+            paragraph = match.group(0)
+            if len(paragraph.strip()) < 3:
+                continue
+            key = (language, hashlib.sha1(paragraph.encode("utf-8")).hexdigest())
+            cached = self.paragraph_cache.get(key)
+            if cached is not None:
+                self.paragraph_cache.move_to_end(key)
+                results.append((match.start(), cached))
+            else:
+                missing.append((match.start(), paragraph, key))
+
+        if missing:
+            # One upstream call for all changed paragraphs, split back afterwards
+            batch = "\n\n".join(paragraph for _, paragraph, _ in missing)
+            matches = await self._check_remote(batch, language, disabled_categories="TYPOS")
+            if matches is not None:
+                segment_start = 0
+                for offset, paragraph, key in missing:
+                    segment_end = segment_start + len(paragraph)
+                    paragraph_errors = [
+                        _shift(error, -segment_start) for error in matches
+                        if segment_start <= error['start'] < segment_end
+                    ]
+                    self.paragraph_cache[key] = paragraph_errors
+                    results.append((offset, paragraph_errors))
+                    segment_start = segment_end + 2
+                while len(self.paragraph_cache) > PARAGRAPH_CACHE_SIZE:
+                    self.paragraph_cache.popitem(last=False)
+
+        return [_shift(error, offset) for offset, errors in results for error in errors]
+
+    async def _check_remote(self, text: str, language: str, disabled_categories: str = "") -> Optional[List[Dict]]:
+        # Identical concurrent checks share a single upstream request
+        key = (language, disabled_categories, hashlib.sha1(text.encode("utf-8")).hexdigest())
+        return await self.singleflight.do(key, lambda: self._fetch(text, language, disabled_categories))
+
+    async def _fetch(self, text: str, language: str, disabled_categories: str = "") -> Optional[List[Dict]]:
+        """Call LanguageTool; None means the check did not happen"""
+        if not self.breaker.allow():
+            return None
+
+        # Prepare request
+        data = {
+            'text': text,
+            'language': language,
+            'enabledOnly': 'false'
+        }
+        if disabled_categories:
+            data['disabledCategories'] = disabled_categories
+
+        started = monotonic()
+        ok = None
         try:
-            # Don't check empty text
-            if not text or len(text.strip()) < 3:
-                return []
-            
-            # Prepare request
-            data = {
-                'text': text,
-                'language': language,
-                'enabledOnly': 'false'
-            }
-            
             # Call LanguageTool API
-            response = requests.post(self.api_url, data=data, timeout=5)
-            
+            response = await self._ensure_client().post(self.api_url, data=data)
+
             if response.status_code != 200:
-                print(f"LanguageTool API error: {response.status_code}")
-                return []
-            
-            result = response.json()
-            errors = []
-            
-            # Parse matches
-            for match in result.get('matches', []):
-                error = {
-                    'type': self._classify_error(match),
-                    'start': match['offset'],
-                    'end': match['offset'] + match['length'],
-                    'message': match['message'],
-                    'suggestions': [r['value'] for r in match.get('replacements', [])[:3]],
-                    'category': match['rule']['category']['id'],
-                    'rule_id': match['rule']['id']
-                }
-                errors.append(error)
-            
+                logger.warning("LanguageTool API error", extra={"status": response.status_code})
+                ok = False
+                return None
+
+            errors = self._parse_matches(response.json())
+            ok = True
             return errors
-        
-        except requests.Timeout:
-            print("LanguageTool API timeout")
-            return []
+
+        except httpx.TimeoutException:
+            logger.warning("LanguageTool API timeout")
+            ok = False
+            return None
         except Exception as e:
-            print(f"Grammar check error: {e}")
-            return []
-    
+            logger.warning("Grammar check error: %s", e)
+            ok = False
+            return None
+        finally:
+            if ok is None:
+                # Cancelled mid-request: no outcome, but a half-open trial slot must be freed
+                self.breaker.release()
+            else:
+                self._record(started, ok=ok)
+
+    def _record(self, started: float, ok: bool):
+        self.latency.record(monotonic() - started, ok=ok)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def _parse_matches(self, result: Dict) -> List[Dict]:
+        errors = []
+
+        # Parse matches
+        for match in result.get('matches', []):
+            error = {
+                'type': self._classify_error(match),
+                'start': match['offset'],
+                'end': match['offset'] + match['length'],
+                'message': match['message'],
+                'suggestions': [r['value'] for r in match.get('replacements', [])[:3]],
+                'category': match['rule']['category']['id'],
+                'rule_id': match['rule']['id']
+            }
+            errors.append(error)
+
+        return errors
+
     def _classify_error(self, match: Dict) -> str:
         """Classify error type"""
         category = match['rule']['category']['id']
-        
+
         if 'TYPOS' in category or 'SPELLING' in category:
             return 'spelling'
         elif 'STYLE' in category or 'REDUNDANCY' in category:
@@ -63,5 +185,8 @@ class GrammarChecker:
         else:
             return 'grammar'
 
+def _shift(error: Dict, delta: int) -> Dict:
+    return {**error, 'start': error['start'] + delta, 'end': error['end'] + delta}
+
 # Singleton instance
-grammar_checker = GrammarChecker()
\ No newline at end of file
+grammar_checker = GrammarChecker()
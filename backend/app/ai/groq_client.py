@@ -1,12 +1,19 @@
+import logging
 import os
 from groq import Groq
-from typing import Optional
+from time import monotonic
+from typing import Optional, Tuple
+
+from .model_router import model_router
+
+logger = logging.getLogger(__name__)
 
 class GroqClient:
     def __init__(self):
         self.client = None
-        self.model = "llama-3.3-70b-versatile"
-        self.fallback_model = "llama-3.1-8b-instant"
+        self.router = model_router
+        self.model = model_router.large_model
+        self.fallback_model = model_router.fast_model
         self.api_key = None
         self._initialized = False
     
@@ -18,12 +25,10 @@ class GroqClient:
         self._initialized = True
         self.api_key = os.getenv("GROQ_API_KEY")
         
-        # Log initialization status
         if self.api_key:
-            print(f"✅ GroqClient initialized with API key (length: {len(self.api_key)})")
+            logger.info("GroqClient initialized with API key")
         else:
-            print("❌ GroqClient initialized WITHOUT API key!")
-            print("   Please set GROQ_API_KEY in your .env file")
+            logger.warning("GroqClient initialized without API key; set GROQ_API_KEY in your .env file")
     
     def _ensure_client(self):
         """Lazy initialization of Groq client"""
@@ -40,12 +45,52 @@ class GroqClient:
         self._lazy_init()
         return self.api_key is not None
     
-    def complete_text(self, context: str, max_words: int = 15) -> str:
-        """Get autocomplete suggestion"""
-        try:
-            self._ensure_client()
-            
-            prompt = f"""You are an intelligent writing assistant. Analyze the writing style, tone, and formality level of the given text, then complete it naturally.
+    def _chat(self, action: str, messages: list, timeout: Optional[float] = None, **params) -> Tuple[str, str]:
+        """Run a chat completion on the routed model, failing over on errors"""
+        deadline = monotonic() + timeout if timeout else None
+        last_error = None
+        failed_model = None
+        for model in self.router.candidates(action):
+            # Before allow(): a half-open breaker's trial slot must be used once taken
+            remaining = deadline - monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                break
+            if not self.router.allow(model):
+                continue
+            if failed_model is not None:
+                # Counted only now that another model is really tried
+                self.router.record_failover(failed_model, action)
+            if remaining is not None:
+                # Without a deadline, leave the SDK's own request timeout in place
+                params["timeout"] = remaining
+            started = monotonic()
+            try:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **params
+                )
+            except Exception as e:
+                logger.warning("Groq model failed: %s", e, extra={"model": model, "action": action})
+                self.router.record(model, action, monotonic() - started, ok=False)
+                failed_model = model
+                last_error = e
+                continue
+            usage = getattr(response, "usage", None)
+            self.router.record(model, action, monotonic() - started, ok=True,
+                               tokens=getattr(usage, "total_tokens", 0) or 0)
+            return response.choices[0].message.content, model
+        raise last_error or Exception(f"No Groq model available for {action}")
+
+    def complete_text(self, context: str, max_words: int = 15, style_profile: str = "",
+                      timeout: Optional[float] = None) -> Tuple[str, Optional[str]]:
+        """Get autocomplete suggestion and the model that produced it; upstream errors propagate"""
+        self._ensure_client()
+        
+        # A precomputed style summary stands in for long raw history
+        style_line = f"\nDocument style: {style_profile}\n" if style_profile else ""
+        
+        prompt = f"""You are an intelligent writing assistant. Analyze the writing style, tone, and formality level of the given text, then complete it naturally.
 
 IMPORTANT RULES:
 1. MATCH the exact tone and formality level of the input text (formal, casual, professional, conversational, etc.)
@@ -55,33 +100,31 @@ IMPORTANT RULES:
 5. Complete with {max_words} words or less
 6. The completion should flow naturally and feel like the same author wrote it
 7. Return ONLY the completion words, no quotes or explanations
-
+{style_line}
 Text to complete:
 {context}
 
 Completion:"""
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a context-aware writing assistant. Always match the tone, style, and formality level of the input text. If the input is casual, be casual. If formal, be formal. Return only the completion text without quotes or explanations."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.4,
-                max_tokens=100,
-                stop=["\n\n", "\n"]  # Only stop on line breaks, not punctuation
-            )
-            
-            suggestion = response.choices[0].message.content.strip()
-            # Remove quotes if present
-            suggestion = suggestion.strip('"\'')
-            return suggestion
-        except Exception as e:
-            print(f"Groq API error: {e}")
-            return ""
+        content, model = self._chat(
+            "autocomplete",
+            [
+                {"role": "system", "content": "You are a context-aware writing assistant. Always match the tone, style, and formality level of the input text. If the input is casual, be casual. If formal, be formal. Return only the completion text without quotes or explanations."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.4,
+            max_tokens=100,
+            stop=["\n\n", "\n"],  # Only stop on line breaks, not punctuation
+            timeout=timeout
+        )
+        
+        suggestion = content.strip()
+        # Remove quotes if present
+        suggestion = suggestion.strip('"\'')
+        return suggestion, model
     
-    def enhance_text(self, text: str, action: str) -> str:
-        """Enhance text based on action"""
+    def enhance_text(self, text: str, action: str, timeout: Optional[float] = None) -> Tuple[str, str]:
+        """Enhance text based on action; returns the text and the model used"""
         try:
             self._ensure_client()
             
@@ -144,35 +187,27 @@ Corrected version:""",
             
             prompt = prompts.get(action, prompts['improve'])
             
-            print(f"\nEnhancing text with action: {action}")
-            print(f"Original text: {text}")
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            content, model = self._chat(
+                action,
+                [
                     {"role": "system", "content": "You are a professional text editor. Always follow instructions precisely and return ONLY the modified text without any explanations, quotes, or additional commentary."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=500,
+                timeout=timeout
             )
             
-            enhanced = response.choices[0].message.content.strip()
+            enhanced = content.strip()
             # Remove quotes if present
             enhanced = enhanced.strip('"\'\'"')
-            
-            print(f"Enhanced text: {enhanced}")
-            print(f"Changed: {text != enhanced}")
-            
-            # Final check - if text hasn't changed, log warning
+
             if enhanced == text:
-                print(f"⚠️  WARNING: Groq returned unchanged text!")
+                logger.warning("Groq returned unchanged text", extra={"model": model, "action": action})
             
-            return enhanced
+            return enhanced, model
         except Exception as e:
-            print(f"❌ Groq API error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Groq enhance error")
             # Re-raise instead of silently returning original
             raise Exception(f"Groq API failed: {e}")
 
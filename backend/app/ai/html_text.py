@@ -0,0 +1,48 @@
+from html.parser import HTMLParser
+
+# Tags that end a text block in the editor schema
+BLOCK_TAGS = {
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre", "div",
+    "ul", "ol", "table", "tr", "td", "th", "hr",
+}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.pending_break = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.pending_break = True
+        elif tag == "br":
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self.pending_break = True
+
+    def handle_data(self, data):
+        if not data:
+            return
+        if self.pending_break and self.parts:
+            self.parts.append("\n\n")
+        self.pending_break = False
+        self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Plain text of editor HTML, laid out like TipTap's editor.getText().
+
+    Text blocks are joined with a blank line so offsets computed on the
+    server line up with the ones the editor uses for grammar highlights.
+    """
+    if not html:
+        return ""
+    if "<" not in html:
+        return html
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.parts)
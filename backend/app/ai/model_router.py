@@ -0,0 +1,128 @@
+import os
+import threading
+from collections import defaultdict
+from time import monotonic
+from typing import Dict, List, Tuple
+
+from ..metrics import AI_UPSTREAM_REQUESTS, AI_UPSTREAM_SECONDS
+from .upstream import CircuitBreaker, LatencyTracker, get_tracker
+
+LARGE_MODEL = os.getenv("GROQ_LARGE_MODEL", "llama-3.3-70b-versatile")
+FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+
+# p95 latency (seconds) a model may show before it is considered degraded
+LATENCY_BUDGETS = {
+    "autocomplete": float(os.getenv("AI_AUTOCOMPLETE_BUDGET", "1.0")),
+}
+DEFAULT_BUDGET = float(os.getenv("AI_ENHANCE_BUDGET", "8.0"))
+
+
+class ModelRouter:
+    """Pick a Groq model per action and fail over when one degrades.
+
+    Autocomplete prefers the fast model, everything else the large one. A
+    model is skipped while its circuit is open, or while its rolling p95
+    latency for that action exceeds the action's budget or its error rate exceeds
+    `max_error_rate` (once there are `min_samples` observations). A degraded
+    model is probed again every `probe_interval` seconds so it can recover.
+    """
+
+    def __init__(self, large_model: str = LARGE_MODEL, fast_model: str = FAST_MODEL,
+                 max_error_rate: float = 0.25, min_samples: int = 10, probe_interval: float = 30.0):
+        self.large_model = large_model
+        self.fast_model = fast_model
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.probe_interval = probe_interval
+        self.last_attempt: Dict[str, float] = {}
+        # Per (model, action): a long enhance call says nothing about autocomplete latency
+        self.latency: Dict[Tuple[str, str], LatencyTracker] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {
+            model: CircuitBreaker(f"groq:{model}", failure_threshold=3, reset_timeout=30)
+            for model in (large_model, fast_model)
+        }
+        # (model, action) -> requests / failovers / tokens, for cost tuning
+        self.requests = defaultdict(int)
+        self.failovers = defaultdict(int)
+        self.tokens = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def preferred(self, action: str) -> List[str]:
+        if action == "autocomplete":
+            order = [self.fast_model, self.large_model]
+        else:
+            order = [self.large_model, self.fast_model]
+        return list(dict.fromkeys(order))
+
+    def candidates(self, action: str) -> List[str]:
+        """Models to try, in order; degraded ones go last rather than vanish"""
+        order = self.preferred(action)
+        now = monotonic()
+        healthy = [
+            m for m in order
+            if self.is_healthy(m, action) or now - self.last_attempt.get(m, 0.0) >= self.probe_interval
+        ]
+        return healthy + [m for m in order if m not in healthy]
+
+    def is_healthy(self, model: str, action: str) -> bool:
+        if self.breakers[model].state == "open":
+            return False
+        tracker = self.tracker(model, action)
+        if len(tracker.samples) < self.min_samples:
+            return True
+        budget = LATENCY_BUDGETS.get(action, DEFAULT_BUDGET)
+        return tracker.percentile(0.95) <= budget and tracker.error_rate() <= self.max_error_rate
+
+    def tracker(self, model: str, action: str) -> LatencyTracker:
+        tracker = self.latency.get((model, action))
+        if tracker is None:
+            tracker = self.latency.setdefault((model, action), get_tracker(f"groq:{model}:{action}"))
+        return tracker
+
+    def allow(self, model: str) -> bool:
+        return self.breakers[model].allow()
+
+    def record(self, model: str, action: str, seconds: float, ok: bool, tokens: int = 0):
+        self.last_attempt[model] = monotonic()
+        self.tracker(model, action).record(seconds, ok=ok)
+        if ok:
+            self.breakers[model].record_success()
+        else:
+            self.breakers[model].record_failure()
+        with self.lock:
+            self.requests[(model, action)] += 1
+            self.tokens[(model, action)] += tokens
+        AI_UPSTREAM_SECONDS.labels(model, action).observe(seconds)
+        AI_UPSTREAM_REQUESTS.labels(model, action, "ok" if ok else "error").inc()
+
+    def record_failover(self, model: str, action: str):
+        """`model` failed and the request moved on to another one"""
+        with self.lock:
+            self.failovers[(model, action)] += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            usage = {
+                f"{model}:{action}": {
+                    "requests": count,
+                    "tokens": self.tokens[(model, action)],
+                    "failovers": self.failovers.get((model, action), 0),
+                }
+                for (model, action), count in self.requests.items()
+            }
+        return {
+            "models": {
+                model: {
+                    "circuit": breaker.state,
+                    "actions": {
+                        action: tracker.snapshot()
+                        for (tracked, action), tracker in list(self.latency.items()) if tracked == model
+                    },
+                }
+                for model, breaker in self.breakers.items()
+            },
+            "usage": usage,
+        }
+
+
+model_router = ModelRouter()
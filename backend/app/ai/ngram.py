@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from ..db import get_document_content
+from ..log import redact
+from .html_text import html_to_text
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"[\w']+|[.,;:!?]")
+SENTENCE_END = {".", "!", "?"}
+
+
+class NGramModel:
+    """Next-word counts for 1..order-1 words of lowercase context"""
+
+    def __init__(self, text: str, order: int = 4):
+        self.order = order
+        self.counts: Dict[Tuple[str, ...], Counter] = defaultdict(Counter)
+        tokens = WORD_RE.findall(text)
+        lowered = [t.lower() for t in tokens]
+        for i in range(1, len(tokens)):
+            for n in range(1, order):
+                if i - n < 0:
+                    break
+                self.counts[tuple(lowered[i - n:i])][tokens[i]] += 1
+
+    def next_word(self, context: List[str], prefix: str = "") -> Optional[Tuple[str, float, int]]:
+        """Most likely next token for the longest known context: (token, confidence, count)"""
+        for n in range(min(len(context), self.order - 1), 0, -1):
+            counter = self.counts.get(tuple(context[-n:]))
+            if not counter:
+                continue
+            if prefix:
+                candidates = [(w, c) for w, c in counter.items()
+                              if w.lower().startswith(prefix) and len(w) > len(prefix)]
+            else:
+                candidates = list(counter.items())
+            if not candidates:
+                continue
+            total = sum(c for _, c in candidates)
+            word, count = max(candidates, key=lambda item: item[1])
+            return word, count / total, count
+        return None
+
+
+class NGramIndex:
+    """Per-room n-gram models answering autocomplete without an LLM call.
+
+    Models are rebuilt in a worker thread once edits to a room settle, so
+    lookups never pay for indexing. A suggestion is returned only when every
+    predicted word clears `threshold` confidence and `min_count` support.
+    """
+
+    def __init__(self, threshold: float = 0.6, min_count: int = 2, rebuild_delay: float = 1.0,
+                 max_rooms: int = 256):
+        self.enabled = os.getenv("NGRAM_AUTOCOMPLETE", "1") != "0"
+        self.threshold = threshold
+        self.min_count = min_count
+        self.rebuild_delay = rebuild_delay
+        self.max_rooms = max_rooms
+        self.models: "OrderedDict[str, NGramModel]" = OrderedDict()
+        self.pending: Dict[str, asyncio.Task] = {}
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_seconds = 0.0
+
+    def schedule_rebuild(self, room_id: str, html: Optional[str] = None):
+        """Rebuild a room's model after edits settle (html=None reloads from DB)"""
+        if not self.enabled:
+            return
+        task = self.pending.get(room_id)
+        if task and not task.done():
+            task.cancel()
+        self.pending[room_id] = asyncio.create_task(self._rebuild(room_id, html))
+
+    async def _rebuild(self, room_id: str, html: Optional[str]):
+        try:
+            await asyncio.sleep(self.rebuild_delay)
+            model = await asyncio.to_thread(self._build, room_id, html)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.warning("N-gram rebuild error: %s", e, extra={"room": redact(room_id)})
+            return
+        finally:
+            if self.pending.get(room_id) is asyncio.current_task():
+                del self.pending[room_id]
+        with self.lock:
+            self.models[room_id] = model
+            self.models.move_to_end(room_id)
+            while len(self.models) > self.max_rooms:
+                self.models.popitem(last=False)
+
+    def _build(self, room_id: str, html: Optional[str]) -> NGramModel:
+        if html is None:
+            html = get_document_content(room_id)
+        return NGramModel(html_to_text(html))
+
+    def forget(self, room_id: str):
+        task = self.pending.pop(room_id, None)
+        if task and not task.done():
+            task.cancel()
+        with self.lock:
+            self.models.pop(room_id, None)
+
+    def predict(self, room_id: str, context: str, max_words: int = 15) -> Optional[str]:
+        """High-confidence continuation of context, or None to fall back to the LLM"""
+        if not self.enabled:
+            return None
+        started = perf_counter()
+        with self.lock:
+            model = self.models.get(room_id)
+        if model is None:
+            if room_id not in self.pending:
+                self.schedule_rebuild(room_id)
+            self._record(started, hit=False)
+            return None
+
+        suggestion = self._continue(model, context, max_words)
+        self._record(started, hit=suggestion is not None)
+        return suggestion
+
+    def _continue(self, model: NGramModel, context: str, max_words: int) -> Optional[str]:
+        tokens = [t.lower() for t in WORD_RE.findall(context[-500:])]
+        if not tokens:
+            return None
+
+        parts = []
+        # A context ending mid-word: finish that word first
+        if not context[-1].isspace() and tokens[-1] not in SENTENCE_END:
+            prefix = tokens.pop()
+            guess = model.next_word(tokens, prefix)
+            if guess and guess[1] >= self.threshold and guess[2] >= self.min_count:
+                parts.append(guess[0][len(prefix):])
+                tokens.append(guess[0].lower())
+            elif not model.counts.get((prefix,)):
+                return None
+            else:
+                tokens.append(prefix)  # already a complete, known word
+
+        words = 0
+        while words < max_words:
+            guess = model.next_word(tokens)
+            if not guess or guess[1] < self.threshold or guess[2] < self.min_count:
+                break
+            word = guess[0]
+            joiner = "" if word in SENTENCE_END or word in {",", ";", ":"} else " "
+            if not parts and context[-1].isspace():
+                joiner = ""
+            parts.append(joiner + word)
+            tokens.append(word.lower())
+            words += 1
+            if word in SENTENCE_END:
+                break
+
+        if words == 0:
+            return None
+        return "".join(parts)
+
+    def _record(self, started: float, hit: bool):
+        with self.lock:
+            self.lookups += 1
+            self.hits += int(hit)
+            self.lookup_seconds += perf_counter() - started
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "min_count": self.min_count,
+                "rooms": len(self.models),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "avg_lookup_us": round(1e6 * self.lookup_seconds / self.lookups, 1) if self.lookups else 0.0,
+            }
+
+
+ngram_index = NGramIndex(
+    threshold=float(os.getenv("NGRAM_CONFIDENCE", "0.6")),
+    min_count=int(os.getenv("NGRAM_MIN_COUNT", "2")),
+)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from ..log import redact
+from ..connection import manager
+from ..transport import transport
+from .grammar_checker import grammar_checker
+from .html_text import html_to_text
+
+logger = logging.getLogger(__name__)
+
+
+class RoomGrammarAnalyzer:
+    """One debounced grammar check per room, shared by all collaborators.
+
+    Each edit (re)arms a per-room timer; once edits settle for `delay`
+    seconds the canonical document is checked once and the result is
+    published on the room channel, so every node delivers it to its local
+    sockets. Upstream grammar traffic therefore scales with active rooms.
+    """
+
+    def __init__(self, delay: float = 2.0, language: str = "en-US"):
+        self.enabled = os.getenv("ROOM_GRAMMAR", "1") != "0"
+        self.delay = delay
+        self.language = language
+        self.pending: Dict[str, asyncio.Task] = {}
+        # Last result per room, sent straight to new joiners
+        self.latest: Dict[str, str] = {}
+
+    def schedule(self, room_id: str, html: str):
+        if not self.enabled:
+            return
+        task = self.pending.get(room_id)
+        if task and not task.done():
+            task.cancel()
+        self.pending[room_id] = asyncio.create_task(self._run(room_id, html))
+
+    def latest_message(self, room_id: str) -> Optional[str]:
+        return self.latest.get(room_id)
+
+    def forget(self, room_id: str):
+        """Drop state for a room that no longer has local connections"""
+        task = self.pending.pop(room_id, None)
+        if task and not task.done():
+            task.cancel()
+        self.latest.pop(room_id, None)
+
+    async def _run(self, room_id: str, html: str):
+        try:
+            await asyncio.sleep(self.delay)
+            text = html_to_text(html)
+            errors = await grammar_checker.check(text, self.language)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.warning("Room grammar check error: %s", e, extra={"room": redact(room_id)})
+            return
+        finally:
+            if self.pending.get(room_id) is asyncio.current_task():
+                del self.pending[room_id]
+
+        grammar_msg = json.dumps({
+            "type": "grammar",
+            "errors": errors,
+            "count": len(errors)
+        })
+        self.latest[room_id] = grammar_msg
+        # Deliver here, and publish so the other servers deliver it to their sockets
+        await manager.broadcast_local(grammar_msg, room_id)
+        transport.publish(room_id, grammar_msg)
+
+
+room_grammar = RoomGrammarAnalyzer(delay=float(os.getenv("ROOM_GRAMMAR_DELAY", "2.0")))
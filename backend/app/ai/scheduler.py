@@ -0,0 +1,129 @@
+import asyncio
+import heapq
+import itertools
+import os
+from time import monotonic
+from typing import Callable, Dict, Optional
+
+from .upstream import LatencyTracker
+
+# Lower value = dispatched first
+PRIORITIES = {
+    "autocomplete": 0,
+    "fix": 1,
+}
+DEFAULT_PRIORITY = 2  # improve, expand, shorten, formal, casual
+
+# Seconds a request may spend queued + running before it is useless
+DEADLINES = {
+    "autocomplete": float(os.getenv("AI_AUTOCOMPLETE_DEADLINE", "3")),
+}
+DEFAULT_DEADLINE = float(os.getenv("AI_ENHANCE_DEADLINE", "30"))
+
+
+class DeadlineExceeded(Exception):
+    """The request expired before it could be dispatched"""
+
+
+class SchedulerFull(Exception):
+    """Too many requests are already waiting"""
+
+
+class _Job:
+    __slots__ = ("action", "fn", "args", "future", "enqueued_at", "deadline_at")
+
+    def __init__(self, action, fn, args, future, enqueued_at, deadline_at):
+        self.action = action
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.enqueued_at = enqueued_at
+        self.deadline_at = deadline_at
+
+
+class LLMScheduler:
+    """Global admission control for LLM calls.
+
+    Requests wait in a priority queue (autocomplete > fix > rewrites) and at
+    most `max_in_flight` run at once, each in a worker thread since the Groq
+    SDK is blocking. Work whose deadline has passed is dropped before
+    dispatch, and the remaining budget is passed to the call as `timeout`.
+    """
+
+    def __init__(self, max_in_flight: int = 4, max_queue: int = 64):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue = []
+        self.counter = itertools.count()
+        self.in_flight = 0
+        self.queue_wait: Dict[str, LatencyTracker] = {}
+        self.upstream_time: Dict[str, LatencyTracker] = {}
+        self.expired = 0
+        self.rejected = 0
+
+    async def submit(self, action: str, fn: Callable, *args, deadline: Optional[float] = None):
+        """Run fn(*args, timeout=<remaining seconds>) under the scheduler"""
+        if len(self.queue) >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerFull("AI request queue is full")
+
+        now = monotonic()
+        if deadline is None:
+            deadline = DEADLINES.get(action, DEFAULT_DEADLINE)
+        job = _Job(action, fn, args, asyncio.get_running_loop().create_future(), now, now + deadline)
+        heapq.heappush(self.queue, (PRIORITIES.get(action, DEFAULT_PRIORITY), next(self.counter), job))
+        self._dispatch()
+        return await job.future
+
+    def _dispatch(self):
+        while self.in_flight < self.max_in_flight and self.queue:
+            _, _, job = heapq.heappop(self.queue)
+            if job.future.done():
+                continue  # caller went away
+            now = monotonic()
+            self._tracker(self.queue_wait, job.action).record(now - job.enqueued_at)
+            if now >= job.deadline_at:
+                self.expired += 1
+                job.future.set_exception(DeadlineExceeded(f"{job.action} request expired in queue"))
+                continue
+            self.in_flight += 1
+            asyncio.create_task(self._run(job))
+
+    async def _run(self, job: _Job):
+        started = monotonic()
+        ok = True
+        try:
+            result = await asyncio.to_thread(job.fn, *job.args, timeout=job.deadline_at - started)
+            if not job.future.done():
+                job.future.set_result(result)
+        except Exception as e:
+            ok = False
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self._tracker(self.upstream_time, job.action).record(monotonic() - started, ok=ok)
+            self.in_flight -= 1
+            self._dispatch()
+
+    def _tracker(self, trackers: Dict[str, LatencyTracker], action: str) -> LatencyTracker:
+        tracker = trackers.get(action)
+        if tracker is None:
+            tracker = trackers[action] = LatencyTracker(action)
+        return tracker
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": len(self.queue),
+            "expired": self.expired,
+            "rejected": self.rejected,
+            "queue_wait": {action: t.snapshot() for action, t in self.queue_wait.items()},
+            "upstream_time": {action: t.snapshot() for action, t in self.upstream_time.items()},
+        }
+
+
+ai_scheduler = LLMScheduler(
+    max_in_flight=int(os.getenv("AI_MAX_IN_FLIGHT", "4")),
+    max_queue=int(os.getenv("AI_MAX_QUEUE", "64")),
+)
@@ -0,0 +1,183 @@
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+# Words, including inner apostrophes ("don't", "it’s")
+WORD_RE = re.compile(r"[A-Za-z]+(?:['’][A-Za-z]+)*")
+SENTENCE_END_RE = re.compile(r"[.!?]\s*$")
+
+
+class SpellChecker:
+    """In-process spelling engine using a SymSpell-style delete index.
+
+    The dictionary stores every word plus all of its deletes up to
+    `max_edit_distance` (restricted to the first `prefix_length` characters).
+    A lookup generates the query's deletes to the same distance and verifies each hit with a bounded
+    Damerau-Levenshtein distance, so most corrections cost a few dict probes.
+    The word list is loaded lazily on first use.
+    """
+
+    def __init__(self, path: str = None, max_edit_distance: int = 2, prefix_length: int = 7):
+        self.path = path or os.path.join(DATA_DIR, "en_frequency.txt")
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.words: Dict[str, int] = {}
+        self.deletes: Dict[str, List[str]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        # The same typos recur on every check of a document
+        self._cached_suggest = lru_cache(maxsize=4096)(self.suggest)
+
+    def supports(self, language: str) -> bool:
+        return language.lower().startswith("en")
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 2:
+                        continue
+                    word, count = parts[0].lower(), int(parts[1])
+                    self.words[word] = count
+                    for key in _deletes(word[:self.prefix_length], self.max_edit_distance):
+                        self.deletes.setdefault(key, []).append(word)
+            self._loaded = True
+            logger.info("Spell checker loaded", extra={"words": len(self.words)})
+
+    def is_known(self, word: str) -> bool:
+        self._ensure_loaded()
+        return word.lower() in self.words
+
+    def suggest(self, word: str, limit: int = 3) -> List[str]:
+        """Closest dictionary words, ordered by edit distance then frequency"""
+        self._ensure_loaded()
+        word = word.lower()
+        prefix = word[:self.prefix_length]
+
+        best = {}
+        seen = set()
+        # Query deletes up to max_edit_distance (within the prefix), fewest deletes
+        # first. Every word within distance d shares a key made of at most d deletes,
+        # so once `limit` words that close are found, deeper keys can't beat them.
+        level = {prefix}
+        for depth in range(self.max_edit_distance + 1):
+            for key in level:
+                for entry in self.deletes.get(key, ()):
+                    if entry in seen or abs(len(entry) - len(word)) > self.max_edit_distance:
+                        continue
+                    seen.add(entry)
+                    distance = _edit_distance(word, entry, self.max_edit_distance)
+                    if distance is not None:
+                        best[entry] = distance
+            if sum(1 for distance in best.values() if distance <= depth) >= limit:
+                break
+            level = {w[:i] + w[i + 1:] for w in level for i in range(len(w))}
+
+        ranked = sorted(best.items(), key=lambda item: (item[1], -self.words[item[0]]))
+        return [entry for entry, _ in ranked[:limit]]
+
+    def check(self, text: str) -> List[Dict]:
+        """Return spelling errors in the same schema as GrammarChecker"""
+        if not text:
+            return []
+        self._ensure_loaded()
+
+        errors = []
+        for match in WORD_RE.finditer(text):
+            token = match.group(0).replace("’", "'")
+            lowered = token.lower()
+            if len(token) < 2 or lowered in self.words or token.isupper():
+                continue
+            if lowered.endswith("'s") and lowered[:-2] in self.words:
+                continue
+            # Capitalised words mid-sentence are most likely names
+            if token[0].isupper() and not _at_sentence_start(text, match.start()):
+                continue
+
+            suggestions = list(self._cached_suggest(lowered))
+            if token[0].isupper():
+                suggestions = [s[:1].upper() + s[1:] for s in suggestions]
+            errors.append({
+                'type': 'spelling',
+                'start': match.start(),
+                'end': match.end(),
+                'message': 'Possible spelling mistake found.',
+                'suggestions': suggestions,
+                'category': 'TYPOS',
+                'rule_id': 'LOCAL_SPELLER'
+            })
+        return errors
+
+
+def _at_sentence_start(text: str, offset: int) -> bool:
+    before = text[max(0, offset - 20):offset]
+    return not before.strip() or bool(SENTENCE_END_RE.search(before)) or before.endswith("\n")
+
+
+def _deletes(word: str, max_distance: int) -> set:
+    """`word` and every string made by deleting up to max_distance characters from it"""
+    keys = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        keys |= frontier
+    return keys
+
+
+def _edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Optimal string alignment distance, or None if it exceeds max_distance"""
+    if a == b:
+        return 0
+    # A shared prefix or suffix never changes the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    if not a or not b:
+        return max(len(a), len(b))
+
+    # Only cells within max_distance of the diagonal can stay under the limit
+    over = max_distance + 1
+    previous2 = None
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [i if i <= max_distance else over] + [over] * len(b)
+        row_min = current[0]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return None
+        previous2, previous = previous, current
+    distance = previous[len(b)]
+    return distance if distance <= max_distance else None
+
+
+# Singleton instance
+spell_checker = SpellChecker()
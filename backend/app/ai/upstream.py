@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from time import monotonic
+from typing import Awaitable, Callable, Dict, Hashable
+
+from ..metrics import UPSTREAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised when an upstream call is refused because its circuit is open"""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures.
+
+    closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one trial call is let through (half-open) and its
+    outcome decides whether the circuit closes again or re-opens.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.half_open = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.half_open or monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.half_open:
+                return False  # a trial call is already in flight
+            if monotonic() - self.opened_at >= self.reset_timeout:
+                self.half_open = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.half_open = False
+
+    def release(self):
+        """Free a half-open trial slot whose call ended without an outcome"""
+        with self.lock:
+            self.half_open = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.half_open or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.half_open:
+                    logger.warning("Circuit opened", extra={"circuit": self.name, "failures": self.failures})
+                self.opened_at = monotonic()
+                self.half_open = False
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one upstream call"""
+
+    def __init__(self):
+        self.inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _t: self.inflight.pop(key, None))
+        # Shield so one cancelled waiter doesn't cancel the call for everyone
+        return await asyncio.shield(task)
+
+
+class LatencyTracker:
+    """Rolling latency and error-rate window for one upstream"""
+
+    def __init__(self, name: str, window: int = 200, histogram=None):
+        self.name = name
+        self.histogram = histogram  # optional pre-bound /metrics child
+        self.samples = deque(maxlen=window)  # (seconds, ok)
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool = True):
+        with self.lock:
+            self.samples.append((seconds, ok))
+            self.count += 1
+            self.total_seconds += seconds
+            if not ok:
+                self.errors += 1
+        if self.histogram is not None:
+            self.histogram.observe(seconds)
+
+    def percentile(self, q: float) -> float:
+        with self.lock:
+            values = sorted(s for s, _ in self.samples)
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(round(q * (len(values) - 1))))
+        return values[index]
+
+    def error_rate(self) -> float:
+        with self.lock:
+            if not self.samples:
+                return 0.0
+            return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(1000 * self.total_seconds / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(1000 * self.percentile(0.50), 2),
+            "p95_ms": round(1000 * self.percentile(0.95), 2),
+            "p99_ms": round(1000 * self.percentile(0.99), 2),
+            "window_error_rate": round(self.error_rate(), 4),
+        }
+
+
+# Trackers for every upstream the AI package talks to, keyed by name
+upstream_latency: Dict[str, LatencyTracker] = {}
+
+
+def get_tracker(name: str) -> LatencyTracker:
+    tracker = upstream_latency.get(name)
+    if tracker is None:
+        tracker = upstream_latency.setdefault(name, LatencyTracker(name, histogram=UPSTREAM_SECONDS.labels(name)))
+    return tracker
+
+
+def metrics_snapshot() -> dict:
+    return {name: tracker.snapshot() for name, tracker in upstream_latency.items()}
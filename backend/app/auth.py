@@ -1,10 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends, Header, UploadFile, File
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, Header, UploadFile, File, Request, Query
+from fastapi.responses import StreamingResponse, FileResponse, Response
 from typing import Optional
 from .models import (
     RegisterRequest, LoginRequest, LoginResponse,
     CreateRoomRequest, RoomResponse,
-    InviteUserRequest, InvitationResponse, AcceptInviteRequest
+    InviteUserRequest, InvitationResponse, AcceptInviteRequest,
+    BatchInviteRequest, BatchRoleRequest, BatchDeleteRoomsRequest
 )
 from .db import (
     create_user, verify_user, get_user_by_id, get_user_by_email,
@@ -12,13 +13,25 @@ from .db import (
     create_invitation, get_user_invitations, accept_invitation, decline_invitation,
     grant_room_access, revoke_room_access,
     get_all_users, get_all_rooms, delete_user_admin, delete_room_admin,
-    make_user_admin, check_is_admin, update_document_content
+    make_user_admin, check_is_admin, update_document_content,
+    get_document_revision, get_document_with_revision,
+    create_invitations_bulk, set_room_roles_bulk, delete_rooms_bulk
 )
 from .jwt_utils import create_access_token, verify_token
 from .redis_client import r
-import io
+from .room_state import room_store
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, page
+from .export.pdf_renderer import pdf_renderer
+from .export.docx_writer import html_to_docx
+from .export.docx_importer import docx_importer, ImportTooLarge, InvalidDocument
+from .export.blob_store import blob_store, BLOB_URL_PREFIX, MEDIA_TYPES
+from .export.worker_pool import WorkerBusy, WorkerTimeout
+import asyncio
+import hashlib
+import logging
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
@@ -100,10 +113,15 @@ async def create_new_room(
 
 
 @router.get("/api/rooms")
-async def list_rooms(current_user: dict = Depends(get_current_user)):
-    """List all rooms user has access to"""
-    rooms = get_user_rooms(current_user["user_id"])
-    return {"rooms": rooms}
+async def list_rooms(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """List rooms user has access to, one page at a time"""
+    rows = get_user_rooms(current_user["user_id"], limit + 1, decode_cursor(cursor, 2))
+    result = page(rows, limit, key=lambda room: (room["updated_at"], room["room_id"]))
+    return {"rooms": result["items"], "next_cursor": result["next_cursor"]}
 
 
 @router.delete("/api/rooms/{room_id:path}")
@@ -119,30 +137,35 @@ async def delete_own_room(
     
     # Use the admin delete function since it does the same thing
     delete_room_admin(room_id)
+    room_store.drop(room_id)
     return {"message": "Room deleted successfully"}
 
 
 @router.get("/api/rooms/{room_id:path}/users")
 async def get_room_users_endpoint(
     room_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all users with access to a room"""
+    """Get users with access to a room, one page at a time"""
     # Check if user has access to the room
     role = check_room_access(room_id, current_user["user_id"])
     if not role:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    users = get_room_users(room_id)
+    rows = get_room_users(room_id, limit + 1, decode_cursor(cursor, 1))
+    result = page(rows, limit, key=lambda user: (user["user_id"],))
+    users = result["items"]
     
     # Get active users from Redis
-    active_user_ids = list(r.smembers(f"presence:{room_id}"))
+    active_user_ids = set(r.smembers(f"presence:{room_id}"))
     
     # Mark active users
     for user in users:
         user["is_online"] = user["user_id"] in active_user_ids
     
-    return {"room_id": room_id, "users": users, "count": len(users)}
+    return {"room_id": room_id, "users": users, "count": len(users), "next_cursor": result["next_cursor"]}
 
 
 @router.post("/api/invitations")
@@ -176,11 +199,34 @@ async def invite_user(
     return {"invite_id": invite_id, "message": "Invitation sent"}
 
 
+@router.post("/api/invitations/batch")
+async def invite_users_batch(
+    req: BatchInviteRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Invite many users to a room in one transaction"""
+    role = check_room_access(req.room_id, current_user["user_id"])
+    if role not in ["owner", "editor"]:
+        raise HTTPException(status_code=403, detail="Only owners and editors can invite users")
+    
+    results = create_invitations_bulk(
+        req.room_id,
+        current_user["user_id"],
+        [(item.invited_email, item.role) for item in req.invites]
+    )
+    return {"results": results, "invited": sum(1 for item in results if item["ok"])}
+
+
 @router.get("/api/invitations")
-async def list_invitations(current_user: dict = Depends(get_current_user)):
-    """Get all pending invitations for current user"""
-    invitations = get_user_invitations(current_user["email"])
-    return {"invitations": invitations}
+async def list_invitations(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get pending invitations for current user, one page at a time"""
+    rows = get_user_invitations(current_user["email"], limit + 1, decode_cursor(cursor, 2))
+    result = page(rows, limit, key=lambda invite: (invite["created_at"], invite["invite_id"]))
+    return {"invitations": result["items"], "next_cursor": result["next_cursor"]}
 
 
 @router.post("/api/invitations/{invite_id}/accept")
@@ -227,6 +273,25 @@ async def remove_user_from_room(
     return {"message": "User removed from room"}
 
 
+@router.put("/api/rooms/{room_id:path}/roles")
+async def update_user_roles_batch(
+    room_id: str,
+    req: BatchRoleRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Grant or change roles for many users in one transaction (owner only)"""
+    current_role = check_room_access(room_id, current_user["user_id"])
+    if current_role != "owner":
+        raise HTTPException(status_code=403, detail="Only the owner can change roles")
+    
+    results = set_room_roles_bulk(
+        room_id,
+        current_user["user_id"],
+        [(change.user_id, change.role) for change in req.changes]
+    )
+    return {"results": results, "updated": sum(1 for item in results if item["ok"])}
+
+
 @router.put("/api/rooms/{room_id:path}/users/{user_id}/role")
 async def update_user_role(
     room_id: str,
@@ -257,24 +322,34 @@ async def update_user_role(
 async def get_admin_user(current_user: dict = Depends(get_current_user)) -> dict:
     """Verify that the current user is an admin"""
     is_admin = check_is_admin(current_user["user_id"])
-    print(f"Admin check for user {current_user['user_id'][:8]}...: is_admin={is_admin}")
+    logger.debug("Admin check", extra={"user": current_user["user_id"][:8], "is_admin": is_admin})
     if not is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
 
 @router.get("/api/admin/users")
-async def admin_get_all_users(admin_user: dict = Depends(get_admin_user)):
-    """Get all users (admin only)"""
-    users = get_all_users()
-    return {"users": users}
+async def admin_get_all_users(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Get users one page at a time (admin only)"""
+    rows = get_all_users(limit + 1, decode_cursor(cursor, 2))
+    result = page(rows, limit, key=lambda user: (user["created_at"], user["user_id"]))
+    return {"users": result["items"], "next_cursor": result["next_cursor"]}
 
 
 @router.get("/api/admin/rooms")
-async def admin_get_all_rooms(admin_user: dict = Depends(get_admin_user)):
-    """Get all rooms (admin only)"""
-    rooms = get_all_rooms()
-    return {"rooms": rooms}
+async def admin_get_all_rooms(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Get rooms one page at a time (admin only)"""
+    rows = get_all_rooms(limit + 1, decode_cursor(cursor, 2))
+    result = page(rows, limit, key=lambda room: (room["created_at"], room["room_id"]))
+    return {"rooms": result["items"], "next_cursor": result["next_cursor"]}
 
 
 @router.delete("/api/admin/users/{user_id}")
@@ -286,7 +361,7 @@ async def admin_delete_user(
     if user_id == admin_user["user_id"]:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
     
-    delete_user_admin(user_id)
+    room_store.drop(*delete_user_admin(user_id))
     return {"message": "User deleted successfully"}
 
 
@@ -297,9 +372,21 @@ async def admin_delete_room(
 ):
     """Delete a room (admin only)"""
     delete_room_admin(room_id)
+    room_store.drop(room_id)
     return {"message": "Room deleted successfully"}
 
 
+@router.post("/api/admin/rooms/batch-delete")
+async def admin_delete_rooms_batch(
+    req: BatchDeleteRoomsRequest,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Delete many rooms in one transaction (admin only)"""
+    results = delete_rooms_bulk(req.room_ids)
+    room_store.drop(*(item["room_id"] for item in results if item["deleted"]))
+    return {"results": results, "deleted": sum(1 for item in results if item["deleted"])}
+
+
 @router.post("/api/admin/users/{user_id}/make-admin")
 async def admin_make_admin(
     user_id: str,
@@ -317,32 +404,56 @@ class DownloadRequest(BaseModel):
     content: str
 
 
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
 @router.post("/api/upload-docx")
 async def upload_docx(
+    request: Request,
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
 ):
     """Upload a DOCX file and convert to HTML"""
     try:
-        from docx import Document
-        import mammoth
-        
-        # Read the uploaded file
-        contents = await file.read()
-        
-        # Convert DOCX to HTML using mammoth
-        result = mammoth.convert_to_html(io.BytesIO(contents))
-        html_content = result.value
-        
-        return {"html_content": html_content, "messages": result.messages}
+        # Size-capped, converted in a worker process; images become blob URLs
+        html_content, messages = await docx_importer.convert(file)
     except ImportError:
         raise HTTPException(
             status_code=500, 
             detail="Document conversion libraries not installed. Run: pip install python-docx mammoth"
         )
+    except ImportTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidDocument as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkerBusy:
+        raise HTTPException(status_code=503, detail="Too many imports in progress. Please try again shortly.")
+    except WorkerTimeout:
+        raise HTTPException(status_code=504, detail="Document conversion timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+    # The editor runs on another origin, so image URLs must be absolute
+    base_url = str(request.base_url).rstrip("/")
+    html_content = html_content.replace(f'src="{BLOB_URL_PREFIX}', f'src="{base_url}{BLOB_URL_PREFIX}')
+    return {"html_content": html_content, "messages": messages}
+
+
+@router.get("/api/blobs/{name}")
+async def get_blob(name: str):
+    """Serve an imported image (content-addressed, so cacheable forever)"""
+    path = blob_store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES[name.rsplit(".", 1)[1]],
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "X-Content-Type-Options": "nosniff",
+        }
+    )
+
 
 @router.post("/api/download-pdf")
 async def download_pdf(
@@ -350,42 +461,18 @@ async def download_pdf(
     current_user: dict = Depends(get_current_user)
 ):
     """Download document as PDF"""
+    # Check if user has access to the room
+    role = check_room_access(req.room_id, current_user["user_id"])
+    if not role:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
     try:
-        from weasyprint import HTML
-        
-        # Check if user has access to the room
-        role = check_room_access(req.room_id, current_user["user_id"])
-        if not role:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Create PDF from HTML content
-        html_with_styles = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    line-height: 1.6;
-                    padding: 2cm;
-                    max-width: 21cm;
-                    margin: 0 auto;
-                }}
-                h1, h2, h3 {{ margin-top: 1em; margin-bottom: 0.5em; }}
-                p {{ margin: 0.5em 0; }}
-            </style>
-        </head>
-        <body>
-            {req.content}
-        </body>
-        </html>
-        """
-        
-        pdf_bytes = HTML(string=html_with_styles).write_pdf()
+        # Rendered in a worker process and cached by content hash
+        pdf_path = await pdf_renderer.render(req.content)
         
-        return StreamingResponse(
-            io.BytesIO(pdf_bytes),
+        # Stream from disk rather than holding the PDF in memory
+        return FileResponse(
+            pdf_path,
             media_type="application/pdf",
             headers={"Content-Disposition": f"attachment; filename=document.pdf"}
         )
@@ -394,6 +481,10 @@ async def download_pdf(
             status_code=500,
             detail="PDF generation library not installed. Run: pip install weasyprint"
         )
+    except WorkerBusy:
+        raise HTTPException(status_code=503, detail="Too many exports in progress. Please try again shortly.")
+    except WorkerTimeout:
+        raise HTTPException(status_code=504, detail="PDF generation timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
 
@@ -404,51 +495,133 @@ async def download_docx(
     current_user: dict = Depends(get_current_user)
 ):
     """Download document as DOCX"""
+    # Check if user has access to the room
+    role = check_room_access(req.room_id, current_user["user_id"])
+    if not role:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
     try:
-        from docx import Document
-        from bs4 import BeautifulSoup
-        
-        # Check if user has access to the room
-        role = check_room_access(req.room_id, current_user["user_id"])
-        if not role:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Create a new Document
-        doc = Document()
-        
-        # Parse HTML content
-        soup = BeautifulSoup(req.content, 'html.parser')
-        
-        # Convert HTML to DOCX paragraphs
-        for element in soup.find_all(['p', 'h1', 'h2', 'h3', 'ul', 'ol', 'li']):
-            text = element.get_text()
-            if element.name == 'h1':
-                doc.add_heading(text, level=1)
-            elif element.name == 'h2':
-                doc.add_heading(text, level=2)
-            elif element.name == 'h3':
-                doc.add_heading(text, level=3)
-            elif element.name == 'p':
-                doc.add_paragraph(text)
-            elif element.name in ['li']:
-                doc.add_paragraph(text, style='List Bullet')
-        
-        # Save to bytes
-        docx_bytes = io.BytesIO()
-        doc.save(docx_bytes)
-        docx_bytes.seek(0)
+        # Off the event loop: a long document would stall every socket on this worker
+        docx_bytes = await asyncio.to_thread(html_to_docx, req.content, image_loader=blob_store.load)
         
         return StreamingResponse(
             docx_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            media_type=DOCX_MEDIA_TYPE,
             headers={"Content-Disposition": f"attachment; filename=document.docx"}
         )
     except ImportError:
         raise HTTPException(
             status_code=500,
-            detail="Document libraries not installed. Run: pip install python-docx beautifulsoup4"
+            detail="Document libraries not installed. Run: pip install python-docx"
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating DOCX: {str(e)}")
 
 
+# ============ Server-side Export Endpoints ============
+
+def _export_etag(room_id: str, revision: int, fmt: str) -> str:
+    room_hash = hashlib.sha1(room_id.encode("utf-8")).hexdigest()[:12]
+    return f'"{fmt}-{room_hash}-r{revision}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _load_export(room_id: str, user_id: str, fmt: str, revision: Optional[int],
+                 if_none_match: Optional[str]) -> tuple:
+    """(etag, content) for an export; content is None when the client's copy is current"""
+    role = check_room_access(room_id, user_id)
+    if not role:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    # A room open on this node is newer in memory than in the DB
+    state = room_store.peek(room_id)
+    if state is not None:
+        current_revision = state.revision
+    else:
+        # Cheap revision lookup first so a 304 never loads the document
+        current_revision = get_document_revision(room_id)
+    if current_revision is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    if revision is not None and revision != current_revision:
+        raise HTTPException(status_code=409, detail=f"Revision {revision} is not the current revision ({current_revision})")
+    
+    etag = _export_etag(room_id, current_revision, fmt)
+    if _etag_matches(if_none_match, etag):
+        return etag, None
+    
+    if state is not None:
+        return etag, state.content
+    loaded = get_document_with_revision(room_id)
+    if loaded is None:
+        # Deleted since the revision lookup
+        raise HTTPException(status_code=404, detail="Room not found")
+    content, loaded_revision = loaded
+    return _export_etag(room_id, loaded_revision, fmt), content
+
+
+@router.get("/api/rooms/{room_id:path}/export/pdf")
+async def export_pdf(
+    room_id: str,
+    revision: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Export the stored document as PDF (supports If-None-Match)"""
+    etag, content = _load_export(room_id, current_user["user_id"], "pdf", revision, if_none_match)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if content is None:
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        pdf_path = await pdf_renderer.render(content)
+        return FileResponse(
+            pdf_path,
+            media_type="application/pdf",
+            headers={**headers, "Content-Disposition": f"attachment; filename=document.pdf"}
+        )
+    except ImportError:
+        raise HTTPException(
+            status_code=500,
+            detail="PDF generation library not installed. Run: pip install weasyprint"
+        )
+    except WorkerBusy:
+        raise HTTPException(status_code=503, detail="Too many exports in progress. Please try again shortly.")
+    except WorkerTimeout:
+        raise HTTPException(status_code=504, detail="PDF generation timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
+
+
+@router.get("/api/rooms/{room_id:path}/export/docx")
+async def export_docx(
+    room_id: str,
+    revision: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Export the stored document as DOCX (supports If-None-Match)"""
+    etag, content = _load_export(room_id, current_user["user_id"], "docx", revision, if_none_match)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if content is None:
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        docx_bytes = await asyncio.to_thread(html_to_docx, content, image_loader=blob_store.load)
+        return StreamingResponse(
+            docx_bytes,
+            media_type=DOCX_MEDIA_TYPE,
+            headers={**headers, "Content-Disposition": f"attachment; filename=document.docx"}
+        )
+    except ImportError:
+        raise HTTPException(
+            status_code=500,
+            detail="Document libraries not installed. Run: pip install python-docx"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating DOCX: {str(e)}")
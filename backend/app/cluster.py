@@ -0,0 +1,147 @@
+"""Room affinity: each room is served by one node.
+
+Nodes register in Redis with a heartbeat, and every node builds the same
+consistent-hash ring from the live set. A WebSocket for a room this node
+does not own gets a `redirect` message with the owner's URL and is closed
+with REDIRECT_CLOSE_CODE, so all editors of a room end up on one node. That
+node holds the room's live state and does its writes.
+
+When nodes join or leave, the ring changes for only ~1/N of the rooms.
+Each node redirects its clients in rooms it no longer owns. During a move
+both nodes stay subscribed to the room's channel, so edits keep flowing
+while clients reconnect.
+
+Disabled unless ROOM_AFFINITY=1. Each node then needs NODE_ID and
+NODE_URL, the base WebSocket URL clients can reach it on
+(e.g. ws://10.0.0.5:8000). If Redis is unreachable, a node serves every
+room itself.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from bisect import bisect
+from typing import Callable, Dict, List, Optional
+
+from .metrics import NODE_ID, Counter, Gauge
+from .redis_client import r
+
+REDIRECT_CLOSE_CODE = 4307
+MAX_REDIRECTS = 3
+VIRTUAL_NODES = 64
+
+NODES_KEY = "cluster:nodes"
+NODE_KEY = "cluster:node:{}"
+
+CLUSTER_NODES = Gauge("syncwrite_cluster_nodes", "Live nodes in this node's hash ring")
+ROOM_REDIRECTS = Counter("syncwrite_room_redirects_total", "WebSocket clients redirected to a room's owner node")
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, nodes: List[str], vnodes: int = VIRTUAL_NODES):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self.keys = [point for point, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self.keys:
+            return None
+        index = bisect(self.keys, _hash(key)) % len(self.keys)
+        return self.nodes[index]
+
+
+class Cluster:
+    def __init__(self, node_id: str, url: str, enabled: bool, ttl: float):
+        self.node_id = node_id
+        self.url = url
+        self.enabled = enabled
+        self.ttl = ttl
+        self.members: Dict[str, str] = {node_id: url}
+        self.ring = HashRing([node_id])
+        self.task: Optional[asyncio.Task] = None
+        # Called (synchronously, from the refresh task) when membership changes
+        self.on_change: List[Callable[[], None]] = []
+
+    def owner(self, room_id: str) -> str:
+        if not self.enabled:
+            return self.node_id
+        return self.ring.owner(room_id) or self.node_id
+
+    def is_local(self, room_id: str) -> bool:
+        return self.owner(room_id) == self.node_id
+
+    def url_for(self, node_id: str) -> Optional[str]:
+        return self.members.get(node_id)
+
+    def _heartbeat(self):
+        r.set(NODE_KEY.format(self.node_id), self.url, ex=int(self.ttl))
+        r.sadd(NODES_KEY, self.node_id)
+
+    def _live_members(self) -> Dict[str, str]:
+        node_ids = sorted(r.smembers(NODES_KEY))
+        urls = r.mget([NODE_KEY.format(node_id) for node_id in node_ids]) if node_ids else []
+        dead = [node_id for node_id, url in zip(node_ids, urls) if url is None]
+        if dead:
+            r.srem(NODES_KEY, *dead)
+        return {node_id: url for node_id, url in zip(node_ids, urls) if url is not None}
+
+    def refresh(self):
+        """Heartbeat, then rebuild the ring if the live set changed"""
+        try:
+            self._heartbeat()
+            members = self._live_members()
+        except Exception as e:
+            logger.error("Cluster registry unavailable, serving all rooms locally: %s", e)
+            members = {self.node_id: self.url}
+        members.setdefault(self.node_id, self.url)
+        if members == self.members:
+            return
+        added, removed = members.keys() - self.members.keys(), self.members.keys() - members.keys()
+        self.members = members
+        self.ring = HashRing(list(members))
+        CLUSTER_NODES.set(len(members))
+        logger.info("Cluster membership changed", extra={
+            "nodes": sorted(members), "joined": sorted(added), "left": sorted(removed),
+        })
+        for callback in self.on_change:
+            callback()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            self.refresh()
+
+    def start(self):
+        if not self.enabled or self.task is not None:
+            return
+        self.refresh()
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Leave the ring right away instead of waiting for the TTL"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        self.task = None
+        try:
+            r.delete(NODE_KEY.format(self.node_id))
+            r.srem(NODES_KEY, self.node_id)
+        except Exception as e:
+            logger.warning("Could not deregister node: %s", e)
+
+
+cluster = Cluster(
+    node_id=NODE_ID,
+    url=os.getenv("NODE_URL", "ws://127.0.0.1:8000"),
+    enabled=os.getenv("ROOM_AFFINITY", "0") == "1",
+    ttl=float(os.getenv("CLUSTER_NODE_TTL", "15")),
+)
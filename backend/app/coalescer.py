@@ -0,0 +1,183 @@
+"""Per-room edit coalescing: at most one broadcast per room per tick.
+
+Clients send the whole document on every edit, so a fast typist (or a
+client that sends every keystroke) makes the node apply, cache, publish
+and fan out the full document 30+ times a second per room. EditCoalescer
+caps that at one broadcast per room every ROOM_EDIT_TICK_MS.
+
+The first edit in a quiet room goes out at once. Edits arriving within a
+tick of the room's last broadcast are held, each replacing the one before,
+and only the latest goes out when the tick ends. A broadcast is one
+revision, one document cache write, one Redis message and one send per
+connection, however many edits it stands for. A held edit waits at most
+one tick. The database write-back already runs at a lower cadence (see
+ROOM_FLUSH_INTERVAL in room_state.py).
+
+Every edit is still acked, with the revision it was folded into, and acks
+go out before the broadcast. A sender whose edit was superseded within
+the tick by someone else's then gets the merged content at that same
+revision, so it ends up where everyone else is.
+
+Environment:
+  ROOM_EDIT_TICK_MS  least time between broadcasts of a room's edits (default 40);
+                     0 broadcasts every edit as it arrives
+"""
+
+import asyncio
+import json
+import logging
+import os
+from time import perf_counter, time
+from typing import Dict, List, Set
+
+from fastapi import WebSocket
+
+from .ai.ngram import ngram_index
+from .ai.room_grammar import room_grammar
+from .connection import manager
+from .log import redact
+from .metrics import (
+    NODE_ID, WS_SEND_ERRORS, FANOUT_LOCAL, REDIS_PUBLISH_SECONDS, Counter, Histogram
+)
+from .room_state import room_store
+from .tracing import NOOP_SPAN
+from .transport import transport
+
+EDIT_BROADCASTS = Counter("syncwrite_edit_broadcasts_total", "Edit broadcasts (one per room per tick at most)")
+EDITS_COALESCED = Counter("syncwrite_edits_coalesced_total", "Edits superseded by a later edit in the same tick")
+EDIT_HOLD_SECONDS = Histogram("syncwrite_edit_hold_seconds", "Time the first edit of a broadcast waited for its room's tick")
+
+logger = logging.getLogger(__name__)
+
+
+class PendingEdits:
+    """Edits held for one room until its tick ends"""
+    __slots__ = ("content", "username", "websocket", "acks", "traces", "held_at")
+
+    def __init__(self, held_at: float):
+        self.content = ""
+        self.username = ""
+        # Sender of the latest edit; it already has the merged content
+        self.websocket = None
+        # One entry per edit, in arrival order
+        self.acks: List[WebSocket] = []
+        self.traces = []
+        self.held_at = held_at
+
+
+class EditCoalescer:
+    def __init__(self, tick: float):
+        self.tick = tick
+        self.pending: Dict[str, PendingEdits] = {}
+        # room_id -> loop time of its last broadcast
+        self.last_sent: Dict[str, float] = {}
+        # Held broadcasts in progress; the loop only keeps weak references to tasks
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, room_id: str, websocket: WebSocket, username: str, content: str, trace=NOOP_SPAN):
+        """Take one edit; broadcasts now if the room is quiet, otherwise at the end of its tick"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        pending = self.pending.get(room_id)
+        first = pending is None
+        if first:
+            pending = PendingEdits(now)
+        pending.content = content
+        pending.username = username
+        pending.websocket = websocket
+        pending.acks.append(websocket)
+        pending.traces.append(trace)
+        if not first:
+            return
+        wait = self.last_sent.get(room_id, now - self.tick) + self.tick - now
+        if wait <= 0:
+            await self._broadcast_logged(room_id, pending)
+        else:
+            self.pending[room_id] = pending
+            loop.call_later(wait, self._start_held, room_id)
+
+    def _start_held(self, room_id: str):
+        task = asyncio.create_task(self._broadcast_held(room_id))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _broadcast_held(self, room_id: str):
+        pending = self.pending.pop(room_id, None)
+        if pending is not None:
+            await self._broadcast_logged(room_id, pending)
+
+    async def _broadcast_logged(self, room_id: str, pending: PendingEdits):
+        # A failed broadcast (e.g. Redis down) must not take the sender's connection handler with it
+        try:
+            await self.broadcast(room_id, pending)
+        except Exception as e:
+            logger.error("Edit broadcast failed: %s", e, extra={"room": redact(room_id)})
+
+    async def broadcast(self, room_id: str, pending: PendingEdits):
+        """Apply, publish and fan out the latest of a room's held edits"""
+        loop = asyncio.get_running_loop()
+        if room_id in manager.active_connections:
+            self.last_sent[room_id] = loop.time()
+        EDIT_BROADCASTS.inc()
+        EDITS_COALESCED.inc(len(pending.acks) - 1)
+        EDIT_HOLD_SECONDS.observe(loop.time() - pending.held_at)
+
+        # The last sampled edit carries the pipeline spans; the others end here
+        trace = next((t for t in reversed(pending.traces) if t.sampled), NOOP_SPAN)
+        for other in pending.traces:
+            if other is not trace:
+                other.set("coalesced", True)
+                other.end()
+        trace.set("edits", len(pending.traces))
+        data = pending.content
+
+        # 1. Update the room's live state; it is written back to the DB in the background
+        with trace.child("state.apply"):
+            revision = room_store.apply_edit(room_id, data)
+
+        # 2. Publish to REDIS so other servers hear it
+        # sent_at (and traceparent, if sampled) go first so listeners can
+        # read them without parsing the document
+        publish_span = trace.child("redis.publish")
+        envelope = {"sent_at": time()}
+        if publish_span.sampled:
+            envelope["traceparent"] = publish_span.traceparent()
+        # node: where the edit was made, and so where it is persisted
+        envelope.update(type="content", data=data, edited_by=pending.username, revision=revision, node=NODE_ID)
+        content_msg = json.dumps(envelope)
+        started = perf_counter()
+        transport.publish(room_id, content_msg)
+        REDIS_PUBLISH_SECONDS.observe(perf_counter() - started)
+        publish_span.end()
+
+        # 3. Tell each sender which revision its edits became, so it can resume from there.
+        # Before the broadcast: a sender overtaken in this tick then takes the merged content.
+        ack_msg = json.dumps({"type": "ack", "revision": revision})
+        for websocket in pending.acks:
+            try:
+                await websocket.send_text(ack_msg)
+            except Exception:
+                WS_SEND_ERRORS.inc()
+
+        # 4. Broadcast to other people on THIS server
+        started = perf_counter()
+        with trace.child("fanout.local") as fanout_span:
+            await manager.broadcast_local(content_msg, room_id, sender=pending.websocket, span=fanout_span)
+        FANOUT_LOCAL.observe(perf_counter() - started)
+        trace.end()
+
+        # 5. Re-check grammar and refresh autocomplete model once edits settle
+        room_grammar.schedule(room_id, data)
+        ngram_index.schedule_rebuild(room_id, data)
+
+    async def flush(self):
+        """Broadcast every held edit now (on shutdown)"""
+        for room_id in list(self.pending):
+            await self._broadcast_held(room_id)
+
+    def forget(self, room_id: str):
+        """Drop a room's tick once its last connection has left"""
+        self.last_sent.pop(room_id, None)
+
+
+coalescer = EditCoalescer(tick=float(os.getenv("ROOM_EDIT_TICK_MS", "40")) / 1000)
@@ -1,8 +1,13 @@
+import asyncio
 import json
 from typing import Dict, List, Tuple
 from fastapi import WebSocket
 from .redis_client import r
 from .db import get_user_by_id
+from .metrics import WS_CONNECTIONS, WS_ROOMS, WS_SENDS, WS_SEND_ERRORS
+from .tracing import NOOP_SPAN
+from .cluster import MAX_REDIRECTS, REDIRECT_CLOSE_CODE, ROOM_REDIRECTS, cluster
+from .transport import transport
 
 class ConnectionManager:
     def __init__(self):
@@ -13,7 +18,11 @@ class ConnectionManager:
         await websocket.accept()
         if room_id not in self.active_connections:
             self.active_connections[room_id] = []
+            # Hear the room's messages from other nodes while it has connections here
+            transport.subscribe(room_id)
         self.active_connections[room_id].append((websocket, user_id, username, role))
+        WS_CONNECTIONS.inc()
+        WS_ROOMS.set(len(self.active_connections))
 
         # Add to Redis Presence Set
         r.sadd(f"presence:{room_id}", user_id)
@@ -22,28 +31,51 @@ class ConnectionManager:
     async def disconnect(self, websocket: WebSocket, room_id: str, user_id: str):
         if room_id in self.active_connections:
             # Remove the connection
-            self.active_connections[room_id] = [
+            remaining = [
                 conn for conn in self.active_connections[room_id]
                 if conn[0] != websocket
             ]
+            if len(remaining) < len(self.active_connections[room_id]):
+                WS_CONNECTIONS.dec()
+            if remaining:
+                self.active_connections[room_id] = remaining
+            else:
+                del self.active_connections[room_id]
+                transport.unsubscribe(room_id)
+            WS_ROOMS.set(len(self.active_connections))
         
         # Remove from Redis Presence Set
         r.srem(f"presence:{room_id}", user_id)
         await self.broadcast_presence(room_id)
 
-    async def broadcast_local(self, message: str, room_id: str, sender: WebSocket = None):
-        if room_id in self.active_connections:
-            for connection_tuple in list(self.active_connections[room_id]):
-                connection = connection_tuple[0]
-                try:
-                    msg_data = json.loads(message)
-                    if msg_data.get("type") == "presence":
-                        await connection.send_text(message)
-                    elif connection != sender:
-                        await connection.send_text(message)
-                except Exception:
-                    if connection != sender:
-                        await connection.send_text(message)
+    async def broadcast_local(self, message: str, room_id: str, sender: WebSocket = None, span=NOOP_SPAN):
+        connections = self.active_connections.get(room_id)
+        if not connections:
+            return
+
+        # Presence goes to the sender too; parse once per message, not per connection
+        skip = sender
+        if sender is not None:
+            try:
+                if json.loads(message).get("type") == "presence":
+                    skip = None
+            except ValueError:
+                pass
+
+        sent = 0
+        for connection_tuple in list(connections):
+            connection = connection_tuple[0]
+            if connection is skip:
+                continue
+            try:
+                with span.child("ws.send"):
+                    await connection.send_text(message)
+                sent += 1
+            except Exception:
+                # One dead socket must not stop delivery to the rest of the room
+                WS_SEND_ERRORS.inc()
+        WS_SENDS.inc(sent)
+        span.set("sent", sent)
 
     async def broadcast_presence(self, room_id: str):
         user_ids = list(r.smembers(f"presence:{room_id}"))
@@ -56,7 +88,32 @@ class ConnectionManager:
                     "username": user["username"]
                 })
         presence_msg = json.dumps({"type": "presence", "users": users})
-        # Publish to Redis so all servers hear the new user list
-        r.publish(room_id, presence_msg)
+        await self.broadcast_local(presence_msg, room_id)
+        # And to the other servers
+        transport.publish(room_id, presence_msg)
+
+    async def redirect(self, websocket: WebSocket, owner: str):
+        """Point a client at the node that owns its room, then close"""
+        ROOM_REDIRECTS.inc()
+        await websocket.send_text(json.dumps({
+            "type": "redirect",
+            "node": owner,
+            "url": cluster.url_for(owner),
+            "max_redirects": MAX_REDIRECTS,
+        }))
+        await websocket.close(code=REDIRECT_CLOSE_CODE, reason="Room is served by another node")
+
+    async def redirect_moved_rooms(self):
+        """After a ring change, send clients of rooms this node lost to the new owner"""
+        for room_id, connections in list(self.active_connections.items()):
+            owner = cluster.owner(room_id)
+            if owner == cluster.node_id:
+                continue
+            for connection_tuple in list(connections):
+                try:
+                    await self.redirect(connection_tuple[0], owner)
+                except Exception:
+                    pass  # already gone; its handler cleans up
 
 manager = ConnectionManager()
+cluster.on_change.append(lambda: asyncio.create_task(manager.redirect_moved_rooms()))
@@ -1,130 +1,38 @@
+import json
+import logging
+import os
 import sqlite3
 import uuid
 import hashlib
 from typing import Optional
 
-DB_PATH = "syncwrite.db"
+from . import migrations
+from .log import redact
+from .metrics import instrument_db
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("DB_PATH", "syncwrite.db")
 
 def init_db():
+    """Startup schema check: one version read, migrating only if behind"""
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Users table with email
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id TEXT PRIMARY KEY,
-            username TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            is_admin INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Documents/Rooms table - now user-scoped
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS documents (
-            room_id TEXT PRIMARY KEY,
-            room_name TEXT NOT NULL,
-            owner_id TEXT NOT NULL,
-            content TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (owner_id) REFERENCES users(user_id)
-        )
-    """)
-    
-    # Room Access Control List (ACL)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS room_access (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            room_id TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('owner', 'editor', 'viewer')),
-            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            granted_by TEXT,
-            FOREIGN KEY (room_id) REFERENCES documents(room_id),
-            FOREIGN KEY (user_id) REFERENCES users(user_id),
-            FOREIGN KEY (granted_by) REFERENCES users(user_id),
-            UNIQUE(room_id, user_id)
-        )
-    """)
-    
-    # Invitations table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS invitations (
-            invite_id TEXT PRIMARY KEY,
-            room_id TEXT NOT NULL,
-            invited_by TEXT NOT NULL,
-            invited_email TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('editor', 'viewer')),
-            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'accepted', 'declined')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP,
-            FOREIGN KEY (room_id) REFERENCES documents(room_id),
-            FOREIGN KEY (invited_by) REFERENCES users(user_id)
-        )
-    """)
-    
-    # Migration: Add email column to users if it doesn't exist
-    try:
-        cursor.execute("SELECT email FROM users LIMIT 1")
-    except sqlite3.OperationalError:
-        print("Migrating users table: adding email column")
-        cursor.execute("ALTER TABLE users ADD COLUMN email TEXT")
-        # Update existing users with placeholder emails
-        cursor.execute("UPDATE users SET email = username || '@temp.local' WHERE email IS NULL")
-        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email)")
-        # Drop old username unique constraint and recreate without it
-        cursor.execute("""
-            CREATE TABLE users_new (
-                user_id TEXT PRIMARY KEY,
-                username TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        cursor.execute("INSERT INTO users_new SELECT user_id, username, email, password_hash, created_at FROM users")
-        cursor.execute("DROP TABLE users")
-        cursor.execute("ALTER TABLE users_new RENAME TO users")
-    
-    # Migration: Add room-related columns to documents
-    try:
-        cursor.execute("SELECT room_name, owner_id FROM documents LIMIT 1")
-    except sqlite3.OperationalError:
-        print("Migrating documents table: adding room_name and owner_id columns")
-        cursor.execute("ALTER TABLE documents ADD COLUMN room_name TEXT")
-        cursor.execute("ALTER TABLE documents ADD COLUMN owner_id TEXT")
-        # Set defaults for existing documents
-        cursor.execute("UPDATE documents SET room_name = room_id WHERE room_name IS NULL")
-        cursor.execute("UPDATE documents SET owner_id = 'system' WHERE owner_id IS NULL")
-    
-    # Migration: Add created_at to documents if missing
     try:
-        cursor.execute("SELECT created_at FROM documents LIMIT 1")
-    except sqlite3.OperationalError:
-        print("Migrating documents table: adding created_at column")
-        cursor.execute("ALTER TABLE documents ADD COLUMN created_at TIMESTAMP")
-        cursor.execute("UPDATE documents SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
-    
-    # Migration: Add updated_at to documents if missing
-    try:
-        cursor.execute("SELECT updated_at FROM documents LIMIT 1")
-    except sqlite3.OperationalError:
-        print("Migrating documents table: adding updated_at column")
-        cursor.execute("ALTER TABLE documents ADD COLUMN updated_at TIMESTAMP")
-        cursor.execute("UPDATE documents SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
-    
-    # Migration: Add is_admin column to users
-    try:
-        cursor.execute("SELECT is_admin FROM users LIMIT 1")
-    except sqlite3.OperationalError:
-        print("Migrating users table: adding is_admin column")
-        cursor.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER DEFAULT 0")
-    
-    conn.commit()
-    conn.close()
+        version = migrations.current_version(conn)
+    finally:
+        conn.close()
+
+    latest = migrations.latest_version()
+    if version >= latest:
+        return
+    if os.getenv("DB_AUTO_MIGRATE", "1") == "0":
+        raise RuntimeError(
+            f"Database schema is at version {version}, code expects {latest}. Run: python migrate.py"
+        )
+    applied = migrations.migrate(DB_PATH)
+    if applied:
+        logger.info("Database migrated", extra={"version": applied[-1]})
+
 
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
@@ -140,7 +48,7 @@ def create_user(username: str, password: str, email: str) -> str:
             (user_id, username, email, password_hash)
         )
         conn.commit()
-        print(f"Created user: {username} ({email}) with ID: {user_id[:8]}...")
+        logger.info("Created user", extra={"user": user_id[:8], "email": redact(email)})
         return user_id
     except sqlite3.IntegrityError as e:
         if "email" in str(e):
@@ -190,25 +98,69 @@ def get_document_content(room_id: str) -> str:
     result = cursor.fetchone()
     if not result:
         # Don't auto-create rooms here - they should be created explicitly via create_room
-        print(f"Room not found in DB: {room_id}")
+        logger.warning("Room not found in DB", extra={"room": redact(room_id)})
         conn.close()
         return ""
     conn.close()
     content = result[0] if result[0] else ""
-    print(f"Loaded room {room_id} from DB: {len(content)} chars")
+    logger.debug("Loaded document", extra={"room": redact(room_id), "chars": len(content)})
     return content
 
+def get_document_revision(room_id: str) -> Optional[int]:
+    """Current revision of a document, or None if the room doesn't exist"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT revision FROM documents WHERE room_id = ?", (room_id,))
+    result = cursor.fetchone()
+    conn.close()
+    return (result[0] or 0) if result else None
+
+def get_document_with_revision(room_id: str) -> Optional[tuple]:
+    """(content, revision) read together so they always match"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT content, revision FROM documents WHERE room_id = ?", (room_id,))
+    result = cursor.fetchone()
+    conn.close()
+    if not result:
+        return None
+    return result[0] or "", result[1] or 0
+
+def get_document_length(room_id: str) -> int:
+    """Length of the stored document without loading its content"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(LENGTH(content), 0) FROM documents WHERE room_id = ?", (room_id,))
+    result = cursor.fetchone()
+    conn.close()
+    return result[0] if result else 0
+
 def update_document_content(room_id: str, content: str):
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    # Only update content and timestamp, preserve room_name and owner_id
+    # Only update content, revision and timestamp, preserve room_name and owner_id
     cursor.execute(
-        "UPDATE documents SET content = ?, updated_at = CURRENT_TIMESTAMP WHERE room_id = ?",
+        "UPDATE documents SET content = ?, revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE room_id = ?",
         (content, room_id)
     )
     conn.commit()
     conn.close()
-    print(f"Saved to DB - Room: {room_id}, Content length: {len(content)} chars")
+    logger.debug("Saved document", extra={"room": redact(room_id), "chars": len(content)})
+
+def save_document_state(room_id: str, content: str, revision: int) -> bool:
+    """Write an in-memory document at its revision; False if the stored one is already newer"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE documents SET content = ?, revision = ?, updated_at = CURRENT_TIMESTAMP "
+        "WHERE room_id = ? AND COALESCE(revision, 0) < ?",
+        (content, revision, room_id, revision)
+    )
+    saved = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    logger.debug("Saved document", extra={"room": redact(room_id), "chars": len(content), "revision": revision})
+    return saved
 
 
 # Room Management Functions
@@ -234,25 +186,30 @@ def create_room(owner_id: str, room_name: str) -> str:
         )
         
         conn.commit()
-        print(f"Created room: {room_id} for owner {owner_id[:8]}...")
+        logger.info("Created room", extra={"room": redact(room_id), "owner": owner_id[:8]})
         return room_id
     except sqlite3.IntegrityError:
         raise ValueError("Room already exists")
     finally:
         conn.close()
 
-def get_user_rooms(user_id: str) -> list:
-    """Get all rooms a user has access to"""
+def get_user_rooms(user_id: str, limit: Optional[int] = None, after: Optional[tuple] = None) -> list:
+    """Get rooms a user has access to, most recently updated first.
+
+    `after` is the (updated_at, room_id) of the last row already returned.
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    cursor.execute("""
+    keyset = "AND (d.updated_at, d.room_id) < (?, ?)" if after else ""
+    cursor.execute(f"""
         SELECT d.room_id, d.room_name, d.owner_id, ra.role, d.updated_at
-        FROM documents d
-        JOIN room_access ra ON d.room_id = ra.room_id
-        WHERE ra.user_id = ?
-        ORDER BY d.updated_at DESC
-    """, (user_id,))
+        FROM room_access ra
+        JOIN documents d ON d.room_id = ra.room_id
+        WHERE ra.user_id = ? {keyset}
+        ORDER BY d.updated_at DESC, d.room_id DESC
+        LIMIT ?
+    """, (user_id, *(after or ()), limit if limit is not None else -1))
     
     rooms = []
     for row in cursor.fetchall():
@@ -292,7 +249,7 @@ def grant_room_access(room_id: str, user_id: str, role: str, granted_by: str):
             (room_id, user_id, role, granted_by)
         )
         conn.commit()
-        print(f"Granted {role} access to user {user_id[:8]}... for room {room_id}")
+        logger.info("Granted room access", extra={"room": redact(room_id), "user": user_id[:8], "role": role})
     except sqlite3.IntegrityError:
         # Update existing access
         cursor.execute(
@@ -300,10 +257,50 @@ def grant_room_access(room_id: str, user_id: str, role: str, granted_by: str):
             (role, granted_by, room_id, user_id)
         )
         conn.commit()
-        print(f"Updated access to {role} for user {user_id[:8]}... in room {room_id}")
+        logger.info("Updated room access", extra={"room": redact(room_id), "user": user_id[:8], "role": role})
     finally:
         conn.close()
 
+def set_room_roles_bulk(room_id: str, granted_by: str, changes: list) -> list:
+    """Grant or change roles for many (user_id, role) pairs in one transaction.
+
+    Returns one result per change: {"user_id", "ok"} or {"user_id", "ok": False,
+    "error"}. The owner's role is never changed.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    ids = json.dumps([user_id for user_id, _ in changes])
+    cursor.execute("SELECT user_id FROM users WHERE user_id IN (SELECT value FROM json_each(?))", (ids,))
+    known = {row[0] for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT user_id FROM room_access
+        WHERE room_id = ? AND role = 'owner' AND user_id IN (SELECT value FROM json_each(?))
+    """, (room_id, ids))
+    owners = {row[0] for row in cursor.fetchall()}
+    
+    results, rows = [], []
+    for user_id, role in changes:
+        if user_id not in known:
+            results.append({"user_id": user_id, "ok": False, "error": "User not found"})
+        elif user_id in owners:
+            results.append({"user_id": user_id, "ok": False, "error": "Cannot change the owner's role"})
+        else:
+            rows.append((room_id, user_id, role, granted_by))
+            results.append({"user_id": user_id, "ok": True, "role": role})
+    
+    # Insert new members and update existing ones in one statement per row
+    cursor.executemany("""
+        INSERT INTO room_access (room_id, user_id, role, granted_by) VALUES (?, ?, ?, ?)
+        ON CONFLICT(room_id, user_id) DO UPDATE SET
+            role = excluded.role, granted_by = excluded.granted_by, granted_at = CURRENT_TIMESTAMP
+    """, rows)
+    conn.commit()
+    conn.close()
+    
+    logger.info("Set room roles", extra={"room": redact(room_id), "count": len(rows)})
+    return results
+
 def revoke_room_access(room_id: str, user_id: str):
     """Revoke access to a room"""
     conn = sqlite3.connect(DB_PATH)
@@ -315,19 +312,25 @@ def revoke_room_access(room_id: str, user_id: str):
     )
     conn.commit()
     conn.close()
-    print(f"Revoked access for user {user_id[:8]}... from room {room_id}")
+    logger.info("Revoked room access", extra={"room": redact(room_id), "user": user_id[:8]})
+
+def get_room_users(room_id: str, limit: Optional[int] = None, after: Optional[tuple] = None) -> list:
+    """Get users with access to a room, ordered by user_id.
 
-def get_room_users(room_id: str) -> list:
-    """Get all users with access to a room"""
+    `after` is the (user_id,) of the last row already returned.
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    cursor.execute("""
+    keyset = "AND ra.user_id > ?" if after else ""
+    cursor.execute(f"""
         SELECT u.user_id, u.username, u.email, ra.role
         FROM room_access ra
         JOIN users u ON ra.user_id = u.user_id
-        WHERE ra.room_id = ?
-    """, (room_id,))
+        WHERE ra.room_id = ? {keyset}
+        ORDER BY ra.user_id
+        LIMIT ?
+    """, (room_id, *(after or ()), limit if limit is not None else -1))
     
     users = []
     for row in cursor.fetchall():
@@ -358,22 +361,74 @@ def create_invitation(room_id: str, invited_by: str, invited_email: str, role: s
     conn.commit()
     conn.close()
     
-    print(f"Created invitation {invite_id[:8]}... for {invited_email} to room {room_id}")
+    logger.info("Created invitation", extra={"invite": invite_id[:8], "email": redact(invited_email), "room": redact(room_id)})
     return invite_id
 
-def get_user_invitations(email: str) -> list:
-    """Get all pending invitations for a user"""
+def create_invitations_bulk(room_id: str, invited_by: str, invites: list) -> list:
+    """Invite many (email, role) pairs to a room in one transaction.
+
+    Returns one result per invite: {"email", "ok", "invite_id"} or
+    {"email", "ok": False, "error"}. Unknown users, existing members and
+    duplicates within the batch are reported, not raised.
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
+    emails = json.dumps([email for email, _ in invites])
+    cursor.execute(
+        "SELECT email, user_id FROM users WHERE email IN (SELECT value FROM json_each(?))",
+        (emails,)
+    )
+    user_ids = dict(cursor.fetchall())
     cursor.execute("""
+        SELECT u.email FROM room_access ra
+        JOIN users u ON u.user_id = ra.user_id
+        WHERE ra.room_id = ? AND u.email IN (SELECT value FROM json_each(?))
+    """, (room_id, emails))
+    members = {row[0] for row in cursor.fetchall()}
+    
+    results, rows, seen = [], [], set()
+    for email, role in invites:
+        if email in seen:
+            results.append({"email": email, "ok": False, "error": "Duplicate in batch"})
+        elif email not in user_ids:
+            results.append({"email": email, "ok": False, "error": "User with this email not found"})
+        elif email in members:
+            results.append({"email": email, "ok": False, "error": "User already has access to this room"})
+        else:
+            invite_id = str(uuid.uuid4())
+            rows.append((invite_id, room_id, invited_by, email, role))
+            results.append({"email": email, "ok": True, "invite_id": invite_id})
+        seen.add(email)
+    
+    cursor.executemany(
+        "INSERT INTO invitations (invite_id, room_id, invited_by, invited_email, role) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.commit()
+    conn.close()
+    
+    logger.info("Created invitations", extra={"room": redact(room_id), "count": len(rows)})
+    return results
+
+def get_user_invitations(email: str, limit: Optional[int] = None, after: Optional[tuple] = None) -> list:
+    """Get pending invitations for a user, newest first.
+
+    `after` is the (created_at, invite_id) of the last row already returned.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    keyset = "AND (i.created_at, i.invite_id) < (?, ?)" if after else ""
+    cursor.execute(f"""
         SELECT i.invite_id, i.room_id, d.room_name, u.username, u.email, i.role, i.created_at
         FROM invitations i
         JOIN documents d ON i.room_id = d.room_id
         JOIN users u ON i.invited_by = u.user_id
-        WHERE i.invited_email = ? AND i.status = 'pending'
-        ORDER BY i.created_at DESC
-    """, (email,))
+        WHERE i.invited_email = ? AND i.status = 'pending' {keyset}
+        ORDER BY i.created_at DESC, i.invite_id DESC
+        LIMIT ?
+    """, (email, *(after or ()), limit if limit is not None else -1))
     
     invitations = []
     for row in cursor.fetchall():
@@ -430,7 +485,7 @@ def accept_invitation(invite_id: str, user_id: str) -> Optional[dict]:
     conn.commit()
     conn.close()
     
-    print(f"User {user_id[:8]}... accepted invitation {invite_id[:8]}...")
+    logger.info("Accepted invitation", extra={"user": user_id[:8], "invite": invite_id[:8]})
     return {"room_id": room_id, "role": role}
 
 def decline_invitation(invite_id: str):
@@ -445,16 +500,25 @@ def decline_invitation(invite_id: str):
     conn.commit()
     conn.close()
     
-    print(f"Invitation {invite_id[:8]}... declined")
+    logger.info("Declined invitation", extra={"invite": invite_id[:8]})
 
 
 # ============ Admin Functions ============
 
-def get_all_users() -> list:
-    """Get all users (admin only)"""
+def get_all_users(limit: Optional[int] = None, after: Optional[tuple] = None) -> list:
+    """Get users, newest first (admin only).
+
+    `after` is the (created_at, user_id) of the last row already returned.
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute("SELECT user_id, username, email, is_admin, created_at FROM users ORDER BY created_at DESC")
+    keyset = "WHERE (created_at, user_id) < (?, ?)" if after else ""
+    cursor.execute(f"""
+        SELECT user_id, username, email, is_admin, created_at
+        FROM users {keyset}
+        ORDER BY created_at DESC, user_id DESC
+        LIMIT ?
+    """, (*(after or ()), limit if limit is not None else -1))
     users = []
     for row in cursor.fetchall():
         users.append({
@@ -468,20 +532,26 @@ def get_all_users() -> list:
     return users
 
 
-def get_all_rooms() -> list:
-    """Get all rooms with owner info (admin only)"""
+def get_all_rooms(limit: Optional[int] = None, after: Optional[tuple] = None) -> list:
+    """Get rooms with owner info, newest first (admin only).
+
+    `after` is the (created_at, room_id) of the last row already returned.
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute("""
+    # Member counts per page row via the (room_id, user_id) index, instead of
+    # grouping the whole ACL table before the LIMIT applies
+    keyset = "WHERE (d.created_at, d.room_id) < (?, ?)" if after else ""
+    cursor.execute(f"""
         SELECT d.room_id, d.room_name, d.owner_id, d.created_at,
                u.username, u.email,
-               COUNT(DISTINCT ra.user_id) as user_count
+               (SELECT COUNT(*) FROM room_access ra WHERE ra.room_id = d.room_id) as user_count
         FROM documents d
         LEFT JOIN users u ON d.owner_id = u.user_id
-        LEFT JOIN room_access ra ON d.room_id = ra.room_id
-        GROUP BY d.room_id
-        ORDER BY d.created_at DESC
-    """)
+        {keyset}
+        ORDER BY d.created_at DESC, d.room_id DESC
+        LIMIT ?
+    """, (*(after or ()), limit if limit is not None else -1))
     rooms = []
     for row in cursor.fetchall():
         rooms.append({
@@ -497,19 +567,18 @@ def get_all_rooms() -> list:
     return rooms
 
 
-def delete_user_admin(user_id: str):
-    """Delete a user and all their rooms (admin only)"""
+def delete_user_admin(user_id: str) -> list:
+    """Delete a user and all their rooms (admin only); returns the deleted room ids"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    # Get all rooms owned by this user
     cursor.execute("SELECT room_id FROM documents WHERE owner_id = ?", (user_id,))
-    rooms = [row[0] for row in cursor.fetchall()]
+    room_ids = [row[0] for row in cursor.fetchall()]
     
-    # Delete all room access for these rooms
-    for room_id in rooms:
-        cursor.execute("DELETE FROM room_access WHERE room_id = ?", (room_id,))
-        cursor.execute("DELETE FROM invitations WHERE room_id = ?", (room_id,))
+    # Delete access and invitations for every owned room in one statement each
+    owned_rooms = "SELECT room_id FROM documents WHERE owner_id = ?"
+    cursor.execute(f"DELETE FROM room_access WHERE room_id IN ({owned_rooms})", (user_id,))
+    cursor.execute(f"DELETE FROM invitations WHERE room_id IN ({owned_rooms})", (user_id,))
     
     # Delete the rooms
     cursor.execute("DELETE FROM documents WHERE owner_id = ?", (user_id,))
@@ -523,7 +592,8 @@ def delete_user_admin(user_id: str):
     
     conn.commit()
     conn.close()
-    print(f"Admin deleted user {user_id[:8]}... and all their rooms")
+    logger.info("Admin deleted user and their rooms", extra={"user": user_id[:8]})
+    return room_ids
 
 
 def delete_room_admin(room_id: str):
@@ -542,7 +612,31 @@ def delete_room_admin(room_id: str):
     
     conn.commit()
     conn.close()
-    print(f"Admin deleted room {room_id}")
+    logger.info("Admin deleted room", extra={"room": redact(room_id)})
+
+
+def delete_rooms_bulk(room_ids: list) -> list:
+    """Delete many rooms in one transaction (admin only).
+
+    Returns one result per requested id: {"room_id", "deleted"}.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    # The id list is bound once as JSON instead of one placeholder per id
+    ids = json.dumps(room_ids)
+    requested = "SELECT value FROM json_each(?)"
+    cursor.execute(f"SELECT room_id FROM documents WHERE room_id IN ({requested})", (ids,))
+    existing = {row[0] for row in cursor.fetchall()}
+    
+    cursor.execute(f"DELETE FROM room_access WHERE room_id IN ({requested})", (ids,))
+    cursor.execute(f"DELETE FROM invitations WHERE room_id IN ({requested})", (ids,))
+    cursor.execute(f"DELETE FROM documents WHERE room_id IN ({requested})", (ids,))
+    
+    conn.commit()
+    conn.close()
+    logger.info("Admin bulk-deleted rooms", extra={"count": len(existing)})
+    return [{"room_id": room_id, "deleted": room_id in existing} for room_id in room_ids]
 
 
 def make_user_admin(user_id: str):
@@ -554,7 +648,7 @@ def make_user_admin(user_id: str):
     
     conn.commit()
     conn.close()
-    print(f"User {user_id[:8]}... promoted to admin")
+    logger.info("Promoted user to admin", extra={"user": user_id[:8]})
 
 
 def check_is_admin(user_id: str) -> bool:
@@ -566,3 +660,9 @@ def check_is_admin(user_id: str) -> bool:
     conn.close()
     return bool(result[0]) if result else False
 
+
+# Per-function latency and error counts for /metrics
+for _name, _fn in list(globals().items()):
+    if callable(_fn) and getattr(_fn, "__module__", None) == __name__ and not _name.startswith("_"):
+        globals()[_name] = instrument_db(_name, _fn)
+del _name, _fn
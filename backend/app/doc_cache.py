@@ -0,0 +1,116 @@
+"""Redis cache of current documents, shared by all nodes.
+
+Each room's latest content and revision live in one Redis hash,
+`doc:{room_id}`, with the fields rev, enc and body. RoomStore writes the
+hash on every edit. A node loading a room reads it before SQLite, and
+fills it on a miss. A join on a node that has never seen the room then
+costs one Redis round trip. After a deploy, a reconnect storm hits Redis
+instead of the database.
+
+Writes are version-checked with WATCH/MULTI, so an older revision never
+replaces a newer one. Documents of DOC_CACHE_COMPRESS_MIN bytes or more
+are stored zlib-compressed. Every write resets the TTL, so rooms nobody
+edits drop out of Redis. A Redis failure is counted and logged, and the
+node falls back to SQLite; the cache never fails an edit or a join.
+
+Environment:
+  DOC_CACHE               0 disables the cache (default 1)
+  DOC_CACHE_TTL           seconds a document stays after its last write (default 3600)
+  DOC_CACHE_COMPRESS_MIN  compress documents at least this many bytes; 0 never (default 4096)
+"""
+
+import logging
+import os
+import zlib
+from typing import Optional, Tuple
+
+import redis
+
+from .log import redact
+from .metrics import Counter
+from .redis_client import r_bytes
+
+KEY = "doc:{}"
+
+DOC_CACHE_READS = Counter("syncwrite_doc_cache_reads_total", "Document cache lookups, by result", ["result"])
+DOC_CACHE_WRITES = Counter("syncwrite_doc_cache_writes_total", "Document cache writes, by result", ["result"])
+READ_HIT = DOC_CACHE_READS.labels("hit")
+READ_MISS = DOC_CACHE_READS.labels("miss")
+READ_ERROR = DOC_CACHE_READS.labels("error")
+WRITE_STORED = DOC_CACHE_WRITES.labels("stored")
+WRITE_STALE = DOC_CACHE_WRITES.labels("stale")
+WRITE_ERROR = DOC_CACHE_WRITES.labels("error")
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentCache:
+    def __init__(self, enabled: bool, ttl: int, compress_min: int):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.compress_min = compress_min
+
+    def get(self, room_id: str) -> Optional[Tuple[str, int]]:
+        """(content, revision) from Redis, or None on a miss"""
+        if not self.enabled:
+            return None
+        try:
+            revision, encoding, body = r_bytes.hmget(KEY.format(room_id), "rev", "enc", "body")
+            if revision is None or body is None:
+                READ_MISS.inc()
+                return None
+            if encoding == b"zlib":
+                body = zlib.decompress(body)
+            READ_HIT.inc()
+            return body.decode("utf-8"), int(revision)
+        except Exception as e:
+            READ_ERROR.inc()
+            logger.warning("Document cache read failed: %s", e, extra={"room": redact(room_id)})
+            return None
+
+    def put(self, room_id: str, content: str, revision: int) -> bool:
+        """Store a revision unless the cache already holds a newer one"""
+        if not self.enabled:
+            return False
+        body = content.encode("utf-8")
+        encoding = b"raw"
+        if self.compress_min and len(body) >= self.compress_min:
+            body, encoding = zlib.compress(body, 1), b"zlib"
+        key = KEY.format(room_id)
+        try:
+            with r_bytes.pipeline() as pipe:
+                pipe.watch(key)
+                current = pipe.hget(key, "rev")
+                if current is not None and int(current) >= revision:
+                    WRITE_STALE.inc()
+                    return False
+                pipe.multi()
+                pipe.hset(key, mapping={"rev": revision, "enc": encoding, "body": body})
+                pipe.expire(key, self.ttl)
+                pipe.execute()
+        except redis.WatchError:
+            # Another node wrote the key first; if ours was newer, the room's next edit fixes it
+            WRITE_STALE.inc()
+            return False
+        except Exception as e:
+            WRITE_ERROR.inc()
+            logger.warning("Document cache write failed: %s", e, extra={"room": redact(room_id)})
+            return False
+        WRITE_STORED.inc()
+        return True
+
+    def forget(self, *room_ids: str):
+        """Drop deleted rooms, so a room re-created under the same id starts empty"""
+        if not self.enabled or not room_ids:
+            return
+        try:
+            r_bytes.delete(*(KEY.format(room_id) for room_id in room_ids))
+        except Exception as e:
+            logger.warning("Document cache delete failed: %s", e)
+
+
+doc_cache = DocumentCache(
+    enabled=os.getenv("DOC_CACHE", "1") != "0",
+    ttl=int(os.getenv("DOC_CACHE_TTL", "3600")),
+    compress_min=int(os.getenv("DOC_CACHE_COMPRESS_MIN", "4096")),
+)
@@ -0,0 +1 @@
+"""Document import/export helpers"""
\ No newline at end of file
@@ -0,0 +1,69 @@
+import hashlib
+import os
+import re
+from typing import Optional
+from urllib.parse import urlparse
+
+from .docx_writer import load_data_uri
+
+BLOB_URL_PREFIX = "/api/blobs/"
+
+# Only raster formats are stored; SVG could carry script when opened directly
+IMAGE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/bmp": "bmp",
+}
+MEDIA_TYPES = {ext: media_type for media_type, ext in IMAGE_EXTENSIONS.items()}
+BLOB_NAME_RE = re.compile(r"^[0-9a-f]{64}\.(?:png|jpg|gif|webp|bmp)$")
+
+
+class BlobStore:
+    """Content-addressed image files referenced from documents by URL.
+
+    Names are the sha256 of the bytes, so identical images are stored once
+    and a stored blob never changes (safe to cache forever).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def put(self, data: bytes, content_type: str) -> Optional[str]:
+        """Store an image and return its URL path, or None for unsupported types"""
+        ext = IMAGE_EXTENSIONS.get((content_type or "").lower())
+        if ext is None:
+            return None
+        name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return BLOB_URL_PREFIX + name
+
+    def path_for(self, name: str) -> Optional[str]:
+        """Filesystem path of a blob, or None if the name is invalid or missing"""
+        if not BLOB_NAME_RE.match(name):
+            return None
+        path = os.path.join(self.root, name)
+        return path if os.path.exists(path) else None
+
+    def load(self, src: str) -> Optional[bytes]:
+        """Image bytes for an <img src>: a data: URI or one of our blob URLs"""
+        if src.startswith("data:"):
+            return load_data_uri(src)
+        path = urlparse(src).path
+        if not path.startswith(BLOB_URL_PREFIX):
+            return None
+        blob_path = self.path_for(path[len(BLOB_URL_PREFIX):])
+        if blob_path is None:
+            return None
+        with open(blob_path, "rb") as f:
+            return f.read()
+
+
+blob_store = BlobStore(os.path.abspath(os.getenv("BLOB_DIR", "blobs")))
@@ -0,0 +1,112 @@
+import base64
+import os
+import tempfile
+import zipfile
+from importlib.util import find_spec
+from typing import List, Optional, Tuple
+
+from .blob_store import BlobStore, blob_store
+from .worker_pool import WorkerPool
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class ImportTooLarge(Exception):
+    """The upload is over the configured size cap"""
+
+
+class InvalidDocument(Exception):
+    """The upload is not a readable DOCX file"""
+
+
+def _convert_docx(path: str, blob_root: str, max_uncompressed: int) -> Tuple[str, List[dict]]:
+    """Runs in a worker process; images go to the blob store instead of inline base64"""
+    import mammoth
+
+    # Reject zip bombs before mammoth inflates anything
+    try:
+        with zipfile.ZipFile(path) as archive:
+            uncompressed = sum(info.file_size for info in archive.infolist())
+    except zipfile.BadZipFile:
+        raise InvalidDocument("File is not a valid .docx document")
+    if uncompressed > max_uncompressed:
+        raise InvalidDocument("Document expands to more than the allowed size")
+
+    store = BlobStore(blob_root)
+
+    def convert_image(image):
+        with image.open() as stream:
+            data = stream.read()
+        url = store.put(data, image.content_type)
+        if url is None:
+            # Formats we don't host (e.g. SVG) stay inline as before
+            url = f"data:{image.content_type};base64,{base64.b64encode(data).decode('ascii')}"
+        attrs = {"src": url}
+        if image.alt_text:
+            attrs["alt"] = image.alt_text
+        return attrs
+
+    with open(path, "rb") as f:
+        result = mammoth.convert_to_html(f, convert_image=mammoth.images.img_element(convert_image))
+    messages = [{"type": m.type, "message": m.message} for m in result.messages]
+    return result.value, messages
+
+
+class DocxImporter:
+    """Size-capped DOCX -> HTML import that never converts on the event loop.
+
+    The upload is copied to a temporary file in chunks (rejecting it once it
+    passes `max_bytes`), then mammoth converts it in a worker process with a
+    timeout. Embedded images are written to the blob store and referenced by
+    URL, which keeps the returned HTML small.
+    """
+
+    def __init__(self, store: BlobStore, max_bytes: int = 20 * 1024 * 1024,
+                 max_uncompressed: int = 200 * 1024 * 1024, workers: int = 1,
+                 max_pending: int = 4, timeout: float = 60.0, spool_dir: Optional[str] = None):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.max_uncompressed = max_uncompressed
+        self.spool_dir = spool_dir
+        self.pool = WorkerPool("DOCX import", workers=workers, max_pending=max_pending, timeout=timeout)
+
+    async def spool(self, upload) -> str:
+        """Copy an UploadFile to a temp path, enforcing the size cap"""
+        fd, path = tempfile.mkstemp(suffix=".docx", dir=self.spool_dir)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ImportTooLarge(f"File is larger than {self.max_bytes / (1024 * 1024):.3g} MB")
+                    f.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    async def convert(self, upload) -> Tuple[str, List[dict]]:
+        """HTML and conversion warnings for an uploaded DOCX"""
+        if find_spec("mammoth") is None:
+            raise ImportError("mammoth is not installed")
+
+        path = await self.spool(upload)
+        try:
+            return await self.pool.run(_convert_docx, path, self.store.root, self.max_uncompressed)
+        finally:
+            os.remove(path)
+
+    def close(self):
+        self.pool.close()
+
+
+docx_importer = DocxImporter(
+    blob_store,
+    max_bytes=int(os.getenv("DOCX_IMPORT_MAX_BYTES", str(20 * 1024 * 1024))),
+    workers=int(os.getenv("DOCX_IMPORT_WORKERS", "1")),
+    timeout=float(os.getenv("DOCX_IMPORT_TIMEOUT", "60")),
+)
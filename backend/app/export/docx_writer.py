@@ -0,0 +1,409 @@
+import base64
+import io
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+BLOCK_TAGS = {"p", "div", "blockquote", "pre"} | set(HEADING_TAGS)
+VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "col", "source", "wbr"}
+INLINE_FORMATS = {
+    "b": {"bold": True}, "strong": {"bold": True},
+    "i": {"italic": True}, "em": {"italic": True},
+    "u": {"underline": True}, "ins": {"underline": True},
+    "s": {"strike": True}, "strike": {"strike": True}, "del": {"strike": True},
+    "code": {"code": True}, "mark": {"highlight": True},
+    "sub": {"subscript": True}, "sup": {"superscript": True},
+}
+ALIGNMENTS = {"left": "LEFT", "center": "CENTER", "right": "RIGHT", "justify": "JUSTIFY"}
+MAX_IMAGE_WIDTH_INCHES = 6.0
+
+STYLE_RE = re.compile(r"\s*([\w-]+)\s*:\s*([^;]+)")
+HEX_COLOR_RE = re.compile(r"#([0-9a-fA-F]{6}|[0-9a-fA-F]{3})\b")
+RGB_COLOR_RE = re.compile(r"rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _parse_style(value: Optional[str]) -> Dict[str, str]:
+    if not value:
+        return {}
+    return {m.group(1).lower(): m.group(2).strip() for m in STYLE_RE.finditer(value)}
+
+
+def _parse_color(value: str) -> Optional[str]:
+    match = HEX_COLOR_RE.search(value)
+    if match:
+        hex_value = match.group(1)
+        if len(hex_value) == 3:
+            hex_value = "".join(c * 2 for c in hex_value)
+        return hex_value.upper()
+    match = RGB_COLOR_RE.search(value)
+    if match:
+        return "".join(f"{min(255, int(c)):02X}" for c in match.groups())
+    return None
+
+
+def load_data_uri(src: str) -> Optional[bytes]:
+    """Image bytes from a base64 data: URI (the editor's default for pasted images)"""
+    if not src.startswith("data:") or ";base64," not in src:
+        return None
+    try:
+        return base64.b64decode(src.split(";base64,", 1)[1])
+    except ValueError:
+        return None
+
+
+class DocxBuilder(HTMLParser):
+    """Single-pass HTML -> DOCX conversion driven by parser events.
+
+    No tree is built: each tag opens or closes a paragraph, list level,
+    table cell or inline format as it is seen, and text is emitted as
+    formatted runs immediately. Headings, alignment, nested lists, links,
+    images, tables, block quotes, code blocks and page breaks are kept.
+    """
+
+    def __init__(self, image_loader: Callable[[str], Optional[bytes]] = load_data_uri):
+        super().__init__(convert_charrefs=True)
+        from docx import Document
+
+        self.document = Document()
+        self.image_loader = image_loader
+        self.paragraph = None
+        self.inline_stack: List[tuple] = []      # (tag, format dict)
+        self.list_stack: List[str] = []          # "ul" / "ol"
+        self.container_stack: List[object] = []  # table cells receiving paragraphs
+        self.table_stack: List[dict] = []        # {"table", "row", "cell_index"}
+        self.block_stack: List[str] = []
+        self.link_stack: List[Optional[object]] = []
+        self.pre_depth = 0
+        self.quote_depth = 0
+        self.skip_depth = 0                      # inside page breaks / scripts
+        self.pending_alignment = None
+        self.li_paragraph_empty = False
+        self.style_ids: Dict[str, Optional[str]] = {}
+
+    # ---- containers and paragraphs ----
+
+    @property
+    def container(self):
+        return self.container_stack[-1] if self.container_stack else self.document
+
+    def _new_paragraph(self, style: Optional[str] = None, alignment: Optional[str] = None):
+        container = self.container
+        # A fresh table cell already holds one empty paragraph
+        if container is not self.document and getattr(container, "_fresh", False):
+            paragraph = container.paragraphs[0]
+            container._fresh = False
+        else:
+            paragraph = container.add_paragraph()
+        if style:
+            self._apply_style(paragraph, style)
+        if alignment:
+            from docx.enum.text import WD_ALIGN_PARAGRAPH
+            paragraph.alignment = getattr(WD_ALIGN_PARAGRAPH, alignment)
+        self.paragraph = paragraph
+        return paragraph
+
+    def _apply_style(self, paragraph, name: str):
+        # python-docx resolves style names by scanning the style table on every
+        # assignment; resolve each name once and write the id directly
+        if name not in self.style_ids:
+            try:
+                self.style_ids[name] = self.document.styles[name].style_id
+            except KeyError:
+                self.style_ids[name] = None
+        style_id = self.style_ids[name]
+        if style_id:
+            paragraph._p.style = style_id
+
+    def _list_style(self) -> str:
+        depth = min(len(self.list_stack), 3)
+        base = "List Number" if self.list_stack[-1] == "ol" else "List Bullet"
+        return base if depth <= 1 else f"{base} {depth}"
+
+    def _block_style(self, tag: str) -> Optional[str]:
+        if tag in HEADING_TAGS:
+            return f"Heading {HEADING_TAGS[tag]}"
+        if self.list_stack:
+            return self._list_style()
+        if self.quote_depth:
+            return "Quote"
+        if tag == "pre" or self.pre_depth:
+            return "No Spacing"
+        return None
+
+    def _ensure_paragraph(self):
+        if self.paragraph is None:
+            self._new_paragraph(self._block_style("p"), self.pending_alignment)
+
+    # ---- parser events ----
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self.skip_depth:
+            if tag not in VOID_TAGS:
+                self.skip_depth += 1
+            return
+        if tag in ("script", "style", "head", "title"):
+            self.skip_depth = 1
+            return
+        if tag == "div" and attrs.get("data-type") == "page-break":
+            self.document.add_page_break()
+            self.paragraph = None
+            self.skip_depth = 1
+            return
+
+        style = _parse_style(attrs.get("style"))
+        alignment = ALIGNMENTS.get(style.get("text-align", "").lower())
+
+        if tag in BLOCK_TAGS:
+            if tag == "blockquote":
+                self.quote_depth += 1
+            if tag == "pre":
+                self.pre_depth += 1
+            self.block_stack.append(tag)
+            if tag in ("div", "blockquote"):
+                self.paragraph = None
+                self.pending_alignment = alignment
+                return
+            # <p> directly inside <li> continues the item's own paragraph
+            if self.li_paragraph_empty and self.paragraph is not None:
+                self.li_paragraph_empty = False
+                if alignment:
+                    from docx.enum.text import WD_ALIGN_PARAGRAPH
+                    self.paragraph.alignment = getattr(WD_ALIGN_PARAGRAPH, alignment)
+                return
+            block_style = self._block_style(tag)
+            if self.list_stack and self.paragraph is not None and tag == "p":
+                depth = min(len(self.list_stack), 3)
+                block_style = "List Continue" if depth <= 1 else f"List Continue {depth}"
+            self._new_paragraph(block_style, alignment)
+        elif tag in ("ul", "ol"):
+            self.list_stack.append(tag)
+            self.paragraph = None
+        elif tag == "li":
+            self._new_paragraph(self._list_style() if self.list_stack else None, alignment)
+            self.li_paragraph_empty = True
+        elif tag == "br":
+            self._ensure_paragraph()
+            self.paragraph.add_run().add_break()
+        elif tag == "hr":
+            self._add_rule()
+        elif tag == "img":
+            self._add_image(attrs.get("src", ""))
+        elif tag == "a":
+            self._ensure_paragraph()
+            self.link_stack.append(self._start_link(attrs.get("href")))
+        elif tag == "table":
+            table = self.container.add_table(rows=0, cols=1)
+            try:
+                table.style = "Table Grid"
+            except (KeyError, ValueError):
+                pass
+            self.table_stack.append({"table": table, "row": None, "cell_index": 0})
+            self.paragraph = None
+        elif tag == "tr" and self.table_stack:
+            state = self.table_stack[-1]
+            state["row"] = state["table"].add_row()
+            state["cell_index"] = 0
+        elif tag in ("td", "th") and self.table_stack and self.table_stack[-1]["row"] is not None:
+            state = self.table_stack[-1]
+            table = state["table"]
+            if state["cell_index"] >= len(table.columns):
+                from docx.shared import Inches
+                table.add_column(Inches(1.0))
+            cell = state["row"].cells[state["cell_index"]]
+            state["cell_index"] += 1
+            cell._fresh = True
+            self.container_stack.append(cell)
+            self.paragraph = None
+            if tag == "th":
+                self.inline_stack.append(("th", {"bold": True}))
+        else:
+            formats = dict(INLINE_FORMATS.get(tag, {}))
+            if "color" in style:
+                color = _parse_color(style["color"])
+                if color:
+                    formats["color"] = color
+            if "background-color" in style or (tag == "mark" and attrs.get("data-color")):
+                formats["highlight"] = True
+            if style.get("font-weight") in ("bold", "700", "800", "900"):
+                formats["bold"] = True
+            if style.get("font-style") == "italic":
+                formats["italic"] = True
+            if "underline" in style.get("text-decoration", ""):
+                formats["underline"] = True
+            if "line-through" in style.get("text-decoration", ""):
+                formats["strike"] = True
+            self.inline_stack.append((tag, formats))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.skip_depth:
+            self.skip_depth -= 1
+            return
+        if tag in BLOCK_TAGS:
+            if tag in self.block_stack:
+                while self.block_stack and self.block_stack.pop() != tag:
+                    pass
+            if tag == "blockquote":
+                self.quote_depth = max(0, self.quote_depth - 1)
+            if tag == "pre":
+                self.pre_depth = max(0, self.pre_depth - 1)
+            self.paragraph = None
+            self.pending_alignment = None
+        elif tag in ("ul", "ol"):
+            if self.list_stack:
+                self.list_stack.pop()
+            self.paragraph = None
+        elif tag == "li":
+            self.paragraph = None
+            self.li_paragraph_empty = False
+        elif tag == "a":
+            if self.link_stack:
+                self.link_stack.pop()
+        elif tag in ("td", "th"):
+            if self.container_stack:
+                self.container_stack.pop()
+            if tag == "th":
+                self._pop_inline("th")
+            self.paragraph = None
+        elif tag == "table":
+            if self.table_stack:
+                self.table_stack.pop()
+            self.paragraph = None
+        else:
+            self._pop_inline(tag)
+
+    def _pop_inline(self, tag: str):
+        for i in range(len(self.inline_stack) - 1, -1, -1):
+            if self.inline_stack[i][0] == tag:
+                del self.inline_stack[i]
+                return
+
+    def handle_data(self, data):
+        if self.skip_depth or not data:
+            return
+        if not self.pre_depth:
+            data = WHITESPACE_RE.sub(" ", data)
+            if data == " " and (self.paragraph is None or not self.paragraph.runs):
+                return
+        if self.paragraph is None:
+            if not data.strip():
+                return
+            self._ensure_paragraph()
+        if not self.paragraph.runs and not self.pre_depth:
+            data = data.lstrip()
+            if not data:
+                return
+        self.li_paragraph_empty = False
+
+        if self.pre_depth and "\n" in data:
+            lines = data.split("\n")
+            for i, line in enumerate(lines):
+                if i:
+                    self.paragraph.add_run().add_break()
+                if line:
+                    self._add_run(line)
+        else:
+            self._add_run(data)
+
+    # ---- runs ----
+
+    def _current_format(self) -> dict:
+        merged = {}
+        for _, formats in self.inline_stack:
+            merged.update(formats)
+        if self.pre_depth:
+            merged["code"] = True
+        return merged
+
+    def _add_run(self, text: str):
+        from docx.shared import Pt, RGBColor
+        from docx.enum.text import WD_COLOR_INDEX
+
+        formats = self._current_format()
+        link = self.link_stack[-1] if self.link_stack else None
+        run = self.paragraph.add_run(text)
+        if formats.get("bold"):
+            run.bold = True
+        if formats.get("italic"):
+            run.italic = True
+        if formats.get("underline") or link is not None:
+            run.underline = True
+        if formats.get("strike"):
+            run.font.strike = True
+        if formats.get("subscript"):
+            run.font.subscript = True
+        if formats.get("superscript"):
+            run.font.superscript = True
+        if formats.get("code"):
+            run.font.name = "Courier New"
+            run.font.size = Pt(10)
+        if formats.get("highlight"):
+            run.font.highlight_color = WD_COLOR_INDEX.YELLOW
+        if link is not None:
+            run.font.color.rgb = RGBColor(0x05, 0x63, 0xC1)
+            link.append(run._r)
+        elif formats.get("color"):
+            run.font.color.rgb = RGBColor.from_string(formats["color"])
+
+    def _start_link(self, href: Optional[str]):
+        """A w:hyperlink element that subsequent runs are moved into"""
+        if not href:
+            return None
+        from docx.opc.constants import RELATIONSHIP_TYPE
+        from docx.oxml.shared import OxmlElement, qn
+
+        rel_id = self.paragraph.part.relate_to(href, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+        hyperlink = OxmlElement("w:hyperlink")
+        hyperlink.set(qn("r:id"), rel_id)
+        self.paragraph._p.append(hyperlink)
+        return hyperlink
+
+    def _add_image(self, src: str):
+        data = self.image_loader(src) if src else None
+        if not data:
+            return
+        from docx.shared import Inches
+
+        self._ensure_paragraph()
+        try:
+            shape = self.paragraph.add_run().add_picture(io.BytesIO(data))
+        except Exception:
+            return  # unsupported or corrupt image
+        max_width = Inches(MAX_IMAGE_WIDTH_INCHES)
+        if shape.width > max_width:
+            shape.height = int(shape.height * max_width / shape.width)
+            shape.width = max_width
+
+    def _add_rule(self):
+        from docx.oxml.shared import OxmlElement, qn
+
+        paragraph = self._new_paragraph()
+        borders = OxmlElement("w:pBdr")
+        bottom = OxmlElement("w:bottom")
+        for key, value in (("w:val", "single"), ("w:sz", "6"), ("w:space", "1"), ("w:color", "auto")):
+            bottom.set(qn(key), value)
+        borders.append(bottom)
+        paragraph._p.get_or_add_pPr().append(borders)
+        self.paragraph = None
+
+
+def html_to_docx(content: str, image_loader: Callable[[str], Optional[bytes]] = load_data_uri,
+                 chunk_size: int = 64 * 1024) -> io.BytesIO:
+    """Convert editor HTML into a DOCX file held in memory"""
+    builder = DocxBuilder(image_loader=image_loader)
+    # Feed in chunks so the parser never needs the whole document as one token stream
+    for start in range(0, len(content), chunk_size):
+        builder.feed(content[start:start + chunk_size])
+    builder.close()
+
+    docx_bytes = io.BytesIO()
+    builder.document.save(docx_bytes)
+    docx_bytes.seek(0)
+    return docx_bytes
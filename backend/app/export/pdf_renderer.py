@@ -0,0 +1,132 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from importlib.util import find_spec
+from typing import Optional
+
+from ..ai.upstream import SingleFlight
+from .blob_store import BLOB_URL_PREFIX, blob_store
+from .worker_pool import WorkerPool
+
+# Blob image URLs (relative or absolute) in the document HTML
+BLOB_SRC_RE = re.compile(r'src="(?:https?://[^"/]+)?' + re.escape(BLOB_URL_PREFIX))
+
+# Files used this recently are never pruned: their path may just have been
+# handed to a FileResponse that has not opened it yet
+PRUNE_GRACE_SECONDS = 60
+
+PDF_STYLESHEET = """
+    body {
+        font-family: Arial, sans-serif;
+        line-height: 1.6;
+        padding: 2cm;
+        max-width: 21cm;
+        margin: 0 auto;
+    }
+    h1, h2, h3 { margin-top: 1em; margin-bottom: 0.5em; }
+    p { margin: 0.5em 0; }
+"""
+
+
+PDF_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>{stylesheet}</style>
+</head>
+<body>
+    {content}
+</body>
+</html>
+"""
+
+
+def _render_pdf(content: str, stylesheet: str, out_path: str, blob_root: str):
+    """Runs in a worker process; writes the PDF straight to disk"""
+    from weasyprint import HTML
+
+    # Read uploaded images from disk rather than fetching them over HTTP
+    content = BLOB_SRC_RE.sub(f'src="file://{blob_root}/', content)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    html = PDF_TEMPLATE.format(stylesheet=stylesheet, content=content)
+    HTML(string=html).write_pdf(tmp_path)
+    os.replace(tmp_path, out_path)
+
+
+class PDFRenderer:
+    """Bounded process-pool PDF rendering with a content-addressed disk cache.
+
+    WeasyPrint runs in worker processes so large documents never block the
+    event loop. Results are written to `cache_dir` under a hash of the
+    document HTML and stylesheet, so repeated exports are served from disk
+    and callers can stream the file instead of holding the PDF in memory.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8, timeout: float = 60.0,
+                 cache_dir: Optional[str] = None, cache_max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "syncwrite-export-cache")
+        self.cache_max_bytes = cache_max_bytes
+        self.pool = WorkerPool("PDF rendering", workers=workers, max_pending=max_pending, timeout=timeout)
+        self.singleflight = SingleFlight()
+        self.cache_hits = 0
+        self.renders = 0
+
+    def cache_path(self, content: str, stylesheet: str = PDF_STYLESHEET) -> str:
+        digest = hashlib.sha256(stylesheet.encode("utf-8") + b"\0" + content.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pdf")
+
+    async def render(self, content: str, stylesheet: str = PDF_STYLESHEET) -> str:
+        """Return the path of a PDF of the document body, rendering it if not cached"""
+        if find_spec("weasyprint") is None:
+            raise ImportError("weasyprint is not installed")
+
+        path = self.cache_path(content, stylesheet)
+        if os.path.exists(path):
+            self.cache_hits += 1
+            os.utime(path)  # keep recently used files out of eviction
+            return path
+
+        # Concurrent exports of the same content share one job
+        return await self.singleflight.do(path, lambda: self._render(content, stylesheet, path))
+
+    async def _render(self, content: str, stylesheet: str, path: str) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        await self.pool.run(_render_pdf, content, stylesheet, path, blob_store.root)
+        self.renders += 1
+        self._prune_cache()
+        return path
+
+    def _prune_cache(self):
+        """Drop least recently used files once the cache exceeds its size cap"""
+        cutoff = time.time() - PRUNE_GRACE_SECONDS
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                full = os.path.join(self.cache_dir, name)
+                if name.endswith(".pdf"):
+                    stat = os.stat(full)
+                    entries.append((stat.st_mtime, stat.st_size, full))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, full in sorted(entries):
+            if total <= self.cache_max_bytes or mtime > cutoff:
+                break
+            try:
+                os.remove(full)
+                total -= size
+            except OSError:
+                pass
+
+    def close(self):
+        self.pool.close()
+
+
+pdf_renderer = PDFRenderer(
+    workers=int(os.getenv("PDF_WORKERS", "2")),
+    max_pending=int(os.getenv("PDF_MAX_PENDING", "8")),
+    timeout=float(os.getenv("PDF_RENDER_TIMEOUT", "60")),
+    cache_dir=os.getenv("EXPORT_CACHE_DIR"),
+)
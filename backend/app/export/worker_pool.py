@@ -0,0 +1,97 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+
+class WorkerBusy(Exception):
+    """Too many jobs are already queued"""
+
+
+class WorkerTimeout(Exception):
+    """A job ran past its time limit"""
+
+
+class WorkerPool:
+    """Bounded process pool for CPU-heavy conversions (PDF render, DOCX import).
+
+    At most `max_pending` jobs may be queued or running; past that callers get
+    WorkerBusy instead of piling up. A job that runs longer than `timeout`
+    can't be cancelled inside its process. Its pool is retired instead:
+    new jobs go to a fresh pool, the retired pool's other jobs run to
+    completion, and then its processes, the stuck one included, are
+    terminated.
+    """
+
+    def __init__(self, name: str, workers: int = 2, max_pending: int = 8, timeout: float = 60.0):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        # Jobs in flight per executor, the current one and retired ones
+        self.jobs: Dict[ProcessPoolExecutor, int] = {}
+        self.retired = set()
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.executor
+
+    async def run(self, fn, *args):
+        """Run a picklable top-level function in a worker process"""
+        if self.pending >= self.max_pending:
+            raise WorkerBusy(f"Too many {self.name} jobs in progress")
+
+        executor = self._ensure_executor()
+        self.pending += 1
+        self.jobs[executor] = self.jobs.get(executor, 0) + 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            # A stuck worker can't be cancelled; move new jobs to a fresh pool
+            self._retire(executor)
+            raise WorkerTimeout(f"{self.name} exceeded {self.timeout:.0f}s")
+        except BrokenProcessPool:
+            # A worker crashed (e.g. out of memory); start fresh next time
+            self._retire(executor)
+            raise
+        finally:
+            self.pending -= 1
+            self._job_done(executor)
+
+    def _retire(self, executor: ProcessPoolExecutor):
+        # A late failure from an already retired pool must not retire its replacement
+        if self.executor is executor:
+            self.executor = None
+            self.retired.add(executor)
+
+    def _job_done(self, executor: ProcessPoolExecutor):
+        self.jobs[executor] -= 1
+        if self.jobs[executor] == 0:
+            del self.jobs[executor]
+            if executor in self.retired:
+                # Its other jobs are done: only the stuck worker is left to stop
+                self.retired.discard(executor)
+                self._terminate(executor)
+
+    @staticmethod
+    def _terminate(executor: ProcessPoolExecutor):
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        for executor in list(self.retired):
+            self._terminate(executor)
+        self.retired.clear()
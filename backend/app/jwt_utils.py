@@ -2,12 +2,15 @@ import jwt
 from datetime import datetime, timedelta
 from typing import Optional
 import os
+import logging
 
 # Secret key for JWT - in production, use environment variable
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 30
 
+logger = logging.getLogger(__name__)
+
 def create_access_token(user_id: str, email: str, username: str) -> str:
     """Create a JWT access token"""
     expire = datetime.utcnow() + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
@@ -30,10 +33,10 @@ def verify_token(token: str) -> Optional[dict]:
             "username": payload.get("username")
         }
     except jwt.ExpiredSignatureError:
-        print("Token has expired")
+        logger.debug("Token has expired")
         return None
     except jwt.InvalidTokenError:
-        print("Invalid token")
+        logger.debug("Invalid token")
         return None
 
 def decode_token_no_verify(token: str) -> Optional[dict]:
@@ -42,5 +45,5 @@ def decode_token_no_verify(token: str) -> Optional[dict]:
         payload = jwt.decode(token, options={"verify_signature": False})
         return payload
     except Exception as e:
-        print(f"Error decoding token: {e}")
+        logger.debug("Error decoding token: %s", e)
         return None
@@ -1,23 +1,80 @@
 import asyncio
-from .redis_client import r
+import json
+import logging
+from time import perf_counter, time
 from .connection import manager
+from .metrics import FANOUT_REDIS, REDIS_LISTENER_LAG_SECONDS, REDIS_LISTENER_ERRORS
+from .room_state import room_store
+from .tracing import NOOP_SPAN, tracer
+from .transport import ROOMS_CHANNEL, transport
+
+logger = logging.getLogger(__name__)
+
+SENT_AT_PREFIX = '{"sent_at": '
+TRACEPARENT_KEY = ', "traceparent": "'
+TRACEPARENT_LENGTH = 55
+
+
+def _envelope_head(content: str):
+    """(sent_at, traceparent) from the head of an edit envelope, without a full JSON parse"""
+    if not content.startswith(SENT_AT_PREFIX):
+        return None, None
+    end = content.find(",", len(SENT_AT_PREFIX), 64)
+    try:
+        sent_at = float(content[len(SENT_AT_PREFIX):end])
+    except ValueError:
+        return None, None
+    traceparent = None
+    if content.startswith(TRACEPARENT_KEY, end):
+        start = end + len(TRACEPARENT_KEY)
+        traceparent = content[start:start + TRACEPARENT_LENGTH]
+    return sent_at, traceparent
+
+
+async def deliver(room_id: str, content: str):
+    """Hand one message from another node to this node's sockets"""
+    if room_id == ROOMS_CHANNEL:
+        notice = json.loads(content)
+        if notice.get("type") == "rooms_deleted":
+            room_store.discard(*notice["room_ids"])
+        return
+    sent_at, traceparent = _envelope_head(content)
+    deliver_span = NOOP_SPAN
+    if sent_at is not None:
+        REDIS_LISTENER_LAG_SECONDS.observe(max(0.0, time() - sent_at))
+        # From publish on the origin node to pickup here
+        deliver_span = tracer.continue_trace(traceparent, "redis.deliver", start_ns=int(sent_at * 1e9))
+        deliver_span.end()
+        # Keep our copy of the room current with edits made on other nodes.
+        # One older than our copy is not passed on: our clients have the newer one.
+        if room_store.peek(room_id) is not None:
+            edit = json.loads(content)
+            if not room_store.apply_remote(room_id, edit["data"], edit.get("revision") or 0):
+                return
+    if room_id in manager.active_connections:
+        started = perf_counter()
+        with deliver_span.child("fanout.redis") as fanout_span:
+            await manager.broadcast_local(content, room_id, span=fanout_span)
+        FANOUT_REDIS.observe(perf_counter() - started)
+
 
 async def redis_listener():
-    """Background task that watches Redis for messages from other servers"""
-    pubsub = r.pubsub()
-    pubsub.psubscribe("*")
+    """Background task that delivers messages from other servers (see transport.py)"""
+    transport.subscribe(ROOMS_CHANNEL)
     while True:
         try:
-            msg = pubsub.get_message(ignore_subscribe_messages=True)
-            if msg and msg['type'] == 'pmessage':
-                room_id = msg['channel']
-                if isinstance(msg['data'], bytes):
-                    content = msg['data'].decode('utf-8')
-                else:
-                    content = msg['data']
-                if room_id in manager.active_connections:
-                    await manager.broadcast_local(content, room_id)
-            await asyncio.sleep(0.01)
+            batch = await transport.read()
         except Exception as e:
-            print(f"Redis Error: {e}")
+            REDIS_LISTENER_ERRORS.inc()
+            logger.error("Redis listener error: %s", e)
             await asyncio.sleep(1)
+            continue
+        for room_id, content in batch:
+            try:
+                await deliver(room_id, content)
+            except Exception as e:
+                # One bad message must not cost the rest of the batch
+                REDIS_LISTENER_ERRORS.inc()
+                logger.error("Redis listener error: %s", e)
+        # Let other tasks run between batches
+        await asyncio.sleep(0)
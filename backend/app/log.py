@@ -0,0 +1,164 @@
+"""Structured, non-blocking logging.
+
+Modules log through the standard library (`logging.getLogger(__name__)`)
+and pass structured fields with `extra=` or %-style args (never f-strings,
+so the rate limit sees one call site per message). setup_logging() routes
+every record through a bounded queue to a background thread that formats
+it as one JSON object per line, so a request or WebSocket handler never
+waits on stdout. If the queue is full, records are dropped and counted in
+syncwrite_log_dropped_total instead of blocking the caller.
+
+Environment:
+  LOG_LEVEL         root level (default INFO)
+  LOG_LEVELS        per-module overrides, e.g. "app.db=DEBUG,app.ai=WARNING"
+  LOG_FORMAT        "json" (default) or "text"
+  LOG_RATE_LIMIT    records per second allowed per call site (default 10)
+  LOG_USER_CONTENT  set to 1 to log room ids, names and emails in clear
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from time import monotonic
+
+from .metrics import Counter, room_label
+
+QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+LOG_DROPPED = Counter("syncwrite_log_dropped_total", "Log records dropped because the log queue was full")
+
+_listener = None
+_log_user_content = False
+
+
+def redact(value):
+    """User-supplied identifiers are hashed unless LOG_USER_CONTENT is set"""
+    if value is None or _log_user_content:
+        return value
+    return "h:" + room_label(str(value))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = " ".join(
+            f"{key}={value}" for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRS and not key.startswith("_")
+        )
+        return f"{text} {fields}" if fields else text
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site (logger + message template).
+
+    A per-keystroke event logs at most `rate` times a second; the next
+    record let through carries a `suppressed` count for the gap.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = monotonic()
+        with self.lock:
+            tokens, last, suppressed = self.buckets.get(key, (self.rate, now, 0))
+            tokens = min(self.rate, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self.buckets[key] = (tokens - 1, now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now; keep the fields structured
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+def _parse_levels(spec: str):
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if level:
+            yield name.strip(), level.strip().upper()
+
+
+def setup_logging():
+    """Install the queue handler on the root logger and start the writer thread"""
+    global _listener, _log_user_content
+    if _listener is not None:
+        return
+    _log_user_content = os.getenv("LOG_USER_CONTENT", "").lower() in ("1", "true", "yes")
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT") == "text" else JsonFormatter())
+
+    handler = DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+    handler.addFilter(RateLimitFilter(float(os.getenv("LOG_RATE_LIMIT", "10"))))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in _parse_levels(os.getenv("LOG_LEVELS", "")):
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
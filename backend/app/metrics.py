@@ -0,0 +1,279 @@
+"""Prometheus-compatible metrics for the real-time pipeline.
+
+A small, dependency-free registry rendered in the text exposition format
+at GET /metrics. Instrumented code binds label children once (at import or
+first use) and then only does `child.inc()` / `child.observe(v)`: a lock
+and a couple of additions, with no per-call allocation.
+
+Room-scoped metrics are labelled with a short hash of the room id (room
+names are user content), and every labelled metric caps its number of
+children so an unbounded label can't grow memory without limit.
+"""
+
+import hashlib
+import os
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from typing import Dict, Iterable, List, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OVERFLOW_LABEL = "__other__"
+
+NODE_ID = os.getenv("NODE_ID") or os.getenv("HOSTNAME") or "local"
+
+
+def room_label(room_id: str) -> str:
+    """Stable, non-identifying label for a room"""
+    return hashlib.sha1(room_id.encode("utf-8")).hexdigest()[:12]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self.lock:
+            self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 max_children: int = 1000):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_children = max_children
+        self.children: Dict[Tuple[str, ...], object] = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self.children[()] = self._default
+        registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Child for these label values; bind it once and keep it"""
+        child = self.children.get(values)
+        if child is not None:
+            return child
+        with self.lock:
+            child = self.children.get(values)
+            if child is None:
+                if len(self.children) >= self.max_children:
+                    values = (OVERFLOW_LABEL,) * len(self.labelnames)
+                    child = self.children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self.children[values] = child
+        return child
+
+    def remove(self, *values: str):
+        """Drop a child (e.g. for a room that is gone); no-op if it isn't there"""
+        with self.lock:
+            self.children.pop(values, None)
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {_format_value(child.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS, max_children: int = 1000):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, max_children)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def _render_child(self, values, child) -> List[str]:
+        with child.lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---- Real-time pipeline ----
+
+WS_CONNECTIONS = Gauge("syncwrite_ws_connections", "Open WebSocket connections on this node", ["node"]).labels(NODE_ID)
+WS_ROOMS = Gauge("syncwrite_ws_rooms", "Rooms with at least one connection on this node", ["node"]).labels(NODE_ID)
+WS_MESSAGES = Counter("syncwrite_ws_messages_total", "Edits received over WebSocket, by room hash", ["room"])
+WS_REJECTED = Counter("syncwrite_ws_rejected_total", "WebSocket edits rejected (viewer role)")
+WS_SENDS = Counter("syncwrite_ws_sends_total", "Messages sent to WebSocket clients")
+WS_SEND_ERRORS = Counter("syncwrite_ws_send_errors_total", "Failed WebSocket sends")
+WS_RESUMES = Counter("syncwrite_ws_resumes_total", "Reconnects with last_revision, by what the client was sent", ["result"])
+
+FANOUT_SECONDS = Histogram("syncwrite_fanout_seconds", "Time to deliver one message to a room's local connections", ["source"])
+FANOUT_LOCAL = FANOUT_SECONDS.labels("local")
+FANOUT_REDIS = FANOUT_SECONDS.labels("redis")
+
+REDIS_PUBLISH_SECONDS = Histogram("syncwrite_redis_publish_seconds", "Redis publish latency (PUBLISH or XADD, per REDIS_TRANSPORT)")
+REDIS_LISTENER_LAG_SECONDS = Histogram(
+    "syncwrite_redis_listener_lag_seconds",
+    "Time from publish on any node to pickup by this node's Redis listener",
+)
+REDIS_LISTENER_ERRORS = Counter("syncwrite_redis_listener_errors_total", "Errors in the Redis listener loop")
+
+# ---- Room state ----
+
+ROOM_STATES = Gauge("syncwrite_room_states", "Rooms held in memory on this node")
+ROOM_STATE_BYTES = Gauge("syncwrite_room_state_bytes", "Memory held by one room's in-memory document, by room hash", ["room"])
+ROOM_STATE_MEMORY = Gauge("syncwrite_room_state_memory_bytes", "Memory held by all in-memory documents on this node")
+ROOM_STATE_LOADS = Counter("syncwrite_room_state_loads_total", "Room states loaded from the database")
+ROOM_STATE_FLUSHES = Counter("syncwrite_room_state_flushes_total", "Dirty room states written to the database")
+ROOM_EVICTIONS = Counter("syncwrite_room_evictions_total", "Room states dropped from memory, by reason", ["reason"])
+
+# ---- Storage ----
+
+DB_SECONDS = Histogram("syncwrite_db_seconds", "db.py call latency", ["function"])
+DB_ERRORS = Counter("syncwrite_db_errors_total", "db.py calls that raised", ["function"])
+
+
+def instrument_db(name: str, fn):
+    """Wrap a db.py function with pre-bound latency and error children"""
+    seconds = DB_SECONDS.labels(name)
+    errors = DB_ERRORS.labels(name)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            seconds.observe(perf_counter() - started)
+    return wrapper
+
+
+# ---- AI ----
+
+AI_UPSTREAM_SECONDS = Histogram("syncwrite_ai_upstream_seconds", "LLM call latency by model and action", ["model", "action"])
+AI_UPSTREAM_REQUESTS = Counter("syncwrite_ai_upstream_requests_total", "LLM calls by model, action and outcome", ["model", "action", "outcome"])
+UPSTREAM_SECONDS = Histogram("syncwrite_upstream_seconds", "External service call latency (LanguageTool, Groq)", ["upstream"])
+RATE_LIMITED = Counter("syncwrite_rate_limited_total", "Requests rejected by a rate limiter", ["limiter"])
@@ -0,0 +1,60 @@
+"""Users, documents, room ACL and invitations.
+
+IF NOT EXISTS so databases created before versioning are adopted as-is;
+0002 then brings their columns up to date.
+"""
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            is_admin INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS documents (
+            room_id TEXT PRIMARY KEY,
+            room_name TEXT NOT NULL,
+            owner_id TEXT NOT NULL,
+            content TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (owner_id) REFERENCES users(user_id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS room_access (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('owner', 'editor', 'viewer')),
+            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            granted_by TEXT,
+            FOREIGN KEY (room_id) REFERENCES documents(room_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (granted_by) REFERENCES users(user_id),
+            UNIQUE(room_id, user_id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS invitations (
+            invite_id TEXT PRIMARY KEY,
+            room_id TEXT NOT NULL,
+            invited_by TEXT NOT NULL,
+            invited_email TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('editor', 'viewer')),
+            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'accepted', 'declined')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            FOREIGN KEY (room_id) REFERENCES documents(room_id),
+            FOREIGN KEY (invited_by) REFERENCES users(user_id)
+        )
+    """)
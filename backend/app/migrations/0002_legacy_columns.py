@@ -0,0 +1,56 @@
+"""Columns added before versioning existed (formerly probed on every startup).
+
+Each step checks the table definition first, so it is a no-op on databases
+created by 0001.
+"""
+
+import logging
+
+from . import table_columns
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade(cursor):
+    users = table_columns(cursor, "users")
+    if "email" not in users:
+        logger.info("Migrating users table: adding email column")
+        cursor.execute("ALTER TABLE users ADD COLUMN email TEXT")
+        # Update existing users with placeholder emails
+        cursor.execute("UPDATE users SET email = username || '@temp.local' WHERE email IS NULL")
+        # Drop old username unique constraint and recreate without it
+        cursor.execute("""
+            CREATE TABLE users_new (
+                user_id TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("INSERT INTO users_new SELECT user_id, username, email, password_hash, created_at FROM users")
+        cursor.execute("DROP TABLE users")
+        cursor.execute("ALTER TABLE users_new RENAME TO users")
+        users = table_columns(cursor, "users")
+
+    if "is_admin" not in users:
+        logger.info("Migrating users table: adding is_admin column")
+        cursor.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER DEFAULT 0")
+
+    documents = table_columns(cursor, "documents")
+    if "room_name" not in documents or "owner_id" not in documents:
+        logger.info("Migrating documents table: adding room_name and owner_id columns")
+        if "room_name" not in documents:
+            cursor.execute("ALTER TABLE documents ADD COLUMN room_name TEXT")
+        if "owner_id" not in documents:
+            cursor.execute("ALTER TABLE documents ADD COLUMN owner_id TEXT")
+        # Set defaults for existing documents
+        cursor.execute("UPDATE documents SET room_name = room_id WHERE room_name IS NULL")
+        cursor.execute("UPDATE documents SET owner_id = 'system' WHERE owner_id IS NULL")
+
+    # ALTER TABLE can't add a column with a CURRENT_TIMESTAMP default; backfill instead
+    for column in ("created_at", "updated_at"):
+        if column not in documents:
+            logger.info("Migrating documents table: adding %s column", column)
+            cursor.execute(f"ALTER TABLE documents ADD COLUMN {column} TIMESTAMP")
+            cursor.execute(f"UPDATE documents SET {column} = CURRENT_TIMESTAMP WHERE {column} IS NULL")
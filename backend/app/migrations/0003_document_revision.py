@@ -0,0 +1,10 @@
+"""Per-document revision counter used by export ETags."""
+
+from . import table_columns
+
+
+def upgrade(cursor):
+    # Databases upgraded by the old startup probe already have it
+    if "revision" not in table_columns(cursor, "documents"):
+        cursor.execute("ALTER TABLE documents ADD COLUMN revision INTEGER DEFAULT 0")
+        cursor.execute("UPDATE documents SET revision = 0 WHERE revision IS NULL")
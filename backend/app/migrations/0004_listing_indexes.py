@@ -0,0 +1,10 @@
+"""Covering indexes for the keyset-paginated listings."""
+
+
+def upgrade(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at, user_id, username, email, is_admin)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents(created_at, room_id, room_name, owner_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_owner ON documents(owner_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_room_access_user ON room_access(user_id, room_id, role)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_room_access_room ON room_access(room_id, user_id, role)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invitations_email ON invitations(invited_email, status, created_at, invite_id)")
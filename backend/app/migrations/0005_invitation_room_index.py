@@ -0,0 +1,5 @@
+"""Index invitations by room so room deletes don't scan every invitation."""
+
+
+def upgrade(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invitations_room ON invitations(room_id)")
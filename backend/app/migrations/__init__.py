@@ -0,0 +1,105 @@
+"""Versioned schema migrations.
+
+Each module in this package named `NNNN_description.py` is one migration,
+applied in version order. A migration defines `upgrade(cursor)` and runs
+inside the migrating transaction; applied versions are recorded in the
+`schema_version` table.
+
+Only one process migrates at a time: `migrate()` takes SQLite's write lock
+(BEGIN IMMEDIATE) before re-reading the version, so workers that boot
+together wait for the first one and then find nothing left to do.
+"""
+
+import importlib
+import logging
+import pkgutil
+import re
+import sqlite3
+from typing import List, Tuple
+
+MIGRATION_RE = re.compile(r"^(\d{4})_(\w+)$")
+LOCK_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+
+def available_migrations() -> List[Tuple[int, str, object]]:
+    """(version, name, module) for every migration file, in order"""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        match = MIGRATION_RE.match(info.name)
+        if match:
+            module = importlib.import_module(f"{__name__}.{info.name}")
+            migrations.append((int(match.group(1)), match.group(2), module))
+    migrations.sort(key=lambda m: m[0])
+    versions = [m[0] for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return migrations
+
+
+def latest_version() -> int:
+    migrations = available_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def table_columns(cursor, table: str) -> set:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def current_version(conn) -> int:
+    """Applied schema version; 0 for a database that predates versioning"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def migrate(db_path: str, target: int = None) -> List[int]:
+    """Apply pending migrations up to `target` (default: latest); returns versions applied"""
+    migrations = available_migrations()
+    if target is None:
+        target = migrations[-1][0] if migrations else 0
+
+    conn = sqlite3.connect(db_path, timeout=LOCK_TIMEOUT, isolation_level=None)
+    applied = []
+    try:
+        # Write lock first, then read the version: another process may have
+        # finished migrating while we waited
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        version = current_version(conn)
+        cursor = conn.cursor()
+        for number, name, module in migrations:
+            if number <= version or number > target:
+                continue
+            logger.info("Applying migration %04d_%s", number, name)
+            module.upgrade(cursor)
+            cursor.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (number, name))
+            applied.append(number)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return applied
+
+
+def status(db_path: str) -> List[Tuple[int, str, bool]]:
+    """(version, name, applied) for every known migration"""
+    conn = sqlite3.connect(db_path)
+    try:
+        version = current_version(conn)
+    finally:
+        conn.close()
+    return [(number, name, number <= version) for number, name, _ in available_migrations()]
@@ -1,5 +1,8 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, Literal
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional, Literal
+
+# Upper bound on items in one batch request
+MAX_BATCH_SIZE = 500
 
 class RegisterRequest(BaseModel):
     username: str
@@ -43,3 +46,21 @@ class InvitationResponse(BaseModel):
 
 class AcceptInviteRequest(BaseModel):
     invite_id: str
+
+class BatchInviteItem(BaseModel):
+    invited_email: EmailStr
+    role: Literal["editor", "viewer"]
+
+class BatchInviteRequest(BaseModel):
+    room_id: str
+    invites: List[BatchInviteItem] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+class RoleChange(BaseModel):
+    user_id: str
+    role: Literal["editor", "viewer"]
+
+class BatchRoleRequest(BaseModel):
+    changes: List[RoleChange] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+class BatchDeleteRoomsRequest(BaseModel):
+    room_ids: List[str] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
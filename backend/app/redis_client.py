@@ -1,4 +1,11 @@
+import os
+
 import redis
 
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
 # Central redis client for backend modules
-r = redis.Redis(host='localhost', port=6379, decode_responses=True)
+r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+
+# Same server without response decoding, for binary values (compressed documents)
+r_bytes = redis.Redis.from_url(REDIS_URL)
@@ -0,0 +1,387 @@
+"""In-memory room state: the live copy of each open document.
+
+A room's first join on a node loads its content and revision from the
+shared Redis document cache (see doc_cache.py), or from the database on a
+cache miss. Later joins and every edit are served from memory. An edit
+takes the room's next revision from a Redis counter shared by all nodes
+(`rev:{room_id}`), so two nodes never give the same revision to different
+edits. It is then written through to the document cache and marks the
+room dirty. A background task writes dirty rooms back to the database
+every ROOM_FLUSH_INTERVAL seconds, so the database lags live edits by at
+most that long. Each write carries its revision and
+never replaces a newer stored one.
+
+Deleting a room drops it here, in the shared cache, and, through the
+transport's ROOMS_CHANNEL, on every other node. A room re-created under
+the same id then starts empty everywhere.
+
+A room leaves memory once it has had no connections on this node for
+ROOM_IDLE_SECONDS. Until then the node no longer hears the room's
+messages, so before serving the held copy again it checks the revision
+counter and reloads the room if another node has edited it since. It is also evicted, least recently used first, when
+all documents together exceed ROOM_MEMORY_MB. Dirty rooms are flushed
+before eviction. Rooms with connections are never evicted for memory, so
+the cap is soft.
+
+Edits made on other nodes arrive through the Redis listener. They replace
+the local copy if they carry a newer revision, and the node where the
+edit was made persists it. Older ones are dropped, and not broadcast:
+this node's clients already have something newer.
+
+Each room also keeps the splices of its last ROOM_REPLAY_OPS revisions.
+A splice is (start, end, text), meaning content[start:end] was replaced
+by text. Offsets are in UTF-16 code units, the way JavaScript indexes
+strings. A client that reconnects with `last_revision` gets only the
+splices it missed. It gets a full snapshot if the buffer no longer
+reaches back that far, or if the splices would be larger than the
+document.
+
+Environment:
+  ROOM_FLUSH_INTERVAL  seconds between write-backs (default 1)
+  ROOM_IDLE_SECONDS    evict rooms without connections after this long (default 300)
+  ROOM_MEMORY_MB       soft cap on in-memory documents (default 256)
+  ROOM_REPLAY_OPS      revisions kept for reconnect catch-up (default 100)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+from collections import OrderedDict, deque
+from time import monotonic
+from typing import Container, List, Optional, Set, Tuple
+
+from .db import get_document_with_revision, save_document_state
+from .doc_cache import doc_cache
+from .log import redact
+from .metrics import (
+    ROOM_EVICTIONS, ROOM_STATE_BYTES, ROOM_STATE_FLUSHES, ROOM_STATE_LOADS, ROOM_STATE_MEMORY,
+    ROOM_STATES, room_label
+)
+from .redis_client import r
+from .transport import ROOMS_CHANNEL, transport
+
+REVISION_KEY = "rev:{}"
+REVISION_TTL = 7 * 86400
+
+logger = logging.getLogger(__name__)
+
+
+Splice = Tuple[int, int, str]
+
+
+def _utf16_len(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode("utf-16-le")) // 2
+
+
+def _common_prefix(a: str, b: str) -> int:
+    # Binary search over slice comparisons: memcmp speed instead of a Python loop per character
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def splice(old: str, new: str) -> Splice:
+    """(start, end, text) in UTF-16 offsets such that replacing old[start:end] with text gives new"""
+    prefix = _common_prefix(old, new)
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+    start = _utf16_len(old[:prefix])
+    return start, start + _utf16_len(old[prefix:len(old) - suffix]), new[prefix:len(new) - suffix]
+
+
+class RoomState:
+    __slots__ = ("content", "revision", "dirty", "last_used", "size", "gauge", "ops", "ops_size", "replay_ops",
+                 "replay_from")
+
+    def __init__(self, room_id: str, content: str, revision: int, replay_ops: int):
+        self.content = content
+        self.revision = revision
+        self.dirty = False
+        self.last_used = monotonic()
+        self.size = 0
+        self.gauge = ROOM_STATE_BYTES.labels(room_label(room_id))
+        # (revision, start, end, text) for the latest revisions, oldest first
+        self.ops: "deque[Tuple[int, int, int, str]]" = deque()
+        self.replay_ops = replay_ops
+        self.ops_size = 0
+        # Clients at an older revision than this always get a snapshot
+        self.replay_from = 0
+
+    def set_content(self, content: str, revision: int):
+        """Move to `revision`, recording its splice if it follows the current one"""
+        if revision == self.revision + 1 and self.replay_ops:
+            op = (revision, *splice(self.content, content))
+            self.ops.append(op)
+            self.ops_size += sys.getsizeof(op[3])
+            while len(self.ops) > self.replay_ops:
+                self.ops_size -= sys.getsizeof(self.ops.popleft()[3])
+        else:
+            # A gap in the revisions: older splices no longer lead here
+            self.ops.clear()
+            self.ops_size = 0
+        self.content = content
+        self.revision = revision
+
+
+class RoomStore:
+    def __init__(self, flush_interval: float, idle_seconds: float, max_bytes: int, replay_ops: int = 0):
+        self.flush_interval = flush_interval
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.replay_ops = replay_ops
+        # LRU order: least recently used first
+        self.states: "OrderedDict[str, RoomState]" = OrderedDict()
+        self.memory = 0
+        # Rooms with connections on this node (ConnectionManager.active_connections)
+        self.active: Container[str] = ()
+        # Held rooms whose messages this node stopped hearing when their last connection left
+        self.unheard: Set[str] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    def get(self, room_id: str) -> Optional[RoomState]:
+        """A room's live state, loaded on first use; None if the room doesn't exist"""
+        state = self.states.get(room_id)
+        if state is not None and not self._current(room_id, state):
+            state = None
+        if state is None:
+            loaded = doc_cache.get(room_id)
+            if loaded is None:
+                loaded = get_document_with_revision(room_id)
+                if loaded is None:
+                    return None
+                ROOM_STATE_LOADS.inc()
+                doc_cache.put(room_id, *loaded)
+            state = RoomState(room_id, *loaded, self.replay_ops)
+            self.states[room_id] = state
+            self._resize(state)
+            ROOM_STATES.set(len(self.states))
+            self._enforce_cap(keep=room_id)
+            if room_id not in self.active:
+                self.unheard.add(room_id)
+        else:
+            self.states.move_to_end(room_id)
+        state.last_used = monotonic()
+        return state
+
+    def peek(self, room_id: str) -> Optional[RoomState]:
+        """The state if this node holds it, without loading or touching it"""
+        state = self.states.get(room_id)
+        if state is not None and not self._current(room_id, state):
+            return None
+        return state
+
+    def unfollow(self, room_id: str):
+        """The room's last connection here has left; edits from other nodes no longer reach it"""
+        if room_id in self.states:
+            self.unheard.add(room_id)
+
+    def _current(self, room_id: str, state: RoomState) -> bool:
+        """Whether a held room is still the latest revision; a stale one is dropped"""
+        if room_id not in self.unheard:
+            return True
+        try:
+            latest = r.get(REVISION_KEY.format(room_id))
+        except Exception as e:
+            logger.warning("Revision counter unavailable, serving held copy: %s", e,
+                           extra={"room": redact(room_id)})
+            return True
+        if latest is not None and int(latest) > state.revision:
+            # Edited on another node while this one wasn't listening
+            self._discard(room_id)
+            return False
+        if room_id in self.active:
+            # Subscribed again: later edits arrive through the listener
+            self.unheard.discard(room_id)
+        return True
+
+    def _next_revision(self, room_id: str, state: RoomState) -> int:
+        """A revision for a new edit that no other node hands out for this room"""
+        key = REVISION_KEY.format(room_id)
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.incr(key)
+            pipe.expire(key, REVISION_TTL)
+            revision = pipe.execute()[0]
+            if revision <= state.revision:
+                # The counter expired and restarted; INCRBY keeps the values unique
+                revision = r.incrby(key, state.revision + 1 - revision)
+            return revision
+        except Exception as e:
+            logger.warning("Revision counter unavailable, numbering locally: %s", e,
+                           extra={"room": redact(room_id)})
+            return state.revision + 1
+
+    def apply_edit(self, room_id: str, content: str) -> Optional[int]:
+        """Make `content` the room's document; returns the new revision"""
+        state = self.get(room_id)
+        if state is None:
+            return None
+        state.set_content(content, self._next_revision(room_id, state))
+        state.dirty = True
+        self._resize(state)
+        doc_cache.put(room_id, content, state.revision)
+        self._enforce_cap(keep=room_id)
+        return state.revision
+
+    def apply_remote(self, room_id: str, content: str, revision: int) -> bool:
+        """Take an edit made on another node; False if ours is newer and it was dropped"""
+        state = self.states.get(room_id)
+        if state is None:
+            return True
+        if revision == state.revision and content != state.content:
+            # Two edits got the same revision (numbered locally while Redis was
+            # down). Splices built on our copy would not fit a client holding the
+            # other one, so clients at this revision or older get a snapshot.
+            state.ops.clear()
+            state.ops_size = 0
+            state.replay_from = revision + 1
+            self._resize(state)
+            return False
+        if revision <= state.revision:
+            return False
+        state.set_content(content, revision)
+        # The origin node writes it back
+        state.dirty = False
+        self._resize(state)
+        return True
+
+    def catch_up(self, state: RoomState, last_revision: int) -> Optional[List[Splice]]:
+        """Splices from last_revision to now, or None when the client needs a snapshot"""
+        if last_revision < state.replay_from:
+            return None
+        if last_revision == state.revision:
+            return []
+        if last_revision > state.revision or not state.ops or state.ops[0][0] > last_revision + 1:
+            return None
+        ops = [op[1:] for op in state.ops if op[0] > last_revision]
+        if sum(len(text) for _, _, text in ops) >= len(state.content):
+            return None
+        return ops
+
+    def _resize(self, state: RoomState):
+        size = sys.getsizeof(state.content) + state.ops_size
+        delta, state.size = size - state.size, size
+        state.gauge.inc(delta)
+        self.memory += delta
+        ROOM_STATE_MEMORY.set(self.memory)
+
+    def _enforce_cap(self, keep: str):
+        if self.memory <= self.max_bytes:
+            return
+        for room_id in list(self.states):
+            if self.memory <= self.max_bytes:
+                break
+            if room_id != keep and room_id not in self.active:
+                self._evict(room_id, "memory")
+
+    def _evict(self, room_id: str, reason: str):
+        state = self.states[room_id]
+        if state.dirty:
+            try:
+                self._save([(room_id, state.content, state.revision)])
+            except Exception as e:
+                logger.error("Could not flush room before eviction: %s", e, extra={"room": redact(room_id)})
+                return
+        self._discard(room_id)
+        ROOM_EVICTIONS.labels(reason).inc()
+
+    def _discard(self, room_id: str):
+        state = self.states.pop(room_id)
+        self.unheard.discard(room_id)
+        state.gauge.dec(state.size)
+        ROOM_STATE_BYTES.remove(room_label(room_id))
+        self.memory -= state.size
+        ROOM_STATE_MEMORY.set(self.memory)
+        ROOM_STATES.set(len(self.states))
+
+    def discard(self, *room_ids: str):
+        """Forget rooms on this node without writing them back"""
+        for room_id in room_ids:
+            if room_id in self.states:
+                self._discard(room_id)
+
+    def drop(self, *room_ids: str):
+        """Forget deleted rooms here, in the shared cache and on every other node"""
+        if not room_ids:
+            return
+        self.discard(*room_ids)
+        doc_cache.forget(*room_ids)
+        try:
+            transport.publish(ROOMS_CHANNEL, json.dumps({"type": "rooms_deleted", "room_ids": list(room_ids)}))
+        except Exception as e:
+            logger.error("Could not tell other nodes about deleted rooms: %s", e)
+
+    def _save(self, batch: List[Tuple[str, str, int]]):
+        for room_id, content, revision in batch:
+            save_document_state(room_id, content, revision)
+            ROOM_STATE_FLUSHES.inc()
+
+    async def flush(self):
+        """Write every dirty room back to the database"""
+        batch = [(room_id, state.content, state.revision)
+                 for room_id, state in self.states.items() if state.dirty]
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self._save, batch)
+        except Exception as e:
+            # Rooms stay dirty and are retried on the next flush
+            logger.error("Room flush failed: %s", e)
+            return
+        for room_id, _, revision in batch:
+            state = self.states.get(room_id)
+            # Edits that landed during the write keep the room dirty
+            if state is not None and state.revision == revision:
+                state.dirty = False
+
+    def evict_idle(self):
+        cutoff = monotonic() - self.idle_seconds
+        for room_id, state in list(self.states.items()):
+            if state.last_used < cutoff and room_id not in self.active:
+                self._evict(room_id, "idle")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                self.evict_idle()
+            except Exception as e:
+                logger.error("Room state maintenance error: %s", e)
+
+    def start(self, active: Container[str]):
+        self.active = active
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background task and write back everything still dirty"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
+
+
+room_store = RoomStore(
+    flush_interval=float(os.getenv("ROOM_FLUSH_INTERVAL", "1")),
+    idle_seconds=float(os.getenv("ROOM_IDLE_SECONDS", "300")),
+    max_bytes=int(float(os.getenv("ROOM_MEMORY_MB", "256")) * 1024 * 1024),
+    replay_ops=int(os.getenv("ROOM_REPLAY_OPS", "100")),
+)
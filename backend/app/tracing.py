@@ -0,0 +1,284 @@
+"""Sampled trace spans for the WebSocket edit pipeline.
+
+A sampled edit gets one trace across every node that touches it:
+
+  ws.edit                 origin node, from receive_text() returning
+    state.apply           RoomStore.apply_edit (the DB write happens later)
+    redis.publish         PUBLISH or XADD; its id travels in the envelope
+      redis.deliver       remote node, from publish until the listener picks it up
+        fanout.redis      broadcast_local on the remote node
+          ws.send         one per connection
+    fanout.local          broadcast_local on the origin node
+      ws.send
+
+Edits that share a broadcast (see coalescer.py) share these spans: the
+last sampled one gets them, with `edits` set to how many it stands for;
+the others end early with `coalesced` set.
+
+The trace context rides in the Redis envelope as a W3C `traceparent`
+right after `sent_at`, so listeners read it without parsing the document.
+Timestamps are wall-clock nanoseconds, so spans from different nodes line
+up on one waterfall as far as the nodes' clocks agree.
+
+Unsampled edits get NOOP_SPAN, whose methods do nothing. Finished spans are
+queued to a background thread that appends them to TRACE_FILE (JSON lines)
+or POSTs them to TRACE_OTLP_ENDPOINT as OTLP/JSON. When the queue is full,
+spans are dropped rather than blocking the event loop.
+
+Environment:
+  TRACE_FILE           append spans here as JSON lines
+  TRACE_OTLP_ENDPOINT  e.g. http://collector:4318/v1/traces
+  TRACE_SAMPLE_RATE    fraction of edits to trace (default 0.01)
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from time import time_ns
+from typing import Dict, List, Optional
+
+from .metrics import NODE_ID, Counter
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 512
+FLUSH_INTERVAL = 1.0
+
+SPANS_EXPORTED = Counter("syncwrite_trace_spans_exported_total", "Trace spans written to the exporter")
+SPANS_DROPPED = Counter("syncwrite_trace_spans_dropped_total", "Trace spans dropped (queue full or export failed)")
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes")
+
+    sampled = True
+
+    def __init__(self, tracer: "Tracer", trace_id: str, parent_id: Optional[str], name: str,
+                 start_ns: Optional[int] = None, attributes: Optional[Dict] = None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns or time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+
+    def child(self, name: str, **attributes) -> "Span":
+        return Span(self.tracer, self.trace_id, self.span_id, name, attributes=attributes)
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time_ns()
+            self.tracer.export(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.end()
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "node": NODE_ID,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stands in for an unsampled trace; every call is a no-op"""
+    __slots__ = ()
+
+    sampled = False
+
+    def child(self, name: str, **attributes) -> "_NoopSpan":
+        return self
+
+    def set(self, key: str, value):
+        pass
+
+    def traceparent(self) -> None:
+        return None
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(spans: List[Span]) -> Dict:
+    """OTLP/JSON ExportTraceServiceRequest for one batch"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": "syncwrite"}},
+                {"key": "service.instance.id", "value": {"stringValue": NODE_ID}},
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "syncwrite.pipeline"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+                } for span in spans],
+            }],
+        }]
+    }
+
+
+class FileSink:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def close(self):
+        pass
+
+
+class OtlpSink:
+    def __init__(self, endpoint: str):
+        import httpx
+        self.endpoint = endpoint
+        self.client = httpx.Client(timeout=5.0)
+
+    def write(self, spans: List[Span]):
+        response = self.client.post(self.endpoint, json=otlp_payload(spans))
+        response.raise_for_status()
+
+    def close(self):
+        self.client.close()
+
+
+class Tracer:
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.sink = None
+        self.queue: queue.Queue = queue.Queue(QUEUE_SIZE)
+        self.thread: Optional[threading.Thread] = None
+
+    def configure(self, sink, sample_rate: float):
+        self.sink = sink
+        self.sample_rate = sample_rate if sink is not None else 0.0
+        if self.sink is not None and self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self.thread.start()
+
+    def start_trace(self, name: str, **attributes):
+        """Root span for a new trace, or NOOP_SPAN if this one isn't sampled"""
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return NOOP_SPAN
+        return Span(self, os.urandom(16).hex(), None, name, attributes=attributes)
+
+    def continue_trace(self, traceparent: Optional[str], name: str, start_ns: Optional[int] = None, **attributes):
+        """Span under a parent from another node; NOOP_SPAN without a context"""
+        if not traceparent or self.sink is None:
+            return NOOP_SPAN
+        parts = traceparent.split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return NOOP_SPAN
+        return Span(self, parts[1], parts[2], name, start_ns=start_ns, attributes=attributes)
+
+    def export(self, span: Span):
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            SPANS_DROPPED.inc()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            if batch[0] is None:
+                return
+            stop = False
+            while len(batch) < BATCH_SIZE:
+                try:
+                    span = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if span is None:
+                    stop = True
+                    break
+                batch.append(span)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Span]):
+        try:
+            self.sink.write(batch)
+            SPANS_EXPORTED.inc(len(batch))
+        except Exception as e:
+            SPANS_DROPPED.inc(len(batch))
+            logger.warning("Trace export failed: %s", e)
+
+    def close(self):
+        """Flush queued spans and stop the exporter thread"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+        self.sample_rate = 0.0
+
+
+def setup_tracing():
+    """Enable sampling if an exporter is configured"""
+    if os.getenv("TRACE_OTLP_ENDPOINT"):
+        sink = OtlpSink(os.getenv("TRACE_OTLP_ENDPOINT"))
+    elif os.getenv("TRACE_FILE"):
+        sink = FileSink(os.getenv("TRACE_FILE"))
+    else:
+        return
+    tracer.configure(sink, float(os.getenv("TRACE_SAMPLE_RATE", "0.01")))
+
+
+tracer = Tracer()
@@ -0,0 +1,155 @@
+"""Cross-node message transport for rooms.
+
+Every node delivers a room message to its own sockets itself, then hands
+it to the transport for the other nodes. A node subscribes to a room
+while it has connections in it, and its listener (listener.py) calls
+`read()` in a loop to get (room_id, message) pairs from other nodes.
+Messages a process published itself are skipped, so local sockets never
+get a copy back through Redis. They are told apart by ORIGIN_ID, which is
+unique per process: NODE_ID names a host (or a container), and the
+workers of `uvicorn --workers N` share it but still need each other's
+messages.
+
+REDIS_TRANSPORT selects the implementation:
+
+  pubsub   PUBLISH to a channel named after the room (the default). Fire
+           and forget: a node that is slow or briefly disconnected
+           misses messages.
+  streams  XADD to one stream per room, `stream:{room_id}`, capped at
+           about REDIS_STREAM_MAXLEN entries. Each node reads with a
+           blocking XREAD and remembers the last id it saw per room. It
+           gets every message in order and, after a Redis blip, picks
+           up where it left off (within the cap). Streams expire
+           REDIS_STREAM_TTL seconds after their last message. Plain
+           XREAD rather than consumer groups: every node needs every
+           message of its rooms, not a share of them.
+
+Besides rooms, every node subscribes to ROOMS_CHANNEL, which carries
+notices for all nodes (deleted rooms). Room ids always contain a "/", so
+the channel cannot clash with a room.
+
+Environment:
+  REDIS_TRANSPORT        pubsub | streams (default pubsub)
+  REDIS_STREAM_MAXLEN    approximate entries kept per room (default 1000)
+  REDIS_STREAM_TTL       seconds a stream outlives its last message (default 86400)
+  REDIS_STREAM_BLOCK_MS  longest XREAD wait (default 100); new
+                         subscriptions join the read after it returns
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Dict, List, Tuple
+
+from .metrics import NODE_ID, Counter
+from .redis_client import r
+
+POLL_INTERVAL = 0.01
+MAX_BATCH = 500
+STREAM_KEY = "stream:{}"
+ROOMS_CHANNEL = "rooms"
+ORIGIN_ID = f"{NODE_ID}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+TRANSPORT_MESSAGES = Counter("syncwrite_transport_messages_total", "Room messages from other nodes, by transport", ["transport"])
+
+logger = logging.getLogger(__name__)
+
+
+class PubSubTransport:
+    name = "pubsub"
+
+    def __init__(self):
+        self.pubsub = r.pubsub()
+        self.received = TRANSPORT_MESSAGES.labels(self.name)
+        # Messages are framed as "<origin id>\n<message>" so a process can skip its own
+        self.own_prefix = ORIGIN_ID + "\n"
+
+    def publish(self, room_id: str, message: str):
+        r.publish(room_id, self.own_prefix + message)
+
+    def subscribe(self, room_id: str):
+        self.pubsub.subscribe(room_id)
+
+    def unsubscribe(self, room_id: str):
+        self.pubsub.unsubscribe(room_id)
+
+    async def read(self) -> List[Tuple[str, str]]:
+        """Everything already received, or [] after a short sleep"""
+        batch = []
+        while self.pubsub.subscribed and len(batch) < MAX_BATCH:
+            msg = self.pubsub.get_message(ignore_subscribe_messages=True)
+            if msg is None:
+                break
+            if msg["type"] != "message" or msg["data"].startswith(self.own_prefix):
+                continue
+            batch.append((msg["channel"], msg["data"].partition("\n")[2]))
+        if not batch:
+            await asyncio.sleep(POLL_INTERVAL)
+        self.received.inc(len(batch))
+        return batch
+
+
+class StreamTransport:
+    name = "streams"
+
+    def __init__(self, maxlen: int, ttl: int, block_ms: int):
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.block_ms = block_ms
+        self.received = TRANSPORT_MESSAGES.labels(self.name)
+        # room_id -> id of the last entry this node has read
+        self.last_ids: Dict[str, str] = {}
+
+    def publish(self, room_id: str, message: str):
+        key = STREAM_KEY.format(room_id)
+        pipe = r.pipeline(transaction=False)
+        pipe.xadd(key, {"origin": ORIGIN_ID, "data": message}, maxlen=self.maxlen, approximate=True)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def subscribe(self, room_id: str):
+        # Start after the newest entry: the joining client loads the current document
+        newest = r.xrevrange(STREAM_KEY.format(room_id), count=1)
+        self.last_ids[room_id] = newest[0][0] if newest else "0-0"
+
+    def unsubscribe(self, room_id: str):
+        self.last_ids.pop(room_id, None)
+
+    async def read(self) -> List[Tuple[str, str]]:
+        """Entries after each room's last id, waiting up to block_ms for one"""
+        if not self.last_ids:
+            await asyncio.sleep(POLL_INTERVAL)
+            return []
+        streams = {STREAM_KEY.format(room_id): last_id for room_id, last_id in self.last_ids.items()}
+        # Blocking read off the event loop; subscriptions may change meanwhile
+        response = await asyncio.to_thread(r.xread, streams, count=MAX_BATCH, block=self.block_ms)
+        batch = []
+        prefix = len(STREAM_KEY.format(""))
+        for key, entries in response or []:
+            room_id = key[prefix:]
+            # Unsubscribed, or re-subscribed from a newer id, during the read
+            if self.last_ids.get(room_id) != streams[key]:
+                continue
+            for entry_id, fields in entries:
+                self.last_ids[room_id] = entry_id
+                if fields.get("origin") != ORIGIN_ID:
+                    batch.append((room_id, fields["data"]))
+        self.received.inc(len(batch))
+        return batch
+
+
+def create_transport():
+    name = os.getenv("REDIS_TRANSPORT", "pubsub")
+    if name == "streams":
+        return StreamTransport(
+            maxlen=int(os.getenv("REDIS_STREAM_MAXLEN", "1000")),
+            ttl=int(os.getenv("REDIS_STREAM_TTL", "86400")),
+            block_ms=int(os.getenv("REDIS_STREAM_BLOCK_MS", "100")),
+        )
+    if name != "pubsub":
+        logger.warning("Unknown REDIS_TRANSPORT %r, using pubsub", name)
+    return PubSubTransport()
+
+
+transport = create_transport()
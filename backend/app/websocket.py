@@ -1,15 +1,26 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 import json
+import logging
+from typing import Optional
+from .cluster import MAX_REDIRECTS, cluster
+from .coalescer import coalescer
 from .connection import manager
-from .db import get_user_by_id, get_document_content, update_document_content, check_room_access
+from .db import get_user_by_id, check_room_access
 from .jwt_utils import verify_token
-from .redis_client import r
+from .room_state import room_store
+from .ai.room_grammar import room_grammar
+from .ai.ngram import ngram_index
+from .log import redact
+from .tracing import tracer
+from .metrics import WS_MESSAGES, WS_REJECTED, WS_RESUMES, room_label
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
 @router.websocket("/ws/{room_id:path}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str, token: str = Query(...)):
+async def websocket_endpoint(websocket: WebSocket, room_id: str, token: str = Query(...),
+                             redirects: int = Query(0), last_revision: Optional[int] = Query(None)):
     # Verify JWT token
     user_data = verify_token(token)
     if not user_data:
@@ -22,19 +33,44 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str, token: str = Qu
     # Check if user has access to this room
     role = check_room_access(room_id, user_id)
     if not role:
-        print(f"Access denied: User {username} ({user_id[:8]}...) tried to access room {room_id}")
+        logger.warning("Room access denied", extra={"user": user_id[:8], "room": redact(room_id)})
         await websocket.close(code=1008, reason="Access denied to this room")
         return
     
+    # With room affinity, every client of a room connects to its owner node.
+    # Past MAX_REDIRECTS (nodes disagreeing mid-rebalance) serve it here;
+    # Redis still relays edits between nodes.
+    owner = cluster.owner(room_id)
+    if owner != cluster.node_id and redirects < MAX_REDIRECTS:
+        await websocket.accept()
+        await manager.redirect(websocket, owner)
+        return
+    
     await manager.connect(websocket, room_id, user_id, username, role)
-    print(f"User {username} ({user_id[:8]}...) joined room {room_id} as {role}")
+    room_messages = WS_MESSAGES.labels(room_label(room_id))
+    room_tag = redact(room_id)
+    logger.info("Joined room", extra={"user": user_id[:8], "room": room_tag, "role": role})
     
-    # Send initial document content to the new user
-    initial_content = get_document_content(room_id)
-    if initial_content:
+    # Send initial document content to the new user (from memory after the first join).
+    # A reconnecting client that says which revision it has only gets what it missed.
+    state = room_store.get(room_id)
+    initial_content = state.content if state else ""
+    ops = room_store.catch_up(state, last_revision) if state and last_revision is not None else None
+    if ops is not None:
+        WS_RESUMES.labels("current" if not ops else "delta").inc()
+        await websocket.send_text(json.dumps({
+            "type": "catchup",
+            "from": last_revision,
+            "revision": state.revision,
+            "ops": ops
+        }))
+    elif state is not None:
+        if last_revision is not None:
+            WS_RESUMES.labels("snapshot").inc()
         content_msg = json.dumps({
             "type": "content",
-            "data": initial_content
+            "data": initial_content,
+            "revision": state.revision
         })
         await websocket.send_text(content_msg)
     
@@ -45,12 +81,20 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str, token: str = Qu
     })
     await websocket.send_text(role_msg)
     
+    # Send the room's shared grammar analysis (or start one)
+    grammar_msg = room_grammar.latest_message(room_id)
+    if grammar_msg:
+        await websocket.send_text(grammar_msg)
+    elif initial_content:
+        room_grammar.schedule(room_id, initial_content)
+    
     try:
         while True:
             data = await websocket.receive_text()
             
             # Check if user has editor role before allowing edits
             if role == "viewer":
+                WS_REJECTED.inc()
                 error_msg = json.dumps({
                     "type": "error",
                     "message": "Viewers cannot edit the document"
@@ -58,20 +102,17 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str, token: str = Qu
                 await websocket.send_text(error_msg)
                 continue
             
-            # 1. Update DB
-            update_document_content(room_id, data)
-            
-            # 2. Publish to REDIS so other servers hear it
-            content_msg = json.dumps({
-                "type": "content",
-                "data": data,
-                "edited_by": username
-            })
-            r.publish(room_id, content_msg)
+            room_messages.inc()
+            trace = tracer.start_trace("ws.edit", room=room_tag, chars=len(data))
             
-            # 3. Broadcast to other people on THIS server
-            await manager.broadcast_local(content_msg, room_id, sender=websocket)
+            # Apply, publish and broadcast, at most once per room per tick (see coalescer.py)
+            await coalescer.submit(room_id, websocket, username, data, trace)
             
     except WebSocketDisconnect:
         await manager.disconnect(websocket, room_id, user_id)
-        print(f"User {username} ({user_id[:8]}...) left room {room_id}")
+        if not manager.active_connections.get(room_id):
+            room_grammar.forget(room_id)
+            ngram_index.forget(room_id)
+            coalescer.forget(room_id)
+            room_store.unfollow(room_id)
+        logger.info("Left room", extra={"user": user_id[:8], "room": room_tag})
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk admin operations: per-row loops vs set-based batches.
+Usage: python benchmarks/bench_bulk_admin.py [rooms] [members_per_room]
+
+Seeds a database where one heavy user owns `rooms` rooms (default 5000),
+each shared with `members_per_room` users (default 20) and carrying a few
+pending invitations. Each scenario runs against a fresh copy of it:
+
+  offboard   - delete the heavy user: old per-room loop vs set-based deletes
+  provision  - give 200 users access to a room: 200 grant calls vs one batch
+  purge      - delete 200 rooms: 200 single deletes vs one batch
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import uuid
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app import db  # noqa: E402
+
+
+def legacy_delete_user_admin(user_id: str):
+    """The previous implementation, kept here for comparison only"""
+    conn = sqlite3.connect(db.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT room_id FROM documents WHERE owner_id = ?", (user_id,))
+    rooms = [row[0] for row in cursor.fetchall()]
+    for room_id in rooms:
+        cursor.execute("DELETE FROM room_access WHERE room_id = ?", (room_id,))
+        cursor.execute("DELETE FROM invitations WHERE room_id = ?", (room_id,))
+    cursor.execute("DELETE FROM documents WHERE owner_id = ?", (user_id,))
+    cursor.execute("DELETE FROM room_access WHERE user_id = ?", (user_id,))
+    cursor.execute("DELETE FROM invitations WHERE invited_email IN (SELECT email FROM users WHERE user_id = ?)", (user_id,))
+    cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+    conn.commit()
+    conn.close()
+
+
+def seed(path: str, rooms: int, members: int) -> dict:
+    db.DB_PATH = path
+    db.init_db()
+    conn = sqlite3.connect(path)
+    users = [str(uuid.uuid4()) for _ in range(max(members * 10, 400))]
+    conn.executemany(
+        "INSERT INTO users (user_id, username, email, password_hash) VALUES (?, ?, ?, '')",
+        [(uid, f"user{i}", f"user{i}@example.com") for i, uid in enumerate(users)],
+    )
+    heavy = users[0]
+    room_ids = [f"{heavy}/doc{n}" for n in range(rooms)]
+    conn.executemany(
+        "INSERT INTO documents (room_id, room_name, owner_id, content) VALUES (?, ?, ?, '')",
+        [(room_id, room_id.split("/")[1], heavy) for room_id in room_ids],
+    )
+    access, invites = [], []
+    for n, room_id in enumerate(room_ids):
+        access.append((room_id, heavy, "owner"))
+        for m in range(1, members):
+            access.append((room_id, users[(n + m) % len(users) or 1], "editor"))
+        for k in range(3):
+            invites.append((str(uuid.uuid4()), room_id, heavy, f"user{(n + k) % len(users)}@example.com"))
+    conn.executemany("INSERT OR IGNORE INTO room_access (room_id, user_id, role) VALUES (?, ?, ?)", access)
+    conn.executemany(
+        "INSERT INTO invitations (invite_id, room_id, invited_by, invited_email, role) VALUES (?, ?, ?, ?, 'viewer')",
+        invites,
+    )
+    conn.commit()
+    conn.close()
+    return {"heavy": heavy, "users": users, "rooms": room_ids}
+
+
+def timed(template: str, workdir: str, fn) -> float:
+    """Run fn against a fresh copy of the seeded database"""
+    path = os.path.join(workdir, f"run-{uuid.uuid4().hex}.db")
+    shutil.copy(template, path)
+    db.DB_PATH = path
+    started = perf_counter()
+    fn()
+    elapsed = perf_counter() - started
+    os.remove(path)
+    return elapsed
+
+
+def report(name: str, before: float, after: float):
+    print(f"{name:<10} loop {before * 1000:9.1f} ms   batch {after * 1000:9.1f} ms   {before / after:6.1f}x")
+
+
+def main():
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    members = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with tempfile.TemporaryDirectory() as workdir:
+        template = os.path.join(workdir, "template.db")
+        fixture = seed(template, rooms, members)
+        print(f"Fixture: {rooms} rooms x {members} members, {len(fixture['users'])} users\n")
+
+        heavy = fixture["heavy"]
+        room = fixture["rooms"][0]
+        team = [(uid, "editor") for uid in fixture["users"][1:201]]
+        purge = fixture["rooms"][-200:]
+
+        report(
+            "offboard",
+            timed(template, workdir, lambda: legacy_delete_user_admin(heavy)),
+            timed(template, workdir, lambda: db.delete_user_admin(heavy)),
+        )
+        report(
+            "provision",
+            timed(template, workdir, lambda: [db.grant_room_access(room, uid, role, heavy) for uid, role in team]),
+            timed(template, workdir, lambda: db.set_room_roles_bulk(room, heavy, team)),
+        )
+        report(
+            "purge",
+            timed(template, workdir, lambda: [db.delete_room_admin(room_id) for room_id in purge]),
+            timed(template, workdir, lambda: db.delete_rooms_bulk(purge)),
+        )
+
+
+if __name__ == "__main__":
+    main()
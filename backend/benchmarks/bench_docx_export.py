@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark DOCX export: the old BeautifulSoup converter vs the streaming one.
+Usage: python benchmarks/bench_docx_export.py [pages]
+
+Builds a synthetic document of roughly `pages` pages (default 100) with
+headings, formatted paragraphs, nested lists and tables, then reports wall
+time and peak Python memory (tracemalloc) for each converter.
+"""
+
+import io
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.export.docx_writer import html_to_docx  # noqa: E402
+
+
+def legacy_html_to_docx(content: str) -> io.BytesIO:
+    """The previous implementation, kept here for comparison only"""
+    from docx import Document
+    from bs4 import BeautifulSoup
+
+    doc = Document()
+    soup = BeautifulSoup(content, 'html.parser')
+    for element in soup.find_all(['p', 'h1', 'h2', 'h3', 'ul', 'ol', 'li']):
+        text = element.get_text()
+        if element.name == 'h1':
+            doc.add_heading(text, level=1)
+        elif element.name == 'h2':
+            doc.add_heading(text, level=2)
+        elif element.name == 'h3':
+            doc.add_heading(text, level=3)
+        elif element.name == 'p':
+            doc.add_paragraph(text)
+        elif element.name in ['li']:
+            doc.add_paragraph(text, style='List Bullet')
+
+    docx_bytes = io.BytesIO()
+    doc.save(docx_bytes)
+    docx_bytes.seek(0)
+    return docx_bytes
+
+
+def build_document(pages: int) -> str:
+    """About one printed page of mixed content per iteration"""
+    parts = []
+    for page in range(pages):
+        parts.append(f'<h2 style="text-align: center">Section {page + 1}</h2>')
+        for i in range(4):
+            parts.append(
+                f'<p>Paragraph {i} with <strong>bold</strong>, <em>italic</em>, <u>underlined</u> and '
+                f'<span style="color: #c0392b">coloured</span> text, a <a href="https://example.com/{page}">link</a> '
+                'and <mark>highlighted words</mark>. Lorem ipsum dolor sit amet, consectetur adipiscing '
+                'elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.</p>'
+            )
+        parts.append(
+            '<ul><li><p>First point</p></li><li><p>Second point</p>'
+            '<ol><li><p>Nested step one</p></li><li><p>Nested step two</p></li></ol></li></ul>'
+        )
+        if page % 5 == 0:
+            parts.append(
+                '<table><tr><th>Metric</th><th>Value</th></tr>'
+                '<tr><td>Latency</td><td>12 ms</td></tr><tr><td>Errors</td><td>0</td></tr></table>'
+            )
+    return "".join(parts)
+
+
+def measure(name: str, fn, content: str):
+    fn(content)  # warm up imports and style lookups
+    started = perf_counter()
+    result = fn(content)
+    elapsed = perf_counter() - started
+
+    # Separate run: tracemalloc slows allocation-heavy code too much to time under it
+    tracemalloc.start()
+    fn(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = len(result.getvalue())
+    print(f"{name:<10} {elapsed * 1000:9.1f} ms   peak {peak / 1024 / 1024:7.1f} MiB   output {size / 1024:7.1f} KiB")
+    return elapsed, peak
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    content = build_document(pages)
+    print(f"Document: {pages} pages, {len(content) / 1024:.0f} KiB of HTML\n")
+
+    legacy_time, legacy_peak = measure("legacy", legacy_html_to_docx, content)
+    stream_time, stream_peak = measure("streaming", html_to_docx, content)
+
+    print(f"\nSpeedup: {legacy_time / stream_time:.2f}x   peak memory: {stream_peak / legacy_peak:.2f}x of legacy")
+
+
+if __name__ == "__main__":
+    main()
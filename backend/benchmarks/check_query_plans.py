@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Check that the paginated listing queries are served from indexes.
+Usage: python benchmarks/check_query_plans.py
+
+Seeds a throwaway database, calls the real db.py listing functions (first
+page and a follow-up page), captures the SQL they run and checks its
+EXPLAIN QUERY PLAN: every table must be reached through an index, and no
+listing may sort its full result in a temporary B-tree. Exits non-zero on
+any violation.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app import db  # noqa: E402
+
+# function name -> (indexes its plan must use, whether a per-user sort is acceptable)
+EXPECTED = {
+    "get_all_users": ({"idx_users_created"}, False),
+    "get_all_rooms": ({"idx_documents_created", "idx_room_access_room"}, False),
+    # Sorted after the index lookup, but only over the rooms of one user
+    "get_user_rooms": ({"idx_room_access_user"}, True),
+    "get_room_users": ({"idx_room_access_room"}, False),
+    "get_user_invitations": ({"idx_invitations_email"}, False),
+}
+
+captured = []
+_connect = sqlite3.connect
+
+
+def traced_connect(*args, **kwargs):
+    conn = _connect(*args, **kwargs)
+    conn.set_trace_callback(lambda sql: captured.append(sql) if sql.lstrip().upper().startswith("SELECT") else None)
+    return conn
+
+
+def seed(users: int = 2000, rooms_per_user: int = 2, members: int = 5):
+    conn = _connect(db.DB_PATH)
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    conn.executemany(
+        "INSERT INTO users (user_id, username, email, password_hash, created_at) VALUES (?, ?, ?, '', datetime('now', ?))",
+        [(uid, f"user{i}", f"user{i}@example.com", f"-{i} seconds") for i, uid in enumerate(user_ids)],
+    )
+    rooms, access, invites = [], [], []
+    for i, uid in enumerate(user_ids):
+        for n in range(rooms_per_user):
+            room_id = f"{uid}/doc{n}"
+            rooms.append((room_id, f"doc{n}", uid, f"-{i * rooms_per_user + n} seconds"))
+            access.append((room_id, uid, "owner"))
+            for m in range(1, members):
+                access.append((room_id, user_ids[(i + m) % users], "editor"))
+            invites.append((str(uuid.uuid4()), room_id, uid, f"user{(i + 7) % users}@example.com"))
+    conn.executemany(
+        "INSERT INTO documents (room_id, room_name, owner_id, content, created_at, updated_at) "
+        "VALUES (?, ?, ?, '', datetime('now', ?), CURRENT_TIMESTAMP)", rooms)
+    conn.executemany("INSERT INTO room_access (room_id, user_id, role) VALUES (?, ?, ?)", access)
+    conn.executemany(
+        "INSERT INTO invitations (invite_id, room_id, invited_by, invited_email, role) VALUES (?, ?, ?, ?, 'editor')",
+        invites)
+    conn.commit()
+    conn.close()
+    return user_ids
+
+
+def run_listing(name: str, *args) -> list:
+    """Run a listing twice (first page, then from its last row) and return the SQL used"""
+    captured.clear()
+    fn = getattr(db, name)
+    rows = fn(*args, 10, None)
+    last = rows[-1]
+    keys = {
+        "get_all_users": (last.get("created_at"), last.get("user_id")),
+        "get_all_rooms": (last.get("created_at"), last.get("room_id")),
+        "get_user_rooms": (last.get("updated_at"), last.get("room_id")),
+        "get_room_users": (last.get("user_id"),),
+        "get_user_invitations": (last.get("created_at"), last.get("invite_id")),
+    }
+    fn(*args, 10, keys[name])
+    return list(captured)
+
+
+def check(name: str, statements: list) -> list:
+    required, sort_ok = EXPECTED[name]
+    conn = _connect(db.DB_PATH)
+    problems = []
+    for sql in statements:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        print(f"\n{name}:")
+        for line in plan:
+            print(f"    {line}")
+        text = "\n".join(plan)
+        for line in plan:
+            if line.startswith("SCAN") and "INDEX" not in line:
+                problems.append(f"{name}: full table scan ({line})")
+            if "TEMP B-TREE" in line and not sort_ok:
+                problems.append(f"{name}: sorts in a temporary B-tree ({line})")
+        for index in required:
+            if index not in text:
+                problems.append(f"{name}: does not use {index}")
+    conn.close()
+    return problems
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "plans.db")
+        db.init_db()
+        user_ids = seed()
+
+        sqlite3.connect = traced_connect
+        try:
+            listings = {
+                "get_all_users": run_listing("get_all_users"),
+                "get_all_rooms": run_listing("get_all_rooms"),
+                "get_user_rooms": run_listing("get_user_rooms", user_ids[0]),
+                "get_room_users": run_listing("get_room_users", f"{user_ids[0]}/doc0"),
+                "get_user_invitations": run_listing("get_user_invitations", "user7@example.com"),
+            }
+        finally:
+            sqlite3.connect = _connect
+
+        problems = []
+        for name, statements in listings.items():
+            problems.extend(check(name, statements))
+
+    print()
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print("✓ All listing queries use their indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the hot paths, with a baseline to catch regressions.
+Usage: python benchmarks/microbench.py [-k FILTER] [--scale N] [--save FILE] [--compare FILE] [--tolerance 0.25]
+
+Each benchmark is a function that takes the shared fixtures and one
+parameter. It does its setup, then returns the callable to time (sync or
+async). Timing works like timeit's autorange: the loop count is
+calibrated so one round takes at least 50 ms. The report shows the median
+and best of 5 rounds per call.
+
+Fixtures are built once per run:
+  db       synthetic database: 10k x --scale users, 2k x --scale rooms,
+           ~10 members each
+  redis    in-process fakeredis for presence and the document cache
+           (pip install fakeredis); benchmarks that need it are skipped
+           without it
+
+--save writes the results as a baseline. --compare checks a run against
+one and exits non-zero if any median is slower than the baseline by more
+than --tolerance. Only compare against a baseline recorded on the same
+machine; the baseline file records the host it came from.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import uuid
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app import connection, db, doc_cache, room_state, transport  # noqa: E402
+from app.ai.ai_routes import RateLimiter  # noqa: E402
+from app.ai.grammar_checker import GrammarChecker  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json")
+ROUNDS = 5
+MIN_ROUND_TIME = 0.05
+
+BENCHMARKS = []
+
+
+def benchmark(name: str, params=(None,), needs=()):
+    """Register fn(fixtures, param) -> callable under `name[param]`"""
+    def register(fn):
+        for param in params:
+            BENCHMARKS.append((f"{name}[{param}]" if param is not None else name, fn, param, needs))
+        return fn
+    return register
+
+
+# ---- Fixtures ----
+
+class Fixtures:
+    def __init__(self, workdir: str, scale: int):
+        self.workdir = workdir
+        self.scale = scale
+        self.redis = None
+        self._build_db()
+        try:
+            import fakeredis
+            server = fakeredis.FakeServer()
+            self.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+            connection.r = self.redis
+            transport.r = self.redis
+            room_state.r = self.redis
+            doc_cache.r_bytes = fakeredis.FakeRedis(server=server)
+        except ImportError:
+            pass
+
+    def _build_db(self):
+        db.DB_PATH = os.path.join(self.workdir, "bench.db")
+        db.init_db()
+        rng = random.Random(7)
+        self.users = [str(uuid.uuid4()) for _ in range(10_000 * self.scale)]
+        self.rooms = [f"{self.users[i]}/doc{i}" for i in range(2_000 * self.scale)]
+        conn = sqlite3.connect(db.DB_PATH)
+        conn.executemany(
+            "INSERT INTO users (user_id, username, email, password_hash) VALUES (?, ?, ?, '')",
+            [(uid, f"user{i}", f"user{i}@example.com") for i, uid in enumerate(self.users)],
+        )
+        conn.executemany(
+            "INSERT INTO documents (room_id, room_name, owner_id, content) VALUES (?, ?, ?, '')",
+            [(room_id, room_id.split("/")[1], room_id.split("/")[0]) for room_id in self.rooms],
+        )
+        access = []
+        self.members = {}
+        for room_id in self.rooms:
+            members = {room_id.split("/")[0]} | set(rng.sample(self.users, 9))
+            self.members[room_id] = list(members)
+            access.extend((room_id, uid, "editor") for uid in members)
+        conn.executemany("INSERT OR IGNORE INTO room_access (room_id, user_id, role) VALUES (?, ?, ?)", access)
+        conn.commit()
+        conn.close()
+
+
+class MockSocket:
+    """Stands in for a WebSocket; send_text completes immediately"""
+    __slots__ = ("sent",)
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_text(self, message: str):
+        self.sent += 1
+
+
+# ---- db.py ----
+
+@benchmark("db.check_room_access", params=("member", "outsider"))
+def bench_check_room_access(fx: Fixtures, case):
+    room_id = fx.rooms[len(fx.rooms) // 2]
+    user_id = fx.members[room_id][0] if case == "member" else str(uuid.uuid4())
+    return lambda: db.check_room_access(room_id, user_id)
+
+
+@benchmark("db.get_user_by_id")
+def bench_get_user_by_id(fx: Fixtures, _):
+    user_id = fx.users[len(fx.users) // 2]
+    return lambda: db.get_user_by_id(user_id)
+
+
+@benchmark("db.update_document_content", params=("1KB", "64KB", "1MB", "5MB"))
+def bench_update_document_content(fx: Fixtures, size):
+    length = {"1KB": 1 << 10, "64KB": 64 << 10, "1MB": 1 << 20, "5MB": 5 << 20}[size]
+    room_id = fx.rooms[0]
+    content = ("<p>" + "lorem ipsum " * (length // 12 + 1))[:length]
+    return lambda: db.update_document_content(room_id, content)
+
+
+# ---- ConnectionManager ----
+
+@benchmark("connection.broadcast_local", params=(1, 10, 100, 1000))
+def bench_broadcast_local(fx: Fixtures, sockets):
+    room_id = f"bench/broadcast-{sockets}"
+    sender = MockSocket()
+    peers = [(sender, "sender", "sender", "editor")]
+    peers += [(MockSocket(), f"u{i}", f"user{i}", "editor") for i in range(sockets - 1)]
+    connection.manager.active_connections[room_id] = peers
+    message = json.dumps({"sent_at": 0.0, "type": "content", "data": "<p>hello</p>" * 100, "edited_by": "sender"})
+
+    async def run():
+        await connection.manager.broadcast_local(message, room_id, sender=sender)
+    return run
+
+
+@benchmark("connection.broadcast_presence", params=(10, 100, 1000), needs=("redis",))
+def bench_broadcast_presence(fx: Fixtures, users):
+    room_id = f"bench/presence-{users}"
+    fx.redis.delete(f"presence:{room_id}")
+    fx.redis.sadd(f"presence:{room_id}", *fx.users[:users])
+
+    async def run():
+        await connection.manager.broadcast_presence(room_id)
+    return run
+
+
+# ---- Room state ----
+
+# A room's first join on a node: 64 KB document from SQLite or the Redis cache
+@benchmark("RoomStore.get.cold", params=("db", "cache"), needs=("redis",))
+def bench_room_load(fx: Fixtures, source):
+    room_id = fx.rooms[1]
+    db.update_document_content(room_id, ("<p>" + "lorem ipsum " * 6000)[:64 << 10])
+    doc_cache.doc_cache.enabled = source == "cache"
+    store = room_state.RoomStore(flush_interval=1, idle_seconds=300, max_bytes=1 << 30)
+    store.get(room_id)  # fills the cache
+
+    def run():
+        store.get(room_id)
+        store._discard(room_id)
+    store._discard(room_id)
+    return run
+
+
+# ---- AI ----
+
+@benchmark("RateLimiter.is_allowed", params=(1_000, 100_000))
+def bench_rate_limiter(fx: Fixtures, users):
+    limiter = RateLimiter("bench", max_requests=30, window=60)
+    user_ids = [f"user{i}" for i in range(users)]
+    # Steady state: every user already has some requests in the window
+    for user_id in user_ids:
+        for _ in range(10):
+            limiter.is_allowed(user_id)
+    state = {"i": 0}
+
+    def run():
+        state["i"] = (state["i"] + 1) % users
+        limiter.is_allowed(user_ids[state["i"]])
+    return run
+
+
+def languagetool_response(matches: int) -> dict:
+    categories = ["TYPOS", "GRAMMAR", "STYLE", "REDUNDANCY", "PUNCTUATION"]
+    return {"matches": [{
+        "offset": i * 40,
+        "length": 6,
+        "message": "Possible agreement error",
+        "replacements": [{"value": f"fix{j}"} for j in range(5)],
+        "rule": {"id": f"RULE_{i % 17}", "category": {"id": categories[i % len(categories)]}},
+    } for i in range(matches)]}
+
+
+@benchmark("GrammarChecker._parse_matches", params=(10, 200))
+def bench_parse_matches(fx: Fixtures, matches):
+    checker = GrammarChecker()
+    result = languagetool_response(matches)
+    return lambda: checker._parse_matches(result)
+
+
+@benchmark("GrammarChecker.cached_paragraphs", params=(20, 500))
+def bench_cached_paragraphs(fx: Fixtures, paragraphs):
+    checker = GrammarChecker()
+    text = "\n".join(f"Paragraph {i} has some perfectly ordinary text in it." for i in range(paragraphs))
+    errors = checker._parse_matches(languagetool_response(2))
+
+    async def remote(batch, language, disabled_categories=""):
+        return errors
+    checker._check_remote = remote
+    asyncio.run(checker._check_paragraphs(text, "en-US"))  # warm the paragraph cache
+
+    async def run():
+        await checker._check_paragraphs(text, "en-US")
+    return run
+
+
+# ---- Runner ----
+
+def time_calls(fn, loop) -> list:
+    """Per-call seconds for each round, with the loop count auto-calibrated"""
+    if asyncio.iscoroutinefunction(fn):
+        async def batch(n):
+            started = perf_counter()
+            for _ in range(n):
+                await fn()
+            return perf_counter() - started
+
+        def run(n):
+            return loop.run_until_complete(batch(n))
+    else:
+        def run(n):
+            started = perf_counter()
+            for _ in range(n):
+                fn()
+            return perf_counter() - started
+
+    number = 1
+    while run(number) < MIN_ROUND_TIME:
+        number *= 2
+    return [run(number) / number for _ in range(ROUNDS)]
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    ok = True
+    print(f"\nvs {baseline_path} (tolerance {tolerance:.0%})")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"  {name:<52} new")
+            continue
+        ratio = result["median_us"] / baseline[name]["median_us"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        ok = ok and not flag
+        print(f"  {name:<52} {baseline[name]['median_us']:>12.2f} -> {result['median_us']:<12.2f} {ratio:5.2f}x {flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path microbenchmarks")
+    parser.add_argument("-k", dest="filter", help="only benchmarks whose name contains this")
+    parser.add_argument("--scale", type=int, default=1, help="multiplier for the synthetic database")
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, help="write results as a baseline")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="baseline to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    selected = [b for b in BENCHMARKS if not args.filter or args.filter in b[0]]
+    results = {}
+    loop = asyncio.new_event_loop()
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Building fixtures (scale {args.scale})...")
+        fixtures = Fixtures(workdir, args.scale)
+        print(f"\n{'benchmark':<52} {'median us':>12} {'min us':>12} {'ops/s':>12}")
+        for name, fn, param, needs in selected:
+            if any(getattr(fixtures, need) is None for need in needs):
+                print(f"{name:<52} {'skipped (needs ' + ', '.join(needs) + ')':>38}")
+                continue
+            per_call = time_calls(fn(fixtures, param), loop)
+            median, best = statistics.median(per_call) * 1e6, min(per_call) * 1e6
+            results[name] = {"median_us": round(median, 3), "min_us": round(best, 3)}
+            print(f"{name:<52} {median:>12.2f} {best:>12.2f} {1e6 / median:>12.0f}")
+    loop.close()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "host": {"python": platform.python_version(), "machine": platform.machine(),
+                         "processor": platform.processor(), "cpus": os.cpu_count()},
+                "scale": args.scale,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nWrote {args.save}")
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
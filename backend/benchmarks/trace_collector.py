@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Minimal OTLP/HTTP trace collector for local debugging.
+Usage: python benchmarks/trace_collector.py [OUTPUT] [PORT]
+
+Accepts OTLP/JSON on POST /v1/traces (default port 4318) and appends each
+span to OUTPUT (default traces.jsonl) in the same JSON-lines format as
+TRACE_FILE, so spans from every node end up in one file for
+trace_waterfall.py. Point each node at it with
+TRACE_OTLP_ENDPOINT=http://HOST:4318/v1/traces.
+"""
+
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+lock = threading.Lock()
+
+
+def attribute_value(value: dict):
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    if "intValue" in value:
+        return int(value["intValue"])
+    return None
+
+
+def flatten(payload: dict):
+    """Yield TRACE_FILE-style span dicts from an ExportTraceServiceRequest"""
+    for resource_spans in payload.get("resourceSpans", []):
+        resource = {
+            a["key"]: attribute_value(a["value"])
+            for a in resource_spans.get("resource", {}).get("attributes", [])
+        }
+        node = resource.get("service.instance.id") or resource.get("service.name")
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                yield {
+                    "trace_id": span["traceId"],
+                    "span_id": span["spanId"],
+                    "parent_id": span.get("parentSpanId") or None,
+                    "name": span["name"],
+                    "node": node,
+                    "start_ns": int(span["startTimeUnixNano"]),
+                    "end_ns": int(span["endTimeUnixNano"]),
+                    "attributes": {a["key"]: attribute_value(a["value"]) for a in span.get("attributes", [])},
+                }
+
+
+def make_handler(output: str):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/traces":
+                self.send_error(404)
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                spans = list(flatten(json.loads(body)))
+            except (ValueError, KeyError) as e:
+                self.send_error(400, str(e))
+                return
+            with lock, open(output, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(span) + "\n")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    output = sys.argv[1] if len(sys.argv) > 1 else "traces.jsonl"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 4318
+    server = ThreadingHTTPServer(("0.0.0.0", port), make_handler(output))
+    print(f"Collecting spans on :{port}/v1/traces into {output}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Print a waterfall for sampled edit traces.
+Usage: python benchmarks/trace_waterfall.py FILE [FILE ...] [--trace ID] [--last N] [--slowest N]
+
+FILE is a TRACE_FILE from any node or the output of trace_collector.py;
+pass one file per node to stitch a trace across nodes. By default prints
+the last 5 traces. Offsets and durations are in milliseconds from the
+first span of each trace.
+"""
+
+import json
+import sys
+from collections import defaultdict
+
+BAR_WIDTH = 40
+
+
+def load(paths):
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    span = json.loads(line)
+                    traces[span["trace_id"]].append(span)
+    return traces
+
+
+def ordered(spans):
+    """Depth-first by start time; spans whose parent is missing become roots"""
+    ids = {span["span_id"] for span in spans}
+    children = defaultdict(list)
+    for span in spans:
+        parent = span["parent_id"] if span["parent_id"] in ids else None
+        children[parent].append(span)
+
+    def walk(parent, depth):
+        for span in sorted(children[parent], key=lambda s: s["start_ns"]):
+            yield depth, span
+            yield from walk(span["span_id"], depth + 1)
+
+    return list(walk(None, 0))
+
+
+def print_trace(trace_id, spans):
+    start = min(span["start_ns"] for span in spans)
+    end = max(span["end_ns"] for span in spans)
+    total = max(end - start, 1)
+    nodes = sorted({span["node"] for span in spans})
+    print(f"trace {trace_id}  {total / 1e6:.2f} ms  nodes: {', '.join(nodes)}")
+    for depth, span in ordered(spans):
+        offset = span["start_ns"] - start
+        duration = span["end_ns"] - span["start_ns"]
+        left = int(offset / total * BAR_WIDTH)
+        width = max(1, int(duration / total * BAR_WIDTH))
+        bar = " " * left + "█" * min(width, BAR_WIDTH - left)
+        name = "  " * depth + span["name"]
+        print(f"  {name:<26} {span['node']:<12} {offset / 1e6:8.2f} {duration / 1e6:8.2f}  |{bar:<{BAR_WIDTH}}|")
+    print()
+
+
+def main():
+    args = sys.argv[1:]
+    options = {}
+    for flag in ("--trace", "--last", "--slowest"):
+        if flag in args:
+            i = args.index(flag)
+            options[flag] = args[i + 1]
+            del args[i:i + 2]
+    if not args:
+        print(__doc__.strip().splitlines()[1])
+        sys.exit(1)
+
+    traces = load(args)
+    if "--trace" in options:
+        selected = [options["--trace"]] if options["--trace"] in traces else []
+    else:
+        def first_start(trace_id):
+            return min(span["start_ns"] for span in traces[trace_id])
+
+        def duration(trace_id):
+            spans = traces[trace_id]
+            return max(s["end_ns"] for s in spans) - min(s["start_ns"] for s in spans)
+
+        if "--slowest" in options:
+            selected = sorted(traces, key=duration, reverse=True)[:int(options["--slowest"])]
+        else:
+            selected = sorted(traces, key=first_start)[-int(options.get("--last", 5)):]
+
+    if not selected:
+        print("No matching traces")
+        sys.exit(1)
+    for trace_id in selected:
+        print_trace(trace_id, traces[trace_id])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+WebSocket load harness: R rooms x U clients against real app processes.
+Usage: python benchmarks/ws_load.py [--scenario NAME] [options] [--out FILE] [--compare FILE]
+
+Seeds a temporary SQLite database and starts one or more uvicorn processes
+(`--nodes`) that share one Redis. Redis is `--redis URL` if given,
+otherwise a throwaway redis-server if one is installed, otherwise an
+in-process fakeredis TCP server (pip install fakeredis). Each room gets U
+clients, spread round-robin over the nodes so edits fan out across them.
+Clients are editors or viewers (`--viewers` is the viewer fraction), and
+each editor sends a document of `--doc-size` bytes at `--rate` edits/s
+(Poisson arrivals).
+
+Every edit carries a marker with its send time. Receivers match it to
+measure edit-to-peer latency; the first delivery to each peer counts and
+any further copies are counted as duplicates. An edit the node folded
+into a later one (see app/coalescer.py) reaches a peer with the first
+document whose revision is at least the one the edit was acked with;
+those deliveries are reported as `coalesced`. A peer whose own, newer
+edit replaced it first never gets it (in the same tick, or because the
+node dropped it as stale); that is counted as `overwritten` and not
+expected. Reports latency
+percentiles, throughput, lost and duplicate deliveries, server CPU and
+memory (from /proc, Linux only) and Redis traffic (INFO stats; not
+available on fakeredis). The harness runs on the same machine as the
+servers, so compare results from the same host only.
+
+--tick-ms sets ROOM_EDIT_TICK_MS on the nodes (0 broadcasts every edit).
+Raise --rate to see coalescing at work.
+
+--transport runs the nodes with REDIS_TRANSPORT=pubsub or streams (see
+app/transport.py); run both with the same options to compare them.
+
+With --affinity the nodes run with ROOM_AFFINITY=1: clients still start
+round-robin, then follow the `redirect` to each room's owner node (see
+app/cluster.py), and the report counts the redirects.
+
+Scenarios: smoke, rooms, crowd, large-doc, multi-node. Any option given
+explicitly overrides the scenario's value. --out writes the result as
+JSON. --compare prints the change against an earlier result file.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+SCENARIOS = {
+    "smoke": dict(nodes=1, rooms=5, clients=4, rate=2.0, duration=10, doc_size=2000, viewers=0.25),
+    "rooms": dict(nodes=1, rooms=50, clients=4, rate=1.0, duration=20, doc_size=2000, viewers=0.25),
+    "crowd": dict(nodes=1, rooms=2, clients=50, rate=0.2, duration=20, doc_size=2000, viewers=0.5),
+    "large-doc": dict(nodes=1, rooms=5, clients=4, rate=1.0, duration=20, doc_size=200_000, viewers=0.25),
+    "multi-node": dict(nodes=2, rooms=10, clients=6, rate=1.0, duration=20, doc_size=2000, viewers=0.25),
+}
+
+MARKER_RE = re.compile(r"LOADMARK (\S+) (\d+)")
+REVISION_RE = re.compile(r'"revision": (\d+)')
+ACK_PREFIX = '{"type": "ack"'
+WARMUP = 1.0
+DRAIN = 2.0
+AFFINITY_TTL = 3
+REDIS_STATS = ("total_commands_processed", "total_net_input_bytes", "total_net_output_bytes")
+
+
+# ---- Processes ----
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def serve_fake_redis(port: int):
+    """Entry point for the fakeredis subprocess"""
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        print("No Redis available: pass --redis URL, install redis-server, or pip install fakeredis")
+        sys.exit(1)
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    # Like real Redis, reply without Nagle delays: otherwise every pipelined
+    # or MULTI/EXEC call waits ~40 ms for the client's delayed ACK
+    server.RequestHandlerClass.disable_nagle_algorithm = True
+    server.serve_forever()
+
+
+def start_redis(workdir: str):
+    """(url, process) for a throwaway Redis"""
+    port = free_port()
+    if shutil.which("redis-server"):
+        cmd = ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no", "--dir", workdir]
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), "--fake-redis-server", str(port)]
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    wait_for_port(port)
+    return f"redis://127.0.0.1:{port}/0", process
+
+
+def start_node(name: str, db_path: str, redis_url: str, workdir: str, affinity: bool = False,
+               transport: str = "pubsub", tick_ms=None):
+    port = free_port()
+    env = dict(
+        os.environ,
+        DB_PATH=db_path,
+        REDIS_URL=redis_url,
+        NODE_ID=name,
+        NODE_URL=f"ws://127.0.0.1:{port}",
+        REDIS_TRANSPORT=transport,
+        BLOB_DIR=os.path.join(workdir, "blobs"),
+        LOG_LEVEL="WARNING",
+    )
+    if affinity:
+        env.update(ROOM_AFFINITY="1", CLUSTER_NODE_TTL=str(AFFINITY_TTL))
+    if tick_ms is not None:
+        env["ROOM_EDIT_TICK_MS"] = str(tick_ms)
+    # The shared grammar pass calls out to LanguageTool; keep the network out of the numbers
+    env.setdefault("ROOM_GRAMMAR", "0")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+            break
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"Node {name} failed to start")
+            time.sleep(0.2)
+    return {"name": name, "port": port, "process": process}
+
+
+def process_usage(pid: int) -> dict:
+    """CPU seconds and memory of a process from /proc"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    ticks = os.sysconf("SC_CLK_TCK")
+    return {
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / ticks,
+        "rss_mb": int(status["VmRSS"].split()[0]) / 1024,
+        "peak_rss_mb": int(status["VmHWM"].split()[0]) / 1024,
+    }
+
+
+def redis_stats(redis_url: str):
+    import redis
+    try:
+        info = redis.Redis.from_url(redis_url).info("stats")
+    except redis.ResponseError:
+        return None
+    return {key: info.get(key) for key in REDIS_STATS}
+
+
+# ---- Fixture ----
+
+def seed(db_path: str, rooms: int, clients: int, viewers: float):
+    """Create rooms and users; returns [(room_id, [(token, role), ...])]"""
+    from app import db
+    from app.jwt_utils import create_access_token
+
+    db.DB_PATH = db_path
+    db.init_db()
+    rng = random.Random(42)
+    fixture = []
+    for i in range(rooms):
+        members = []
+        for k in range(clients):
+            username = f"load{i}_{k}"
+            email = f"{username}@example.com"
+            user_id = db.create_user(username, "password", email)
+            if k == 0:
+                room_id = db.create_room(user_id, f"load-{i}")
+                role = "owner"
+            else:
+                role = "viewer" if rng.random() < viewers else "editor"
+                db.grant_room_access(room_id, user_id, role, members[0][2])
+            members.append((create_access_token(user_id, email, username), role, user_id))
+        fixture.append((room_id, [(token, role) for token, role, _ in members]))
+    return fixture
+
+
+# ---- Clients ----
+
+class Stats:
+    def __init__(self):
+        self.measuring = False
+        self.sent = {}        # msg id -> (send time ns, room index)
+        self.delivered = {}   # (msg id, client) -> latency ns
+        self.acked = {}       # msg id -> revision the server folded it into
+        # client -> ([time ns], [highest revision held by then], [whether that came from its own ack])
+        self.seen = {}
+        self.duplicates = 0
+        self.echoes = 0
+        self.errors = 0
+        self.redirects = 0
+
+
+async def connect_to_owner(base: str, path: str):
+    """Open the room's WebSocket, following redirects to its owner node"""
+    from websockets.asyncio.client import connect
+
+    for hops in range(4):
+        ws = await connect(f"{base}{path}&redirects={hops}", max_size=None)
+        first = await ws.recv()
+        if '"redirect"' not in first[:40]:
+            return ws, first, hops
+        await ws.close()
+        base = json.loads(first)["url"]
+    raise RuntimeError(f"Too many redirects for {path}")
+
+
+async def run_client(stats: Stats, base: str, path: str, room: int, client: str, editor: bool,
+                     rate: float, doc_size: int, stop: asyncio.Event):
+    padding = "<p>" + "x" * max(0, doc_size - 60) + "</p>"
+    ws, _, hops = await connect_to_owner(base, path)
+    stats.redirects += hops
+    async with ws:
+        unacked = deque()
+        times, revisions, own = stats.seen.setdefault(client, ([], [], []))
+
+        def hold(received: int, revision: int, from_ack: bool):
+            if revisions and revision <= revisions[-1]:
+                return
+            times.append(received)
+            revisions.append(revision)
+            own.append(from_ack)
+
+        async def reader():
+            async for message in ws:
+                received = time.time_ns()
+                if message.startswith(ACK_PREFIX):
+                    msg_id = unacked.popleft() if unacked else None
+                    revision = json.loads(message)["revision"]
+                    hold(received, revision, True)
+                    if msg_id in stats.sent:
+                        stats.acked[msg_id] = revision
+                    continue
+                revision = REVISION_RE.search(message, max(0, len(message) - 200))
+                if revision:
+                    hold(received, int(revision.group(1)), False)
+                match = MARKER_RE.search(message)
+                if not match:
+                    continue
+                msg_id, sent_ns = match.group(1), int(match.group(2))
+                if msg_id not in stats.sent:
+                    continue  # sent before measuring started
+                if msg_id.startswith(client + ":"):
+                    stats.echoes += 1
+                    continue
+                key = (msg_id, client)
+                if key in stats.delivered:
+                    stats.duplicates += 1
+                else:
+                    stats.delivered[key] = received - sent_ns
+
+        async def writer():
+            seq = 0
+            while not stop.is_set():
+                await asyncio.sleep(random.expovariate(rate))
+                if stop.is_set():
+                    break
+                seq += 1
+                msg_id = f"{client}:{seq}"
+                sent_ns = time.time_ns()
+                if stats.measuring:
+                    stats.sent[msg_id] = (sent_ns, room)
+                unacked.append(msg_id)
+                await ws.send(f"<p>LOADMARK {msg_id} {sent_ns}</p>{padding}")
+
+        read_task = asyncio.create_task(reader())
+        if editor:
+            await writer()
+        else:
+            await stop.wait()
+        await asyncio.sleep(DRAIN)
+        read_task.cancel()
+
+
+async def run_load(nodes, fixture, params) -> Stats:
+    stats = Stats()
+    stop = asyncio.Event()
+    tasks = []
+    for r, (room_id, members) in enumerate(fixture):
+        for k, (token, role) in enumerate(members):
+            node = nodes[k % len(nodes)]
+            base, path = f"ws://127.0.0.1:{node['port']}", f"/ws/{room_id}?token={token}"
+            tasks.append(asyncio.create_task(run_client(
+                stats, base, path, r, f"r{r}c{k}", role != "viewer", params["rate"], params["doc_size"], stop
+            )))
+    await asyncio.sleep(WARMUP)
+    stats.measuring = True
+    stats.started = time.monotonic()
+    await asyncio.sleep(params["duration"])
+    stats.measuring = False
+    stats.elapsed = time.monotonic() - stats.started
+    stop.set()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception):
+            stats.errors += 1
+    return stats
+
+
+# ---- Reporting ----
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def coalesced_deliveries(stats: Stats, room_sizes):
+    """Latencies (ns) of edits that peers got only inside a later revision, and how
+    many deliveries a peer's own edit overwrote"""
+    latencies = []
+    overwritten = 0
+    for msg_id, (sent_ns, room) in stats.sent.items():
+        revision = stats.acked.get(msg_id)
+        if revision is None:
+            continue
+        sender = msg_id.split(":")[0]
+        for k in range(room_sizes[room]):
+            peer = f"r{room}c{k}"
+            if peer == sender or (msg_id, peer) in stats.delivered:
+                continue
+            times, revisions, own = stats.seen.get(peer, ([], [], []))
+            i = bisect_left(revisions, revision)
+            if i < len(times):
+                if own[i]:
+                    overwritten += 1
+                else:
+                    latencies.append(max(0, times[i] - sent_ns))
+    return latencies, overwritten
+
+
+def summarize(stats: Stats, fixture, params, usage, redis_delta, git_rev) -> dict:
+    room_sizes = [len(members) for _, members in fixture]
+    coalesced, overwritten = coalesced_deliveries(stats, room_sizes)
+    expected = sum(room_sizes[room] - 1 for _, room in stats.sent.values()) - overwritten
+    latencies = sorted(ns / 1e6 for ns in list(stats.delivered.values()) + coalesced)
+    return {
+        "commit": git_rev,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "params": params,
+        "edits": len(stats.sent),
+        "deliveries": len(stats.delivered) + len(coalesced),
+        "coalesced": len(coalesced),
+        "overwritten": overwritten,
+        "expected_deliveries": expected,
+        "lost": expected - len(stats.delivered) - len(coalesced),
+        "duplicates": stats.duplicates,
+        "echoes": stats.echoes,
+        "client_errors": stats.errors,
+        "redirects": stats.redirects,
+        "throughput": {
+            "edits_per_s": round(len(stats.sent) / stats.elapsed, 2),
+            "deliveries_per_s": round((len(stats.delivered) + len(coalesced)) / stats.elapsed, 2),
+        },
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p90": round(percentile(latencies, 0.90), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        },
+        "servers": usage,
+        "redis": redis_delta,
+    }
+
+
+def print_summary(result: dict):
+    p = result["params"]
+    print(f"\n{p['scenario']}: {p['nodes']} node(s) over {p.get('transport', 'pubsub')}, "
+          f"{p['rooms']} rooms x {p['clients']} clients, "
+          f"{p['rate']} edits/s/editor, {p['doc_size']} B docs, {p['duration']}s")
+    if p.get("tick_ms") is not None:
+        print(f"  edit tick   {p['tick_ms']} ms")
+    print(f"  edits {result['edits']}  deliveries {result['deliveries']}/{result['expected_deliveries']}  "
+          f"(coalesced {result.get('coalesced', 0)}, overwritten {result.get('overwritten', 0)})  lost {result['lost']}  duplicates {result['duplicates']}  echoes {result['echoes']}")
+    if p.get("affinity"):
+        print(f"  redirects   {result['redirects']}")
+    print(f"  throughput  {result['throughput']['edits_per_s']} edits/s  "
+          f"{result['throughput']['deliveries_per_s']} deliveries/s")
+    lat = result["latency_ms"]
+    print(f"  latency ms  p50 {lat['p50']}  p90 {lat['p90']}  p99 {lat['p99']}  max {lat['max']}")
+    for server in result["servers"]:
+        print(f"  {server['node']:<8} cpu {server.get('cpu_percent', '?')}%  "
+              f"rss {server.get('rss_mb', '?')} MB  peak {server.get('peak_rss_mb', '?')} MB")
+    if result["redis"]:
+        print("  redis       " + "  ".join(f"{k} {v}" for k, v in result["redis"].items()))
+
+
+def compare(result: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({baseline.get('commit', '?')[:10]})")
+    rows = [("edits/s", ("throughput", "edits_per_s")), ("deliveries/s", ("throughput", "deliveries_per_s"))]
+    rows += [(f"latency {q}", ("latency_ms", q)) for q in ("p50", "p90", "p99")]
+    for label, (section, key) in rows:
+        old, new = baseline[section][key], result[section][key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {label:<14} {old:>10} -> {new:<10} {change}")
+    for old, new in zip(baseline.get("servers", []), result["servers"]):
+        if "cpu_percent" in old and "cpu_percent" in new:
+            print(f"  {new['node']} cpu %     {old['cpu_percent']:>10} -> {new['cpu_percent']}")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ---- Main ----
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="WebSocket load harness")
+    parser.add_argument("--scenario", default="smoke", choices=sorted(SCENARIOS))
+    parser.add_argument("--nodes", type=int)
+    parser.add_argument("--rooms", type=int)
+    parser.add_argument("--clients", type=int, help="clients per room")
+    parser.add_argument("--rate", type=float, help="edits per second per editor")
+    parser.add_argument("--duration", type=float, help="measured seconds")
+    parser.add_argument("--doc-size", type=int, help="bytes per edit")
+    parser.add_argument("--viewers", type=float, help="fraction of non-owner clients that are viewers")
+    parser.add_argument("--redis", help="use this Redis instead of starting one")
+    parser.add_argument("--affinity", action="store_true", help="run the nodes with ROOM_AFFINITY=1")
+    parser.add_argument("--transport", default="pubsub", choices=("pubsub", "streams"),
+                        help="REDIS_TRANSPORT for the nodes")
+    parser.add_argument("--tick-ms", type=float, help="ROOM_EDIT_TICK_MS for the nodes (default: theirs)")
+    parser.add_argument("--out", help="write the JSON result here")
+    parser.add_argument("--compare", help="earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    params = dict(SCENARIOS[args.scenario], scenario=args.scenario, affinity=args.affinity,
+                  transport=args.transport, tick_ms=args.tick_ms)
+    for key in ("nodes", "rooms", "clients", "rate", "duration", "doc_size", "viewers"):
+        if getattr(args, key) is not None:
+            params[key] = getattr(args, key)
+    return args, params
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--fake-redis-server":
+        serve_fake_redis(int(sys.argv[2]))
+        return
+
+    args, params = parse_args()
+    processes = []
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if args.redis:
+                redis_url = args.redis
+            else:
+                redis_url, redis_process = start_redis(workdir)
+                processes.append(redis_process)
+
+            db_path = os.path.join(workdir, "load.db")
+            fixture = seed(db_path, params["rooms"], params["clients"], params["viewers"])
+            nodes = []
+            for i in range(params["nodes"]):
+                nodes.append(start_node(f"node{i + 1}", db_path, redis_url, workdir, params["affinity"],
+                                        params.get("transport", "pubsub"), params.get("tick_ms")))
+                processes.append(nodes[-1]["process"])
+            if params["affinity"]:
+                time.sleep(AFFINITY_TTL / 3 + 0.5)  # let every node's ring see the others
+
+            before = {node["name"]: process_usage(node["process"].pid) for node in nodes}
+            redis_before = redis_stats(redis_url)
+            started = time.monotonic()
+            stats = asyncio.run(run_load(nodes, fixture, params))
+            wall = time.monotonic() - started
+            redis_after = redis_stats(redis_url)
+
+            usage = []
+            for node in nodes:
+                after = process_usage(node["process"].pid)
+                entry = {"node": node["name"]}
+                if after and before[node["name"]]:
+                    cpu = after["cpu_seconds"] - before[node["name"]]["cpu_seconds"]
+                    entry.update(
+                        cpu_seconds=round(cpu, 2),
+                        cpu_percent=round(cpu / wall * 100, 1),
+                        rss_mb=round(after["rss_mb"], 1),
+                        peak_rss_mb=round(after["peak_rss_mb"], 1),
+                    )
+                usage.append(entry)
+            redis_delta = None
+            if redis_before and redis_after:
+                redis_delta = {key: redis_after[key] - redis_before[key] for key in REDIS_STATS
+                               if redis_after[key] is not None and redis_before[key] is not None}
+        finally:
+            # Nodes first, and wait for each, so they leave the cluster and
+            # their listeners don't log Redis going away
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    result = summarize(stats, fixture, params, usage, redis_delta, git_revision())
+    print_summary(result)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nWrote {args.out}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,29 @@
-from fastapi import FastAPI
+import os
+
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from app.ai.ai_routes import router as ai_router  # ADD THIS
+from app.ai.grammar_checker import grammar_checker
+from app.export.pdf_renderer import pdf_renderer
+from app.export.docx_importer import docx_importer
 
 from app import db
+from app.log import setup_logging, shutdown_logging
+from app.metrics import CONTENT_TYPE, registry
+from app.tracing import setup_tracing, tracer
 from app.listener import redis_listener
+from app.cluster import cluster
+from app.connection import manager
+from app.room_state import room_store
+from app.coalescer import coalescer
 from app.auth import router as auth_router
 from app.websocket import router as ws_router
 
 # Load environment variables
 load_dotenv()
+setup_logging()
+setup_tracing()
 
 app = FastAPI()
 
@@ -31,6 +45,25 @@ async def startup_event():
     # Start the Redis listener when the server starts
     import asyncio as _asyncio
     _asyncio.create_task(redis_listener())
+    # Join the room-affinity ring (no-op unless ROOM_AFFINITY=1)
+    cluster.start()
+    # Write back edited rooms and evict idle ones
+    room_store.start(manager.active_connections)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    cluster.stop()
+    # Apply edits waiting for their room's tick, then persist what is held in memory
+    await coalescer.flush()
+    await room_store.close()
+    # Release pooled upstream connections
+    await grammar_checker.close()
+    pdf_renderer.close()
+    docx_importer.close()
+    tracer.close()
+    # Flush queued log records last
+    shutdown_logging()
 
 
 @app.get("/")
@@ -43,6 +76,15 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics(authorization: str = Header(None)):
+    """Prometheus scrape endpoint; set METRICS_TOKEN to require a bearer token"""
+    token = os.getenv("METRICS_TOKEN")
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(ws_router)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Script to apply database schema migrations out of band.
+Usage: python migrate.py [status | up [VERSION]]
+
+Run before deploying new workers, and start them with DB_AUTO_MIGRATE=0
+so they only check the schema version on startup.
+"""
+
+import logging
+import sys
+
+from app import db, migrations
+
+
+def show_status():
+    """Print every migration and whether it has been applied"""
+    for version, name, applied in migrations.status(db.DB_PATH):
+        mark = "✓" if applied else " "
+        print(f"[{mark}] {version:04d}_{name}")
+
+
+def migrate_up(target=None):
+    """Apply pending migrations up to target (default: latest)"""
+    applied = migrations.migrate(db.DB_PATH, target)
+    if applied:
+        print(f"✓ Applied {len(applied)} migration(s); schema is at version {applied[-1]}")
+    else:
+        print("✓ Schema is already up to date")
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "up"
+
+    if command == "status":
+        show_status()
+        sys.exit(0)
+
+    if command == "up" and len(sys.argv) <= 3:
+        target = int(sys.argv[2]) if len(sys.argv) == 3 else None
+        try:
+            success = migrate_up(target)
+        except Exception as e:
+            print(f"❌ Migration failed, nothing was applied: {e}")
+            success = False
+        sys.exit(0 if success else 1)
+
+    print("Usage: python migrate.py [status | up [VERSION]]")
+    print("\nExample:")
+    print("  python migrate.py status")
+    print("  python migrate.py")
+    sys.exit(1)
@@ -15,8 +15,16 @@ function App() {
   const [joined, setJoined] = useState(false);
   const [content, setContent] = useState("");
   const [users, setUsers] = useState([]);
+  // Shared grammar analysis pushed by the server (null until the room sends one)
+  const [grammarErrors, setGrammarErrors] = useState(null);
   const ws = useRef(null);
   const [serverPort, setServerPort] = useState("8000");
+  // Last revision confirmed by the server and its exact content, for resuming after a drop
+  const revision = useRef(null);
+  const serverContent = useRef(null);
+  // Edits sent but not yet acked, oldest first
+  const pendingEdits = useRef([]);
+  const reconnect = useRef({ timer: null, attempts: 0 });
 
   // Check for existing session on mount
   useEffect(() => {
@@ -44,9 +52,19 @@ function App() {
 
   const handleJoinRoom = (room) => {
     setRoomId(room);
+    revision.current = null;
+    serverContent.current = null;
     joinRoom(room);
   };
 
+  const closeSocket = () => {
+    clearTimeout(reconnect.current.timer);
+    if (ws.current) {
+      ws.current.onclose = null;
+      ws.current.close();
+    }
+  };
+
   const handleSignOut = () => {
     localStorage.removeItem('token');
     localStorage.removeItem('userId');
@@ -60,28 +78,33 @@ function App() {
   };
 
   const handleLeave = () => {
-    if (ws.current) ws.current.close();
+    closeSocket();
     setJoined(false);
     setRoomId("");
     setContent("");
     setUsers([]);
+    setGrammarErrors(null);
   };
 
-  const joinRoom = (room) => {
+  // nodeUrl/redirects are set when a node sends us to the room's owner node
+  const joinRoom = (room, nodeUrl = null, redirects = 0) => {
     const roomToJoin = room || roomId;
     if (!roomToJoin) return;
     
-    if (ws.current && ws.current.readyState === WebSocket.OPEN) {
-      ws.current.close();
-    }
+    closeSocket();
     
     // Use token instead of user_id for WebSocket connection
     // URL encode the room ID to handle spaces and special characters
     const encodedRoomId = encodeURIComponent(roomToJoin);
-    ws.current = new WebSocket(`ws://127.0.0.1:${serverPort}/ws/${encodedRoomId}?token=${token}`);
+    const baseUrl = nodeUrl || `ws://127.0.0.1:${serverPort}`;
+    // Resuming: the server only sends what changed since our last revision
+    const resume = revision.current !== null ? `&last_revision=${revision.current}` : "";
+    ws.current = new WebSocket(`${baseUrl}/ws/${encodedRoomId}?token=${token}&redirects=${redirects}${resume}`);
     
     ws.current.onopen = () => {
       console.log('Connected to room:', roomToJoin);
+      reconnect.current.attempts = 0;
+      pendingEdits.current = [];
     };
 
     ws.current.onerror = (error) => {
@@ -93,6 +116,11 @@ function App() {
       if (event.code === 1008) {
         alert('Access denied or invalid token. Please login again.');
         handleSignOut();
+      } else if (event.code !== 4307) {
+        // Dropped (not a redirect): reconnect with backoff and catch up from our revision
+        const delay = Math.min(1000 * 2 ** reconnect.current.attempts, 10000);
+        reconnect.current.attempts += 1;
+        reconnect.current.timer = setTimeout(() => joinRoom(roomToJoin, nodeUrl), delay);
       }
     };
     
@@ -108,8 +136,33 @@ function App() {
           setUsers(message.users || []);
         } else if (message.type === "content") {
           setContent(message.data);
+          if (message.revision !== undefined) {
+            revision.current = message.revision;
+            serverContent.current = message.data;
+          }
+        } else if (message.type === "ack") {
+          // Our oldest unacked edit is now this revision
+          const sent = pendingEdits.current.shift();
+          if (sent !== undefined) {
+            revision.current = message.revision;
+            serverContent.current = sent;
+          }
+        } else if (message.type === "catchup") {
+          // Replay missed splices (UTF-16 offsets) onto the last content we had
+          let doc = serverContent.current;
+          for (const [start, end, text] of message.ops) {
+            doc = doc.slice(0, start) + text + doc.slice(end);
+          }
+          revision.current = message.revision;
+          serverContent.current = doc;
+          if (message.ops.length) setContent(doc);
+        } else if (message.type === "grammar") {
+          setGrammarErrors(message.errors || []);
         } else if (message.type === "error") {
           alert(message.message);
+        } else if (message.type === "redirect") {
+          // The room lives on another node; reconnect there
+          if (message.url) joinRoom(roomToJoin, message.url, redirects + 1);
         }
       } catch (e) {
         setContent(event.data);
@@ -127,22 +180,19 @@ function App() {
       return;
     }
     
-    const timeoutId = setTimeout(() => ws.current.send(content), 500);
+    const timeoutId = setTimeout(() => {
+      ws.current.send(content);
+      pendingEdits.current.push(content);
+    }, 500);
     return () => clearTimeout(timeoutId);
   }, [content, joined, userRole]);
 
   useEffect(() => {
-    const handleBeforeUnload = () => {
-      if (ws.current && ws.current.readyState === WebSocket.OPEN) {
-        ws.current.close();
-      }
-    };
+    const handleBeforeUnload = () => closeSocket();
     window.addEventListener('beforeunload', handleBeforeUnload);
     return () => {
       window.removeEventListener('beforeunload', handleBeforeUnload);
-      if (ws.current && ws.current.readyState === WebSocket.OPEN) {
-        ws.current.close();
-      }
+      closeSocket();
     };
   }, []);
 
@@ -181,6 +231,7 @@ function App() {
       serverPort={serverPort}
       userRole={userRole}
       token={token}
+      grammarErrors={grammarErrors}
     />
   );
 }
@@ -6,36 +6,47 @@ export function AdminPanel({ token, serverPort, onClose }) {
   const [users, setUsers] = useState([]);
   const [rooms, setRooms] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
 
   useEffect(() => {
+    setNextCursor(null);
     fetchData();
   }, [activeTab]);
 
-  const fetchData = async () => {
-    setLoading(true);
+  // Lists are paginated server-side; a cursor appends the next page
+  const fetchData = async (cursor = null) => {
+    if (cursor) {
+      setLoadingMore(true);
+    } else {
+      setLoading(true);
+    }
     setError('');
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
     try {
       if (activeTab === 'users') {
-        const response = await fetch(`http://127.0.0.1:${serverPort}/api/admin/users`, {
+        const response = await fetch(`http://127.0.0.1:${serverPort}/api/admin/users${query}`, {
           headers: { 'Authorization': `Bearer ${token}` }
         });
         if (response.ok) {
           const data = await response.json();
-          setUsers(data.users || []);
+          setUsers(prev => cursor ? [...prev, ...(data.users || [])] : (data.users || []));
+          setNextCursor(data.next_cursor || null);
         } else {
           const errorData = await response.json().catch(() => ({}));
           setError(errorData.detail || `Failed to fetch users: ${response.status}`);
           console.error('Users fetch error:', response.status, errorData);
         }
       } else if (activeTab === 'rooms') {
-        const response = await fetch(`http://127.0.0.1:${serverPort}/api/admin/rooms`, {
+        const response = await fetch(`http://127.0.0.1:${serverPort}/api/admin/rooms${query}`, {
           headers: { 'Authorization': `Bearer ${token}` }
         });
         if (response.ok) {
           const data = await response.json();
-          setRooms(data.rooms || []);
+          setRooms(prev => cursor ? [...prev, ...(data.rooms || [])] : (data.rooms || []));
+          setNextCursor(data.next_cursor || null);
         } else {
           const errorData = await response.json().catch(() => ({}));
           setError(errorData.detail || `Failed to fetch rooms: ${response.status}`);
@@ -47,6 +58,7 @@ export function AdminPanel({ token, serverPort, onClose }) {
       console.error('Network error:', err);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -217,9 +229,9 @@ export function AdminPanel({ token, serverPort, onClose }) {
           ) : activeTab === 'users' ? (
             <div className="space-y-4">
               <div className="flex items-center justify-between mb-4">
-                <h3 className="text-lg font-semibold text-gray-900">All Users ({users.length})</h3>
+                <h3 className="text-lg font-semibold text-gray-900">All Users ({users.length}{nextCursor ? '+' : ''})</h3>
                 <button
-                  onClick={fetchData}
+                  onClick={() => fetchData()}
                   className="px-3 py-1 text-sm bg-gray-100 hover:bg-gray-200 rounded-lg transition-colors"
                 >
                   Refresh
@@ -291,13 +303,24 @@ export function AdminPanel({ token, serverPort, onClose }) {
                   </tbody>
                 </table>
               </div>
+              {nextCursor && (
+                <div className="flex justify-center">
+                  <button
+                    onClick={() => fetchData(nextCursor)}
+                    disabled={loadingMore}
+                    className="px-4 py-2 text-sm bg-gray-100 hover:bg-gray-200 rounded-lg transition-colors disabled:opacity-50"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                </div>
+              )}
             </div>
           ) : (
             <div className="space-y-4">
               <div className="flex items-center justify-between mb-4">
-                <h3 className="text-lg font-semibold text-gray-900">All Rooms ({rooms.length})</h3>
+                <h3 className="text-lg font-semibold text-gray-900">All Rooms ({rooms.length}{nextCursor ? '+' : ''})</h3>
                 <button
-                  onClick={fetchData}
+                  onClick={() => fetchData()}
                   className="px-3 py-1 text-sm bg-gray-100 hover:bg-gray-200 rounded-lg transition-colors"
                 >
                   Refresh
@@ -334,6 +357,17 @@ export function AdminPanel({ token, serverPort, onClose }) {
                   </div>
                 ))}
               </div>
+              {nextCursor && (
+                <div className="flex justify-center">
+                  <button
+                    onClick={() => fetchData(nextCursor)}
+                    disabled={loadingMore}
+                    className="px-4 py-2 text-sm bg-gray-100 hover:bg-gray-200 rounded-lg transition-colors disabled:opacity-50"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -1,7 +1,7 @@
 import { useEffect, useState, useRef } from 'react';
 
 // Hook for AI autocomplete
-function useAIAutocomplete(editor, token, enabled = true) {
+function useAIAutocomplete(editor, token, enabled = true, roomId = null) {
   const [suggestion, setSuggestion] = useState(null);
   const [loading, setLoading] = useState(false);
   const timeoutRef = useRef(null);
@@ -42,7 +42,7 @@ function useAIAutocomplete(editor, token, enabled = true) {
             'Authorization': `Bearer ${token}`,
             'Content-Type': 'application/json'
           },
-          body: JSON.stringify({ context, max_words: 15 }),
+          body: JSON.stringify({ context, max_words: 15, room_id: roomId }),
           signal: abortControllerRef.current.signal
         });
 
@@ -94,7 +94,7 @@ function useAIAutocomplete(editor, token, enabled = true) {
         abortControllerRef.current.abort();
       }
     };
-  }, [editor, token, enabled, suggestion]);
+  }, [editor, token, enabled, suggestion, roomId]);
 
   return { suggestion, loading };
 }
@@ -1,14 +1,22 @@
 import { useEffect, useState, useRef } from 'react';
 
-export function useGrammarChecker(editor, token) {
+export function useGrammarChecker(editor, token, roomErrors = null) {
   const [errors, setErrors] = useState([]);
+  // Once the server pushes room-wide results, stop polling the HTTP endpoint
+  const useRoomResults = roomErrors !== null;
   const [checking, setChecking] = useState(false);
   const timeoutRef = useRef(null);
   const lastCheckedText = useRef('');
   const recheckTrigger = useRef(0);
 
   useEffect(() => {
-    if (!editor || !token) return;
+    if (useRoomResults) {
+      setErrors(roomErrors);
+    }
+  }, [useRoomResults, roomErrors]);
+
+  useEffect(() => {
+    if (!editor || !token || useRoomResults) return;
 
     const checkGrammar = async () => {
       const text = editor.getText();
@@ -86,7 +94,7 @@ export function useGrammarChecker(editor, token) {
         clearTimeout(timeoutRef.current);
       }
     };
-  }, [editor, token]);
+  }, [editor, token, useRoomResults]);
 
   return { errors, checking };
 }
\ No newline at end of file
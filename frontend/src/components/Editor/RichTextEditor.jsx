@@ -23,6 +23,8 @@ export function RichTextEditor({
   userRole = 'viewer',
   onInvite,
   token,
+  roomGrammarErrors = null,
+  roomId = null,
   showAIMenu = false,
   onCloseAIMenu
 }) {
@@ -102,8 +104,8 @@ export function RichTextEditor({
   });
 
   // AI Hooks - after editor is initialized
-  const { errors, checking: checkingGrammar } = useGrammarChecker(editor, token);
-  const { suggestion: autocompleteSuggestion, loading: loadingAutocomplete } = useAIAutocomplete(editor, token, !readOnly);
+  const { errors, checking: checkingGrammar } = useGrammarChecker(editor, token, roomGrammarErrors);
+  const { suggestion: autocompleteSuggestion, loading: loadingAutocomplete } = useAIAutocomplete(editor, token, !readOnly, roomId);
 
   // Debug logging
   useEffect(() => {
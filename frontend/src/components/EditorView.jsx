@@ -4,7 +4,7 @@ import { RichTextEditor } from './Editor';
 import { ZoomControls } from './Editor/ZoomControls';
 import { KeyboardShortcutsModal } from './Editor/KeyboardShortcutsModal';
 
-export function EditorView({ username, roomName, content, setContent, users, onLeave, serverPort, userRole, token }) {
+export function EditorView({ username, roomName, content, setContent, users, onLeave, serverPort, userRole, token, grammarErrors }) {
   const [showUserPanel, setShowUserPanel] = useState(false);
   const [showLineNumbers, setShowLineNumbers] = useState(false);
   const [zoom, setZoom] = useState(100);
@@ -48,7 +48,8 @@ export function EditorView({ username, roomName, content, setContent, users, onL
         setContent(data.html_content);
         setShowFileMenu(false);
       } else {
-        alert('Failed to upload file');
+        const error = await response.json().catch(() => ({}));
+        alert(error.detail || 'Failed to upload file');
       }
     } catch (error) {
       alert('Error uploading file: ' + error.message);
@@ -57,16 +58,11 @@ export function EditorView({ username, roomName, content, setContent, users, onL
 
   const handleDownloadPDF = async () => {
     try {
-      const response = await fetch(`http://127.0.0.1:${serverPort}/api/download-pdf`, {
-        method: 'POST',
+      // The server exports its stored copy, so the document isn't uploaded again
+      const response = await fetch(`http://127.0.0.1:${serverPort}/api/rooms/${encodeURIComponent(roomName)}/export/pdf`, {
         headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({
-          room_id: roomName,
-          content: content
-        })
+          'Authorization': `Bearer ${token}`
+        }
       });
 
       if (response.ok) {
@@ -90,16 +86,11 @@ export function EditorView({ username, roomName, content, setContent, users, onL
 
   const handleDownloadDOCX = async () => {
     try {
-      const response = await fetch(`http://127.0.0.1:${serverPort}/api/download-docx`, {
-        method: 'POST',
+      // The server exports its stored copy, so the document isn't uploaded again
+      const response = await fetch(`http://127.0.0.1:${serverPort}/api/rooms/${encodeURIComponent(roomName)}/export/docx`, {
         headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({
-          room_id: roomName,
-          content: content
-        })
+          'Authorization': `Bearer ${token}`
+        }
       });
 
       if (response.ok) {
@@ -571,6 +562,8 @@ export function EditorView({ username, roomName, content, setContent, users, onL
           userRole={userRole}
           onInvite={handleInviteClick}
           token={token}
+          roomGrammarErrors={grammarErrors}
+          roomId={roomName}
           showAIMenu={showAIAssistant}
           onCloseAIMenu={() => setShowAIAssistant(false)}
         />
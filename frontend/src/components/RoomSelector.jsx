@@ -6,6 +6,7 @@ export function RoomSelector({ username, onJoinRoom, onSignOut, serverPort }) {
   const [roomName, setRoomName] = useState("");
   const [rooms, setRooms] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [roomsCursor, setRoomsCursor] = useState(null);
   const [showCreateRoom, setShowCreateRoom] = useState(false);
   const [invitations, setInvitations] = useState([]);
   const [showInvitations, setShowInvitations] = useState(false);
@@ -38,11 +39,12 @@ export function RoomSelector({ username, onJoinRoom, onSignOut, serverPort }) {
     }
   };
 
-  const fetchUserRooms = async () => {
+  const fetchUserRooms = async (cursor = null) => {
     try {
       const token = localStorage.getItem('token');
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
       
-      const response = await fetch(`http://127.0.0.1:${serverPort}/api/rooms`, {
+      const response = await fetch(`http://127.0.0.1:${serverPort}/api/rooms${query}`, {
         headers: {
           'Authorization': `Bearer ${token}`
         }
@@ -50,7 +52,8 @@ export function RoomSelector({ username, onJoinRoom, onSignOut, serverPort }) {
       
       if (response.ok) {
         const data = await response.json();
-        setRooms(data.rooms || []);
+        setRooms(prev => cursor ? [...prev, ...(data.rooms || [])] : (data.rooms || []));
+        setRoomsCursor(data.next_cursor || null);
       }
     } catch (error) {
       console.error('Failed to fetch rooms:', error);
@@ -365,6 +368,14 @@ export function RoomSelector({ username, onJoinRoom, onSignOut, serverPort }) {
                     </div>
                   </div>
                 ))}
+                {roomsCursor && (
+                  <button
+                    onClick={() => fetchUserRooms(roomsCursor)}
+                    className="w-full py-2 text-sm text-gray-600 hover:bg-gray-100 rounded-lg transition-colors"
+                  >
+                    Load more rooms
+                  </button>
+                )}
               </div>
             )}
           </div>